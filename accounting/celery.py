@@ -1,9 +1,78 @@
 import os
 
 from celery import Celery
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun, worker_init, \
+    worker_process_init
 from django.conf import settings
 
+from accounting import profiling, tracing
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'accounting.settings')
 app = Celery('accounting')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
+
+# Task id -> (span of the task, span active before the task) of the tasks running in the process
+task_spans = {}
+
+# Task id -> profiling session of the tasks running in the process
+task_sessions = {}
+
+
+@before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    """Pass the active trace on to the published task, in a `traceparent` message header."""
+    header = tracing.traceparent()
+    if header is not None and headers is not None:
+        headers[tracing.TRACEPARENT] = header
+
+
+@task_prerun.connect
+def start_task_span(task_id=None, task=None, **kwargs):
+    """Trace a task as a span, child of the span that published it or, if run eagerly, of the active span."""
+    if not tracing.enabled():
+        return
+    parent = tracing.extract(getattr(task.request, tracing.TRACEPARENT, None)) or tracing.current_span()
+    span = tracing.Span(task.name, tracing.CONSUMER, parent, {'celery.task_id': task_id,
+                                                              'messaging.system': 'celery'})
+    task_spans[task_id] = (span, tracing.activate(span))
+
+
+@task_failure.connect
+def record_task_failure(task_id=None, exception=None, **kwargs):
+    if task_id in task_spans:
+        task_spans[task_id][0].record_exception(exception)
+
+
+@task_postrun.connect
+def finish_task_span(task_id=None, state=None, **kwargs):
+    if task_id not in task_spans:
+        return
+    span, previous = task_spans.pop(task_id)
+    span.set_attribute('celery.state', state)
+    tracing.activate(previous)
+    span.finish()
+
+
+@worker_init.connect
+@worker_process_init.connect
+def install_profiling_signal_handler(**kwargs):
+    """Let `SIGUSR2` switch the profiling of the tasks on and off, in the worker and in its pool processes."""
+    profiling.install_signal_handler()
+
+
+@task_prerun.connect
+def start_task_profiling(task_id=None, task=None, **kwargs):
+    """Profile a task if profiling is enabled; its artifacts are written if it is slow."""
+    if not profiling.enabled() or profiling.current_session() is not None:
+        return
+    session = profiling.Session(task.name)
+    task_sessions[task_id] = session
+    session.start()
+
+
+@task_postrun.connect
+def stop_task_profiling(task_id=None, **kwargs):
+    session = task_sessions.pop(task_id, None)
+    if session is not None:
+        session.stop()
@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+
+from django.db import InterfaceError, OperationalError, close_old_connections, connection
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+
+from accounting import profiling, tracing
+from accounting.metrics import DB_CONNECT_DURATION, DB_FAILED_HEALTH_CHECKS, DB_QUERIES, DB_RECONNECTS
+
+logger = logging.getLogger(__name__)
+
+# The errors raised on a query when the connection to the database is lost
+DISCONNECT_ERRORS = (InterfaceError, OperationalError)
+
+
+class ConnectionStats(object):
+    """Connection Statistics Class.
+
+    Counts the connections opened by the process, the time spent opening them and the connections
+    found broken, either by a health check or by a query of `run_with_reconnect`.
+    """
+
+    def __init__(self):
+        """Connection Statistics Class Constructor."""
+        self.__connects = 0
+        self.__connect_seconds = 0.0
+        self.__reconnects = 0
+        self.__failed_health_checks = 0
+        self.__lock = threading.Lock()
+
+    def connected(self, duration):
+        with self.__lock:
+            self.__connects += 1
+            self.__connect_seconds += duration
+
+    def reconnected(self):
+        with self.__lock:
+            self.__reconnects += 1
+
+    def failed_health_check(self):
+        with self.__lock:
+            self.__failed_health_checks += 1
+
+    def status(self):
+        """Report the connection statistics of the process.
+
+        Returns:
+            status (dict): The connections opened, their mean connect time, the reconnects and the failed
+                health checks
+
+        """
+        with self.__lock:
+            mean = self.__connect_seconds / self.__connects if self.__connects else 0.0
+            return {'connects': self.__connects, 'connect_ms_mean': round(mean * 1000, 2),
+                    'connect_ms_total': round(self.__connect_seconds * 1000, 2), 'reconnects': self.__reconnects,
+                    'failed_health_checks': self.__failed_health_checks}
+
+
+stats = ConnectionStats()
+
+
+class QueryCountingMixin(object):
+    """Cursor Wrapper Mixin that counts the queries run on a connection.
+
+    The queries run within a trace are traced as spans, and those run within a profiling session are timed, so
+    that the slow ones are reported with their plan.
+    """
+
+    def execute(self, sql, params=None):
+        return self.observe(super(QueryCountingMixin, self).execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.observe(super(QueryCountingMixin, self).executemany, sql, param_list, many=True)
+
+    def observe(self, run, sql, params, many=False):
+        DB_QUERIES.labels(self.db.alias).inc()
+        session = profiling.current_session()
+        if tracing.current_span() is None and session is None:
+            return run(sql, params)
+        start = time.perf_counter()
+        try:
+            with tracing.start_span(**self.span(sql)):
+                return run(sql, params)
+        finally:
+            if session is not None:
+                session.record_query(self.db, sql, params, time.perf_counter() - start, explainable=not many)
+
+    def span(self, sql):
+        """The name, kind and attributes of the span of a query, following the OpenTelemetry conventions."""
+        operation = sql.split(None, 1)[0].upper() if sql else 'QUERY'
+        return {'name': operation, 'kind': tracing.CLIENT, 'attributes': {
+            'db.system': self.db.vendor, 'db.name': self.db.settings_dict['NAME'], 'db.statement': sql,
+            'db.operation': operation}}
+
+
+class QueryCountingCursorWrapper(QueryCountingMixin, CursorWrapper):
+    pass
+
+
+class QueryCountingCursorDebugWrapper(QueryCountingMixin, CursorDebugWrapper):
+    pass
+
+
+class PersistentConnectionMixin(object):
+    """Database Wrapper Mixin for persistent connections.
+
+    Times every new connection, counts the queries and, if `HEALTH_CHECKS` is set in the database settings,
+    checks that a persistent connection still works before it is reused by a request or a task: once per
+    request or task, on its first query. A connection that fails the check is replaced by a new one, instead of
+    failing the request after a restart of the database or of pgbouncer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PersistentConnectionMixin, self).__init__(*args, **kwargs)
+        self.health_check_done = True
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        new_connection = super(PersistentConnectionMixin, self).get_new_connection(conn_params)
+        duration = time.perf_counter() - start
+        stats.connected(duration)
+        DB_CONNECT_DURATION.labels(self.alias).observe(duration)
+        logger.debug('Connected to database {} in {:.1f}ms'.format(self.alias, duration * 1000))
+        return new_connection
+
+    def make_cursor(self, cursor):
+        return QueryCountingCursorWrapper(cursor, self)
+
+    def make_debug_cursor(self, cursor):
+        return QueryCountingCursorDebugWrapper(cursor, self)
+
+    def close_if_unusable_or_obsolete(self):
+        # Called by Django at the start and end of each request and by Celery around each task
+        super(PersistentConnectionMixin, self).close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if not self.health_check_done:
+            self.health_check_done = True
+            if self.connection is not None and self.settings_dict.get('HEALTH_CHECKS') and not self.is_usable():
+                stats.failed_health_check()
+                DB_FAILED_HEALTH_CHECKS.labels(self.alias).inc()
+                logger.warning('Connection to database {} failed its health check; reconnecting'.format(self.alias))
+                close_quietly(self)
+        super(PersistentConnectionMixin, self).ensure_connection()
+
+
+def close_quietly(wrapper):
+    """Close a connection that is known to be broken, ignoring the errors of closing it."""
+    try:
+        wrapper.close()
+    except DISCONNECT_ERRORS:
+        pass
+
+
+def run_with_reconnect(function, *args, **kwargs):
+    """Run a function on the database, reconnecting if the connection is lost.
+
+    Meant for the loops of the long-running commands, that hold a connection for as long as they run:
+    the connections broken or past `CONN_MAX_AGE` are closed first, as Django does between requests. If
+    the function fails because the database is unreachable, it is retried on a new connection with a
+    backoff of 1s doubling up to 30s, until `max_attempts` is reached.
+
+    Args:
+        function (callable): The function to run
+        *args: The arguments of the function
+        max_attempts (int, optional): The attempts before the error is raised; 10 by default
+        **kwargs: The keyword arguments of the function
+
+    Returns:
+        The result of the function
+
+    Raises:
+        InterfaceError, OperationalError: If the database is still unreachable after `max_attempts`
+
+    Examples:
+        >>> for msg in consumer:
+        >>>     run_with_reconnect(notification_handler, msg.key.decode('ascii'), msg.value)
+
+    """
+    max_attempts = kwargs.pop('max_attempts', 10)
+    attempt = 1
+    while True:
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        except DISCONNECT_ERRORS as e:
+            if connection.connection is not None and connection.is_usable():
+                # The database is reachable, so this is not a lost connection
+                raise
+            close_quietly(connection)
+            if attempt >= max_attempts:
+                logger.error('Database unreachable after {} attempts: {}'.format(attempt, e))
+                raise
+            delay = min(30, 2 ** (attempt - 1))
+            stats.reconnected()
+            DB_RECONNECTS.inc()
+            logger.warning('Lost the connection to the database ({}); reconnecting in {}s. Connections: {}'.format(
+                e, delay, stats.status()))
+            time.sleep(delay)
+            attempt += 1
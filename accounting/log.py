@@ -0,0 +1,173 @@
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import time
+from importlib import import_module
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+from accounting.metrics import LOG_RECORDS_DROPPED
+
+# The attributes of every log record; any other attribute was passed in `extra` and is output as a field
+RECORD_ATTRIBUTES = frozenset(logging.LogRecord('', logging.INFO, '', 0, '', (), None).__dict__) | {
+    'message', 'asctime'}
+
+
+class SampledLogger(object):
+    """Logger Adapter for the per-message events, of which only one in `rate` is logged.
+
+    The decision is taken before the record is created, so that the events left out cost next to nothing.
+    The events logged carry their fields and the rate as `sample_rate`, so that the number of events may be
+    estimated from the log.
+
+    Examples:
+        >>> sampled_logger = SampledLogger(logger)
+        >>> sampled_logger.info('Saved metric', metric='CPU_CYCLE', vdu=vdu_uuid)
+
+    """
+
+    def __init__(self, logger, rate=None):
+        """Sampled Logger Class Constructor.
+
+        Args:
+            logger (Logger): The logger of the events
+            rate (int, optional): One in this many events is logged; `LOG_SAMPLE_RATE` by default
+        """
+        self.logger = logger
+        self.rate = max(1, int(rate or settings.LOG_SAMPLE_RATE))
+        self.__counter = itertools.count()
+
+    def log(self, level, msg, **fields):
+        if next(self.__counter) % self.rate or not self.logger.isEnabledFor(level):
+            return
+        fields['sample_rate'] = self.rate
+        self.logger.log(level, msg, extra=fields)
+
+    def debug(self, msg, **fields):
+        self.log(logging.DEBUG, msg, **fields)
+
+    def info(self, msg, **fields):
+        self.log(logging.INFO, msg, **fields)
+
+
+class Lazy(object):
+    """Log argument computed only once the record is formatted, i.e. only if it is logged.
+
+    Examples:
+        >>> logger.debug('Response body: %s', Lazy(lambda: response.text))
+
+    """
+
+    def __init__(self, function):
+        self.function = function
+
+    def __str__(self):
+        return str(self.function())
+
+
+def fields(record):
+    """The fields passed in the `extra` of a log record."""
+    return {key: value for key, value in record.__dict__.items() if key not in RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """Log Formatter that appends the fields passed in `extra` to the message, as `key=value` pairs."""
+
+    def formatMessage(self, record):
+        message = super(TextFormatter, self).formatMessage(record)
+        extra = fields(record)
+        if not extra:
+            return message
+        return '{} {}'.format(message, ' '.join('{}={}'.format(key, value) for key, value in sorted(extra.items())))
+
+
+class JSONFormatter(logging.Formatter):
+    """JSON Lines Formatter.
+
+    Outputs each record as a JSON object on a single line, with the time (UTC, ISO 8601), the level, the
+    logger, the message, the fields passed in `extra` and the traceback of the exception, if any.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': '{}.{:03d}Z'.format(time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)),
+                                        int(record.msecs)),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class AsyncHandler(QueueHandler):
+    """Log Handler that hands the records over to a background thread, which emits them through a target handler.
+
+    The caller only merges the message with its arguments, so that the objects logged may safely change
+    afterwards; formatting and I/O happen in the thread. When the queue is full, e.g. if the disk stalls,
+    records are dropped rather than blocking the caller, and counted. The thread is restarted in forked
+    processes, such as the Celery workers, and flushed at exit.
+
+    Examples:
+        >>> LOGGING['handlers']['api'] = {
+        >>>     '()': 'accounting.log.AsyncHandler',
+        >>>     'target': 'logging.handlers.RotatingFileHandler',
+        >>>     'filename': '/opt/accounting/logs/api.log',
+        >>> }
+
+    """
+
+    def __init__(self, target, queue_size=10000, **kwargs):
+        """Async Handler Class Constructor.
+
+        Args:
+            target (str): The dotted path of the class of the handler that emits the records
+            queue_size (int, optional): The records that may wait in the queue
+            **kwargs: The arguments of the target handler
+        """
+        module, name = target.rsplit('.', 1)
+        self.target = getattr(import_module(module), name)(**kwargs)
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.__pid = None
+        self.__listener = None
+        super(AsyncHandler, self).__init__(queue.Queue(queue_size))
+        self.__start()
+        atexit.register(self.close)
+
+    def __start(self):
+        self.queue = queue.Queue(self.queue_size)
+        self.__listener = QueueListener(self.queue, self.target)
+        self.__listener.start()
+        self.__pid = os.getpid()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.__pid != os.getpid():
+            # The thread of the parent process does not survive a fork
+            self.__start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.labels(self.target.__class__.__name__).inc()
+
+    def close(self):
+        if self.__listener is not None and self.__pid == os.getpid():
+            self.__listener.stop()
+        self.__listener = None
+        self.target.close()
+        super(AsyncHandler, self).close()
@@ -0,0 +1,132 @@
+import logging
+import os
+
+from kafka import TopicPartition
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Set for the processes of the container to share their metrics through files, as gunicorn, Celery and the
+# management commands run in separate processes
+MULTIPROCESS_DIR_ENV = 'prometheus_multiproc_dir'
+
+# Buckets of the latencies, in seconds
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (.1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# =================================
+# KAFKA CONSUMERS
+# =================================
+KAFKA_MESSAGES = Counter('acc_kafka_messages_consumed_total', 'Kafka messages consumed', ['consumer'])
+KAFKA_LAG = Gauge('acc_kafka_consumer_lag', 'Messages behind the end of the partition', ['consumer', 'partition'],
+                  multiprocess_mode='max')
+COLLECTED_METRICS = Counter('acc_metric_collector_metrics_total',
+                            'Metrics consumed by metric_collector, per outcome: filtered out of the white list, '
+                            'skipped as their VDU is not active or persisted', ['outcome'])
+NOTIFICATION_DURATION = Histogram('acc_osm_notification_duration_seconds', 'Latency of the OSM notification handler',
+                                  ['operation'], buckets=LATENCY_BUCKETS)
+NOTIFICATION_ERRORS = Counter('acc_osm_notification_errors_total', 'OSM notifications whose handler failed',
+                              ['operation'])
+NOTIFICATION_DUPLICATES = Counter('acc_osm_notification_duplicates_total', 'OSM notifications skipped as they were '
+                                  'already handled', ['operation'])
+NOTIFICATIONS_SKIPPED = Counter('acc_osm_notifications_skipped_total', 'OSM notifications skipped undecoded as '
+                                'their operation is not handled', ['operation'])
+NOTIFICATIONS_MALFORMED = Counter('acc_osm_notifications_malformed_total', 'OSM notifications skipped as they '
+                                  'could not be decoded', ['operation'])
+
+# =================================
+# CELERY TASKS
+# =================================
+SEND_METRICS_DURATION = Histogram('acc_send_metrics_duration_seconds', 'Duration of a send_metrics run, from its '
+                                  'start to the end of its last shard', buckets=TASK_BUCKETS)
+SEND_METRICS_SHARD_DURATION = Histogram('acc_send_metrics_shard_duration_seconds', 'Duration of the aggregation of '
+                                        'a shard of VDUs by send_metrics', buckets=TASK_BUCKETS)
+SEND_METRICS_SKIPPED = Counter('acc_send_metrics_skipped_total', 'Runs of send_metrics skipped as the previous run '
+                               'was still in progress')
+SEND_METRICS_RECORDS = Counter('acc_send_metrics_records_total', 'Consumption records dispatched by send_metrics',
+                               ['metric'])
+
+# =================================
+# UPSTREAM SERVICES
+# =================================
+UPSTREAM_DURATION = Histogram('acc_upstream_request_duration_seconds', 'Latency of the HTTP requests to the '
+                              'upstream services (nbi, ro, billing)', ['upstream', 'method', 'status'],
+                              buckets=LATENCY_BUCKETS)
+
+# =================================
+# DATABASE
+# =================================
+DB_QUERIES = Counter('acc_db_queries_total', 'Queries run on the database', ['alias'])
+DB_CONNECT_DURATION = Histogram('acc_db_connect_duration_seconds', 'Time taken to open a database connection',
+                                ['alias'], buckets=LATENCY_BUCKETS)
+DB_RECONNECTS = Counter('acc_db_reconnects_total', 'Reconnects after the database connection was lost')
+DB_FAILED_HEALTH_CHECKS = Counter('acc_db_failed_health_checks_total',
+                                  'Persistent connections that failed their health check', ['alias'])
+
+# =================================
+# LOGGING
+# =================================
+LOG_RECORDS_DROPPED = Counter('acc_log_records_dropped_total', 'Log records dropped as the queue of their handler '
+                              'was full', ['handler'])
+
+
+def registry():
+    """The registry of the metrics to expose.
+
+    Returns:
+        registry (CollectorRegistry): The metrics of all the processes of the container if
+            `prometheus_multiproc_dir` is set, otherwise those of the current process
+
+    """
+    if os.getenv(MULTIPROCESS_DIR_ENV):
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return REGISTRY
+
+
+def start_sidecar(port):
+    """Serve the metrics of the current process over HTTP from a background thread, for the processes that do not
+    serve the API.
+
+    Nothing is served if the processes share their metrics through `prometheus_multiproc_dir`, as in the container:
+    the `metrics_exporter` command serves them all from a single endpoint, so that each series is scraped once.
+
+    Args:
+        port (int): The port to listen on; nothing is served if it is 0 or None
+
+    Examples:
+        >>> from accounting import metrics
+        >>> metrics.start_sidecar(9101)
+
+    """
+    if not port:
+        return
+    if os.getenv(MULTIPROCESS_DIR_ENV):
+        logger.info('Not serving metrics on port {}, as the metrics exporter serves those of all the processes'.format(
+            port))
+        return
+    start_http_server(port, registry=registry())
+    logger.info('Serving metrics on port {}'.format(port))
+
+
+def record_consumed(consumer, name, msg):
+    """Count a consumed Kafka message and update the lag of its partition.
+
+    The lag is computed from the offsets known by the consumer, without a call to the brokers.
+
+    Args:
+        consumer (KafkaConsumer): The consumer
+        name (str): The name of the consumer, e.g. `metric_collector`
+        msg (ConsumerRecord): The message consumed last
+
+    """
+    KAFKA_MESSAGES.labels(name).inc()
+    highwater = getattr(consumer, 'highwater', None)
+    if highwater is None:
+        return
+    partition = TopicPartition(msg.topic, msg.partition)
+    end = highwater(partition)
+    if end is not None:
+        KAFKA_LAG.labels(name, '{}-{}'.format(msg.topic, msg.partition)).set(max(0, end - msg.offset - 1))
@@ -0,0 +1,8 @@
+from django.db.backends.postgresql import base
+
+from accounting.database import PersistentConnectionMixin
+
+
+class DatabaseWrapper(PersistentConnectionMixin, base.DatabaseWrapper):
+    """PostgreSQL backend with timed connects and health checks of persistent connections."""
+    pass
@@ -0,0 +1,216 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils.crypto import constant_time_compare
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+# The header that a client sends, with the profiling token as its value, to profile its request
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# The header of the response that names the artifacts of a profiled request
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+# The prefix of the statements that show the plan of a query, per database vendor
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN',
+    'sqlite': 'EXPLAIN QUERY PLAN',
+    'mysql': 'EXPLAIN',
+}
+
+_local = threading.local()
+_state = {'toggled': False}
+
+
+def enabled():
+    """Whether the executions of the commands and tasks are profiled, as set by `ACC_PROFILING` or `SIGUSR2`."""
+    return settings.PROFILING['ENABLED'] != _state['toggled']
+
+
+def toggle(signum=None, frame=None):
+    """Switch the profiling of the process on or off; the handler of `SIGUSR2`."""
+    _state['toggled'] = not _state['toggled']
+    logger.warning('Profiling {}'.format('enabled' if enabled() else 'disabled'))
+
+
+def install_signal_handler():
+    """Switch the profiling of the process on and off on `SIGUSR2`, e.g. `kill -USR2 <pid>`."""
+    signal.signal(signal.SIGUSR2, toggle)
+
+
+def current_session():
+    """The profiling session of the current thread, if any."""
+    return getattr(_local, 'session', None)
+
+
+class Session(object):
+    """Profiling Session Class.
+
+    Profiles an execution, i.e. a request, a task or a message, and times its queries. When the execution
+    ends, the profile and the queries slower than `SLOW_QUERY_MS`, along with their plan, are written under
+    `PROFILING['DIR']`, provided that the execution was slower than `SLOW_SECONDS` or that `keep` is set.
+    """
+
+    def __init__(self, label, keep=False):
+        """Profiling Session Class Constructor.
+
+        Args:
+            label (str): What is profiled, e.g. `GET /api/v1/vdus` or `metric_collector.tasks.send_metrics`
+            keep (bool, optional): Write the artifacts regardless of the duration
+        """
+        self.label = label
+        self.keep = keep
+        self.slow_queries = []
+        self.duration = None
+        self.__start = None
+        if settings.PROFILING['ENGINE'] == 'pyinstrument' and PyinstrumentProfiler is not None:
+            self.profiler = PyinstrumentProfiler()
+        else:
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        _local.session = self
+        self.__start = time.perf_counter()
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self):
+        """End the session.
+
+        Returns:
+            name (str): The common name of the artifacts written, or None if the execution was fast
+        """
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        self.duration = time.perf_counter() - self.__start
+        _local.session = None
+        if not self.keep and self.duration < settings.PROFILING['SLOW_SECONDS']:
+            return None
+        return self.write()
+
+    def record_query(self, db, sql, params, duration, explainable=True):
+        if duration * 1000 >= settings.PROFILING['SLOW_QUERY_MS']:
+            self.slow_queries.append((db, sql, params if explainable else None, duration, explainable))
+
+    def write(self):
+        """Write the profile and the slow queries of the session.
+
+        Returns:
+            name (str): The common name of the artifacts
+        """
+        directory = settings.PROFILING['DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = '{}-{}-{}'.format(time.strftime('%Y%m%dT%H%M%S'), os.getpid(),
+                                 re.sub(r'[^A-Za-z0-9_.-]+', '_', self.label).strip('_')[:80])
+        path = os.path.join(directory, name)
+
+        if isinstance(self.profiler, cProfile.Profile):
+            self.profiler.dump_stats(path + '.prof')
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(60)
+            report = output.getvalue()
+        else:
+            report = self.profiler.output_text(unicode=True)
+        with open(path + '.txt', 'w') as f:
+            f.write('{} took {:.3f}s\n\n{}'.format(self.label, self.duration, report))
+
+        if self.slow_queries:
+            with open(path + '.sql.txt', 'w') as f:
+                for db, sql, params, duration, explainable in self.slow_queries:
+                    f.write('-- {:.1f}ms on {}\n{}\n-- params: {}\n'.format(duration * 1000, db.alias, sql, params))
+                    if explainable:
+                        f.write('-- plan:\n{}\n'.format(explain(db, sql, params)))
+                    f.write('\n')
+
+        logger.warning('{} took {:.3f}s; profile written to {}'.format(self.label, self.duration, path))
+        return name
+
+
+def explain(db, sql, params):
+    """The plan of a query, as reported by the database.
+
+    Args:
+        db (DatabaseWrapper): The connection that ran the query
+        sql (str): The query
+        params (list or dict): The parameters of the query
+
+    Returns:
+        plan (str): The lines of the plan, or the reason it could not be obtained
+    """
+    prefix = EXPLAIN_PREFIXES.get(db.vendor)
+    if prefix is None:
+        return 'EXPLAIN is not supported on {}'.format(db.vendor)
+    try:
+        with db.cursor() as cursor:
+            cursor.execute('{} {}'.format(prefix, sql), params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as e:
+        return 'EXPLAIN failed: {}'.format(e)
+
+
+@contextmanager
+def profile(label, keep=False):
+    """Profile a block if profiling is enabled and no other session is active on the thread.
+
+    Args:
+        label (str): What is profiled
+        keep (bool, optional): Write the artifacts regardless of the duration
+
+    Examples:
+        >>> with profiling.profile('metric_collector.save_metric'):
+        >>>     save_metric(msg.value)
+
+    """
+    if current_session() is not None or not (keep or enabled()):
+        yield None
+        return
+    session = Session(label, keep)
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """Profiling Middleware.
+
+    Profiles the requests that carry the `X-Profile` header with the value of `ACC_PROFILING_TOKEN`, and
+    writes their artifacts whatever their duration, or all the requests if profiling is enabled, writing
+    those of the slow ones. The name of the artifacts is returned in the `X-Profile-Id` header.
+    """
+
+    def process_request(self, request):
+        token = settings.PROFILING['TOKEN']
+        requested = bool(token) and constant_time_compare(request.META.get(PROFILE_HEADER, ''), token)
+        if current_session() is None and (requested or enabled()):
+            request.profiling_session = Session('{} {}'.format(request.method, request.path), keep=requested)
+            request.profiling_session.start()
+
+    def process_response(self, request, response):
+        session = getattr(request, 'profiling_session', None)
+        if session is not None and current_session() is session:
+            name = session.stop()
+            if name is not None:
+                response[PROFILE_ID_HEADER] = name
+        return response
@@ -11,7 +11,7 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(os.path.join(__file__, os.pardir)
 # =================================
 # DEBUG SETTINGS
 # =================================
-DEBUG = os.getenv('ACC_DEBUG')
+DEBUG = os.getenv('ACC_DEBUG', 'false').lower() == 'true'
 
 # =================================
 # Accounting ADMIN/MANAGER
@@ -32,12 +32,21 @@ ALLOWED_HOSTS = ['*']
 # =================================
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'accounting.postgresql',
         'NAME': os.getenv('ACC_DB_NAME'),
         'USER': os.getenv('ACC_DB_USER'),
         'PASSWORD': os.getenv('ACC_DB_PASSWORD'),
         'HOST': os.getenv('ACC_DB_HOST'),
-        'PORT': os.getenv('ACC_DB_PORT')
+        'PORT': os.getenv('ACC_DB_PORT'),
+        # Seconds a connection is reused by the requests and tasks of a process; 0 closes it after each one
+        'CONN_MAX_AGE': int(os.getenv('ACC_DB_CONN_MAX_AGE', 60)),
+        # Check that a persistent connection still works before a request or task reuses it
+        'HEALTH_CHECKS': os.getenv('ACC_DB_HEALTH_CHECKS', 'true').lower() == 'true',
+        # pgbouncer in transaction pooling mode does not support server-side cursors
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('ACC_DB_PGBOUNCER', 'false').lower() == 'true',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('ACC_DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 MIN_STR_LEN, MID_STR_LEN, MAX_STR_LEN = 16, 64, 256
@@ -66,6 +75,7 @@ INSTALLED_APPS = [
 # MIDDLEWARES MANAGEMENT
 # ==================================
 MIDDLEWARE_CLASSES = [
+    'accounting.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -144,11 +154,11 @@ USE_L10N = True
 REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
-        'rest_framework_xml.parsers.XMLParser',
+        'api.parsers.XMLParser',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework_xml.renderers.XMLRenderer',
+        'api.renderers.FastJSONRenderer',
+        'api.renderers.XMLRenderer',
     ),
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
     'TEST_REQUEST_RENDERER_CLASSES': (
@@ -157,9 +167,22 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-    )
+    ),
+    'DEFAULT_FILTER_BACKENDS': (
+        'api.filters.QueryParameterFilter',
+        'api.filters.SparseFieldsFilter',
+        'rest_framework.filters.OrderingFilter',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CursorPagination',
+    'PAGE_SIZE': int(os.getenv('ACC_API_PAGE_SIZE', 100)),
 }
 
+# The largest page size that a client may request with `?page_size=`
+API_MAX_PAGE_SIZE = int(os.getenv('ACC_API_MAX_PAGE_SIZE', 1000))
+
+# The JSON library of the API responses: auto (orjson or ujson if installed), orjson, ujson or json
+API_JSON_BACKEND = os.getenv('ACC_API_JSON_BACKEND', 'auto')
+
 # =================================
 # STATIC FILES SETTINGS
 # =================================
@@ -169,6 +192,29 @@ STATIC_URL = '/static/'
 # ==================================
 # LOGGING SETTINGS
 # ==================================
+# The level of the application loggers; DEBUG also logs the bodies of the OSM responses and billing calls
+LOG_LEVEL = os.getenv('ACC_LOG_LEVEL', 'INFO').upper()
+
+# The format of the log files: json (a JSON object per line) or text
+LOG_FORMAT = os.getenv('ACC_LOG_FORMAT', 'json')
+
+# One in this many per-message events (e.g. each metric saved or consumption sent) is logged
+LOG_SAMPLE_RATE = int(os.getenv('ACC_LOG_SAMPLE_RATE', 100))
+
+
+def log_file_handler(name):
+    """The handler of a log file, written by a background thread so that logging does not block the caller."""
+    return {
+        'level': 'DEBUG',
+        '()': 'accounting.log.AsyncHandler',
+        'target': 'logging.handlers.RotatingFileHandler',
+        'filename': str(PROJECT_ROOT) + "/logs/{}.log".format(name),
+        'maxBytes': 2024 * 2024,
+        'backupCount': 5,
+        'formatter': 'json' if LOG_FORMAT == 'json' else 'text',
+    }
+
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': True,
@@ -177,11 +223,19 @@ LOGGING = {
             'format': "[%(asctime)s] - [%(name)s:%(lineno)s] - [%(levelname)s] %(message)s",
             'datefmt': "%d/%b/%Y %H:%M:%S"
         },
+        'text': {
+            '()': 'accounting.log.TextFormatter',
+            'format': "[%(asctime)s] - [%(name)s:%(lineno)s] - [%(levelname)s] %(message)s",
+            'datefmt': "%d/%b/%Y %H:%M:%S"
+        },
+        'json': {
+            '()': 'accounting.log.JSONFormatter',
+        },
     },
     'filters': {
         'require_debug_false': {
             '()': 'django.utils.log.RequireDebugFalse'
-        }
+        },
     },
     'handlers': {
         'mail_admins': {
@@ -189,46 +243,11 @@ LOGGING = {
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
         },
-        'api': {
-            'level': 'DEBUG',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': str(PROJECT_ROOT) + "/logs/api.log",
-            'maxBytes': 2024 * 2024,
-            'backupCount': 5,
-            'formatter': 'standard',
-        },
-        'openmanoapi': {
-            'level': 'DEBUG',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': str(PROJECT_ROOT) + "/logs/openmanoapi.log",
-            'maxBytes': 2024 * 2024,
-            'backupCount': 5,
-            'formatter': 'standard',
-        },
-        'nbiapi': {
-            'level': 'DEBUG',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': str(PROJECT_ROOT) + "/logs/nbiapi.log",
-            'maxBytes': 2024 * 2024,
-            'backupCount': 5,
-            'formatter': 'standard',
-        },
-        'accounting_client': {
-            'level': 'DEBUG',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': str(PROJECT_ROOT) + "/logs/accounting_client.log",
-            'maxBytes': 2024 * 2024,
-            'backupCount': 5,
-            'formatter': 'standard',
-        },
-        'metric_collector': {
-            'level': 'DEBUG',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': str(PROJECT_ROOT) + "/logs/metric_collector.log",
-            'maxBytes': 2024 * 2024,
-            'backupCount': 5,
-            'formatter': 'standard',
-        },
+        'api': log_file_handler('api'),
+        'openmanoapi': log_file_handler('openmanoapi'),
+        'nbiapi': log_file_handler('nbiapi'),
+        'accounting_client': log_file_handler('accounting_client'),
+        'metric_collector': log_file_handler('metric_collector'),
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
@@ -241,44 +260,40 @@ LOGGING = {
             'propagate': True,
             'level': 'WARN',
         },
-        'django.db.backends': {
-            'handlers': ['console'],
-            'level': 'DEBUG',
-            'propagate': False,
-        },
         'api': {
             'handlers': ['api'],
-            'level': 'INFO',
+            'level': LOG_LEVEL,
         },
         'openmanoapi': {
             'handlers': ['openmanoapi'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
         },
         'nbiapi': {
             'handlers': ['nbiapi'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
         },
         'accounting_client': {
             'handlers': ['accounting_client'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
         },
         'metric_collector': {
             'handlers': ['metric_collector'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
         },
     }
 }
 
-# ==================================
-#   CACHE SETTINGS
-# ==================================
-# Cache time to live is 30 minutes.
-CACHE_TTL = 60 * 30
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# =================================
+# TRACING SETTINGS
+# =================================
+TRACING = {
+    # Where the spans are exported: none (tracing disabled), file (OTLP/JSON lines) or otlp (OTLP/HTTP collector)
+    'EXPORTER': os.getenv('ACC_TRACING_EXPORTER', 'none'),
+    'FILE': os.getenv('ACC_TRACING_FILE', os.path.join(PROJECT_ROOT, 'logs', 'traces.jsonl')),
+    'OTLP_ENDPOINT': os.getenv('ACC_TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+    # The share of the traces that are exported
+    'SAMPLE_RATIO': float(os.getenv('ACC_TRACING_SAMPLE_RATIO', 1.0)),
+    'SERVICE_NAME': 'accounting',
 }
 
 # =================================
@@ -315,6 +330,26 @@ BROKER_URL = 'redis://{}:{}/0'.format(REDIS_HOST, REDIS_PORT)
 BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 3600}
 RESULT_BACKEND = 'redis://{}:{}/0'.format(REDIS_HOST, REDIS_PORT)
 
+# ==================================
+#   CACHE SETTINGS
+# ==================================
+# Cache time to live is 30 minutes.
+CACHE_TTL = 60 * 30
+
+# Shared by all the processes of the API, so that an invalidation reaches every worker. If Redis is
+# unreachable, the cache misses and the API queries the database.
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://{}:{}/1'.format(REDIS_HOST, REDIS_PORT),
+        'TIMEOUT': CACHE_TTL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'IGNORE_EXCEPTIONS': True,
+        }
+    }
+}
+
 # ==================================
 #   CELERY SETTINGS
 # ==================================
@@ -327,12 +362,44 @@ CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULE = {
     'send_metrics': {
         'task': 'metric_collector.tasks.send_metrics',
-        'schedule': timedelta(seconds=300)
+        'schedule': timedelta(seconds=300),
+        # A run left waiting in the queue past the next one is dropped
+        'options': {'expires': 300},
+    },
+    'drain_billing_outbox': {
+        'task': 'accounting_client.tasks.drain_billing_outbox',
+        'schedule': timedelta(seconds=30),
+        'options': {'expires': 30},
     }
 }
+# Each workload has its own queue, consumed by its own worker (see config/supervisor/accounting.conf), so that
+# a backlog of one never delays the others: the metric dispatch, the billing calls and the lifecycle events.
+# Tasks not routed here go to the default `celery` queue, consumed by the lifecycle worker.
+CELERY_TASK_ROUTES = {
+    'metric_collector.tasks.*': {'queue': 'metrics'},
+    'accounting_client.tasks.*': {'queue': 'billing'},
+    'api.tasks.*': {'queue': 'lifecycle'},
+}
 
 # =================================
 #    DB INSTANCE DEFAULT VALUES
 # =================================
 MANO_ID = os.getenv('ACC_MANO_ID')
 NFVIPOP_ID = os.getenv('ACC_NFVIPOP_ID')
+
+# =================================
+# PROFILING SETTINGS
+# =================================
+PROFILING = {
+    # Profile every request, task and Kafka message, writing the artifacts of the slow ones; toggled by SIGUSR2
+    'ENABLED': os.getenv('ACC_PROFILING', 'false').lower() == 'true',
+    # The value of the `X-Profile` header that profiles a single request; header profiling is off if empty
+    'TOKEN': os.getenv('ACC_PROFILING_TOKEN', ''),
+    # cprofile, or pyinstrument if installed
+    'ENGINE': os.getenv('ACC_PROFILING_ENGINE', 'cprofile'),
+    # The executions slower than this are written
+    'SLOW_SECONDS': float(os.getenv('ACC_PROFILING_SLOW_SECONDS', 1.0)),
+    # The queries of a profiled execution slower than this are written with their EXPLAIN
+    'SLOW_QUERY_MS': float(os.getenv('ACC_PROFILING_SLOW_QUERY_MS', 100)),
+    'DIR': os.getenv('ACC_PROFILING_DIR', os.path.join(PROJECT_ROOT, 'logs', 'profiles')),
+}
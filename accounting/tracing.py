@@ -0,0 +1,338 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Kinds of span, as numbered by OTLP
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+
+# Status codes of span, as numbered by OTLP
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+# The W3C Trace Context header that carries the trace across processes
+TRACEPARENT = 'traceparent'
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Spans exported per batch and seconds between two exports
+BATCH_SIZE = 512
+EXPORT_INTERVAL = 5
+QUEUE_SIZE = 10000
+
+_context = threading.local()
+
+
+class SpanContext(object):
+    """The identity of a span, as propagated to its children and across processes."""
+    __slots__ = ('trace_id', 'span_id', 'sampled')
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @property
+    def traceparent(self):
+        return '00-{}-{}-{}'.format(self.trace_id, self.span_id, '01' if self.sampled else '00')
+
+
+class Span(SpanContext):
+    """Span Class.
+
+    A timed operation of a trace, with its attributes and status. Finished spans are exported if their
+    trace was sampled.
+    """
+    __slots__ = ('name', 'kind', 'parent_id', 'start', 'end', 'attributes', 'status', 'status_message', 'events')
+
+    def __init__(self, name, kind=INTERNAL, parent=None, attributes=None):
+        """Span Class Constructor.
+
+        Args:
+            name (str): The name of the operation
+            kind (int, optional): INTERNAL, SERVER, CLIENT, PRODUCER or CONSUMER
+            parent (SpanContext, optional): The parent span; the span starts a new trace if omitted
+            attributes (dict, optional): The attributes of the span
+        """
+        if parent is None:
+            super(Span, self).__init__(os.urandom(16).hex(), os.urandom(8).hex(),
+                                       random.random() < settings.TRACING['SAMPLE_RATIO'])
+        else:
+            super(Span, self).__init__(parent.trace_id, os.urandom(8).hex(), parent.sampled)
+        self.name = name
+        self.kind = kind
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_message = None
+        self.events = []
+        self.start = time.time()
+        self.end = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def record_exception(self, exception):
+        """Mark the span as failed and add the exception as an event, following the OpenTelemetry conventions."""
+        self.set_error('{}: {}'.format(type(exception).__name__, exception))
+        self.events.append(('exception', time.time(), {'exception.type': type(exception).__name__,
+                                                       'exception.message': str(exception)}))
+
+    def finish(self):
+        self.end = time.time()
+        if self.sampled:
+            exporter.export(self)
+
+    def to_otlp(self):
+        """The span in the OTLP/JSON encoding."""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(int(self.start * 1e9)),
+            'endTimeUnixNano': str(int(self.end * 1e9)),
+            'attributes': otlp_attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        if self.events:
+            span['events'] = [{'name': name, 'timeUnixNano': str(int(moment * 1e9)),
+                               'attributes': otlp_attributes(attributes)} for name, moment, attributes in self.events]
+        return span
+
+
+class NonRecordingSpan(object):
+    """Stand-in for a span while tracing is disabled."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+
+def otlp_attributes(attributes):
+    """Encode attributes as OTLP/JSON key-values."""
+    encoded = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = {'boolValue': value}
+        elif isinstance(value, int):
+            value = {'intValue': str(value)}
+        elif isinstance(value, float):
+            value = {'doubleValue': value}
+        else:
+            value = {'stringValue': str(value)}
+        encoded.append({'key': key, 'value': value})
+    return encoded
+
+
+def enabled():
+    return settings.TRACING['EXPORTER'] != 'none'
+
+
+def current_span():
+    """The span active on the current thread, if any."""
+    return getattr(_context, 'span', None)
+
+
+def traceparent():
+    """The W3C `traceparent` header of the active span, or None outside of a trace."""
+    span = current_span()
+    return span.traceparent if span is not None else None
+
+
+def extract(header):
+    """Parse a W3C `traceparent` header.
+
+    Returns:
+        context (SpanContext): The remote parent span, or None if the header is missing or invalid
+    """
+    match = TRACEPARENT_PATTERN.match(header or '')
+    if match is None:
+        return None
+    return SpanContext(match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1)
+
+
+def activate(span):
+    """Make a span the active one of the current thread.
+
+    Returns:
+        previous (SpanContext): The span active until now, to restore with `activate` once the span ends
+    """
+    previous = current_span()
+    _context.span = span
+    return previous
+
+
+@contextmanager
+def use_span(span):
+    """Make a span, e.g. that of another thread, the active one within the block."""
+    previous = activate(span)
+    try:
+        yield span
+    finally:
+        activate(previous)
+
+
+@contextmanager
+def start_span(name, kind=INTERNAL, parent=None, attributes=None):
+    """Trace a block as a span, child of the active span or of `parent`.
+
+    The span ends with the block, marked as failed if the block raised.
+
+    Args:
+        name (str): The name of the operation
+        kind (int, optional): INTERNAL, SERVER, CLIENT, PRODUCER or CONSUMER
+        parent (SpanContext, optional): The parent span, e.g. extracted from a `traceparent` header; the
+            active span by default
+        attributes (dict, optional): The attributes of the span
+
+    Examples:
+        >>> with tracing.start_span('nbi.get_ns', tracing.CLIENT, attributes={'ns.id': ns_uuid}) as span:
+        >>>     response = nslcm.get_ns(ns_uuid)
+        >>>     span.set_attribute('http.status_code', response.status_code)
+
+    """
+    if not enabled():
+        yield NON_RECORDING_SPAN
+        return
+    span = Span(name, kind, parent or current_span(), attributes)
+    previous = activate(span)
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        raise
+    finally:
+        activate(previous)
+        span.finish()
+
+
+def traced(function):
+    """Trace each call of a function as a span, named after the function.
+
+    Examples:
+        >>> @tracing.traced
+        >>> def ns_instantiation_handler(ns):
+        >>>     ...
+
+    """
+    name = '{}.{}'.format(function.__module__, function.__name__)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with start_span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+class Exporter(object):
+    """Span Exporter Class.
+
+    Collects the finished spans in a queue and writes them in batches from a background thread, either
+    to a file of OTLP/JSON lines or to an OTLP/HTTP collector. Spans are dropped rather than blocking the
+    traced code when the queue is full. The thread is restarted in forked processes and flushed at exit.
+    """
+
+    def __init__(self):
+        self.__queue = None
+        self.__thread = None
+        self.__pid = None
+        self.__lock = threading.Lock()
+        self.dropped = 0
+        atexit.register(self.shutdown)
+
+    def __start(self):
+        with self.__lock:
+            if self.__pid == os.getpid():
+                return
+            self.__queue = queue.Queue(QUEUE_SIZE)
+            self.__thread = threading.Thread(target=self.__run, name='tracing-exporter', daemon=True)
+            self.__thread.start()
+            self.__pid = os.getpid()
+
+    def export(self, span):
+        if self.__pid != os.getpid():
+            self.__start()
+        try:
+            self.__queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def __run(self):
+        spans_queue = self.__queue
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                try:
+                    span = spans_queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.write(batch)
+                except Exception as e:
+                    logger.warning('Could not export {} spans: {}'.format(len(batch), e))
+
+    def write(self, spans):
+        """Write a batch of spans to the file or the collector set in `TRACING`."""
+        request = {
+            'resourceSpans': [{
+                'resource': {'attributes': otlp_attributes({
+                    'service.name': settings.TRACING['SERVICE_NAME'], 'process.pid': os.getpid()})},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in spans]}],
+            }]
+        }
+        if settings.TRACING['EXPORTER'] == 'otlp':
+            response = requests.post(settings.TRACING['OTLP_ENDPOINT'], json=request, timeout=10)
+            response.raise_for_status()
+        else:
+            with open(settings.TRACING['FILE'], 'a') as f:
+                f.write(json.dumps(request) + '\n')
+
+    def shutdown(self):
+        """Export the pending spans and stop the thread."""
+        if self.__pid != os.getpid() or self.__thread is None:
+            return
+        try:
+            self.__queue.put(None, timeout=1)
+        except queue.Full:
+            return
+        self.__thread.join(timeout=EXPORT_INTERVAL * 2)
+        self.__pid = None
+
+
+exporter = Exporter()
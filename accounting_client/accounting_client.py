@@ -1,13 +1,21 @@
 import json
 import logging
-from time import time
-
-from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN
-
-from accounting_client.config import BASE_URL, ACCOUNTING_PASSWORD, ACCOUNTING_USERNAME, AUTH_URL, CLOSE_SESSIONS
+import threading
+from time import time, monotonic
+
+from requests.exceptions import RequestException
+from rest_framework.status import HTTP_200_OK, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, \
+    HTTP_429_TOO_MANY_REQUESTS, HTTP_500_INTERNAL_SERVER_ERROR
+
+from accounting.log import SampledLogger
+from accounting_client.config import BASE_URL, ACCOUNTING_PASSWORD, ACCOUNTING_USERNAME, AUTH_URL, CLOSE_SESSIONS, \
+    TIMEOUT, CIRCUIT_BREAKER, CONCURRENCY_LIMIT
+from accounting_client.exceptions import BillingServiceError, CircuitOpen
+from accounting_client.resilience import AdaptiveLimiter, CircuitBreaker
 from httpclient.client import Client
 
 logger = logging.getLogger(__name__)
+sampled_logger = SampledLogger(logger)
 
 
 class AccountingClient(object):
@@ -17,14 +25,23 @@ class AccountingClient(object):
     as they are deployed in ENG's cloud. The methods implemented in this class are intended
     for logging in to the services and opening/closing of NS, VNF and VDU sessions.
 
+    Every call has a timeout and passes through the circuit breaker of its endpoint and an
+    adaptive concurrency limiter shared by all endpoints, so that a slow or failing service
+    rejects calls quickly with a BillingServiceError instead of blocking the callers.
+
     """
 
     __instance = None
 
     def __init__(self):
         """Accounting Client Class Constructor."""
-        self.__client = Client(verify_ssl_cert=True)
+        self.__client = Client(verify_ssl_cert=True, timeout=TIMEOUT, upstream='billing')
         self.__headers = {'Content-Type': 'application/json'}
+        self.__breakers = {}
+        self.__breakers_lock = threading.Lock()
+        self.__limiter = AdaptiveLimiter(
+            'billing', initial_limit=CONCURRENCY_LIMIT['INITIAL'], min_limit=CONCURRENCY_LIMIT['MIN'],
+            max_limit=CONCURRENCY_LIMIT['MAX'], latency_threshold=CONCURRENCY_LIMIT['LATENCY_THRESHOLD'])
         self.login()
 
     # Singleton Class
@@ -41,11 +58,69 @@ class AccountingClient(object):
             'username': ACCOUNTING_USERNAME,
             'password': ACCOUNTING_PASSWORD
         }
-        response = self.__client.post(url=AUTH_URL, headers=self.__headers, payload=json.dumps(payload))
+        try:
+            response = self.__call('post', AUTH_URL, payload)
+        except BillingServiceError as e:
+            logger.error('Could not log on the accounting service: {}'.format(e))
+            return
         if response.status_code == HTTP_200_OK:
             self.__headers['Authorization'] = 'Bearer {}'.format(json.loads(response.text)['id_token'])
             logger.info('Successfully logged on the accounting service')
 
+    def status(self):
+        """Report the state of the circuit breakers and of the concurrency limiter.
+
+        Returns:
+            status (dict): The status of the circuit breaker per endpoint and of the concurrency limiter
+
+        """
+        with self.__breakers_lock:
+            breakers = list(self.__breakers.values())
+        return {
+            'breakers': {breaker.name: breaker.status() for breaker in breakers},
+            'concurrency': self.__limiter.status()
+        }
+
+    def __breaker(self, url):
+        name = url.rsplit('/', 1)[-1]
+        with self.__breakers_lock:
+            if name not in self.__breakers:
+                self.__breakers[name] = CircuitBreaker(name, failure_threshold=CIRCUIT_BREAKER['FAILURE_THRESHOLD'],
+                                                       reset_timeout=CIRCUIT_BREAKER['RESET_TIMEOUT'])
+            return self.__breakers[name]
+
+    def __call(self, method, url, payload=None):
+        """Call an endpoint through its circuit breaker and the concurrency limiter.
+
+        Server errors, throttling, timeouts and connection errors count as failures; any other
+        response is returned to the caller.
+
+        Raises:
+            BillingServiceError: If the call is rejected or fails to reach the service
+
+        """
+        breaker = self.__breaker(url)
+        self.__limiter.acquire()
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            self.__limiter.cancel()
+            raise
+        start, success = monotonic(), False
+        try:
+            if method == 'get':
+                response = self.__client.get(url=url, headers=self.__headers)
+            else:
+                response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
+            success = response.status_code < HTTP_500_INTERNAL_SERVER_ERROR and \
+                response.status_code != HTTP_429_TOO_MANY_REQUESTS
+            return response
+        except RequestException as e:
+            raise BillingServiceError('{} {} failed: {}'.format(method.upper(), url, e))
+        finally:
+            breaker.record(success)
+            self.__limiter.release(success, monotonic() - start)
+
     def available_user_resource_list(self):
         """Get the available user resource list.
 
@@ -54,42 +129,53 @@ class AccountingClient(object):
 
         """
         url = BASE_URL + '/availableUserResourceList'
-        response = self.__client.get(url=url, headers=self.__headers)
+        response = self.__call('get', url)
         if response.status_code == HTTP_200_OK:
             return response
         return None
 
-    def open_session_retrial(self, url, payload):
-        """Retry opening a session after the authorization token has expired.
+    def post(self, url, payload):
+        """Post a payload to the Accounting/Billing Service, logging in again if the token has expired.
 
         Args:
-            url (str): The url for the session opening request
-            payload (dict): The essential data to post for session opening
+            url (str): The url of the API call
+            payload (dict): The payload to send to the API call
 
         Returns:
-            session_id (int): The ID of the session that was opened
+            response (Response): The successful response as a requests object
 
-        """
-        self.login()
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        if response.status_code == HTTP_200_OK:
-            session_id = int(response.text)
-            logger.info('Opened session with id {}'.format(session_id))
-            return session_id
+        Raises:
+            BillingServiceError: If the service does not respond with HTTP 200 or the call is rejected
 
-    def open_ns_session(self, ns):
+        """
+        response = self.__call('post', url, payload)
+        if response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
+            logger.warning('Token has expired and POST {} failed; retrying'.format(url))
+            self.login()
+            response = self.__call('post', url, payload)
+        logger.debug('POST %s response: %s, Status code: %s', url, response.text, response.status_code)
+        if response.status_code != HTTP_200_OK:
+            raise BillingServiceError('POST {} returned HTTP status {}: {}'.format(url, response.status_code,
+                                                                                 response.text))
+        return response
+
+    def open_ns_session(self, ns, timestamp=None):
         """Open a Network Service (NS) Session.
 
         Args:
             ns (obj): An NS Instance object
+            timestamp (float, optional): The time the session started at; now if omitted
 
         Returns:
             ns_session_id (int): The ID of the opened NS session
 
+        Raises:
+            BillingServiceError: If the session could not be opened
+
         """
         url = BASE_URL + '/openNsSession'
         payload = {
-            'timestamp_sec': time(),
+            'timestamp_sec': timestamp or time(),
             'catalog_tenant': ns.catalog_tenant,
             'catalog_user': ns.catalog_user,
             'mano_id': ns.mano_id,
@@ -99,61 +185,59 @@ class AccountingClient(object):
             'ns_id': ns.uuid,
             'ns_name': ns.name
         }
-        logger.info('Attempting to open ns session with payload {}'.format(payload))
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        logger.debug('Open ns session response: {}, Status code: {}'.format(response.text, response.status_code))
-        if response.status_code == HTTP_200_OK:
-            ns_session_id = int(response.text)
-            logger.info('Opened ns session with id {}'.format(ns_session_id))
-            return ns_session_id
-        elif response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
-            logger.warning('Token has expired  and open_ns_sesion failed; retrying')
-            return self.open_session_retrial(url, payload)
-
-    def open_vnf_session(self, ns_session_id, vnf_uuid, vnf_name):
+        logger.debug('Attempting to open ns session with payload %s', payload)
+        response = self.post(url, payload)
+        ns_session_id = int(response.text)
+        logger.info('Opened ns session', extra={'ns_id': ns.uuid, 'session_id': ns_session_id})
+        return ns_session_id
+
+    def open_vnf_session(self, ns_session_id, vnf_uuid, vnf_name, timestamp=None):
         """Open a Virtual Network Function (VNF) Session.
 
         Args:
             ns_session_id (int): The id of the NS session where the VNF belongs
             vnf_uuid (str): The UUID of the VNF
             vnf_name (str): The name of the VNF
+            timestamp (float, optional): The time the session started at; now if omitted
 
         Returns:
             vnf_session_id (int): The ID of the opened VNF session
 
+        Raises:
+            BillingServiceError: If the session could not be opened
+
         """
         url = BASE_URL + '/openVnfSession'
         payload = {
-            'timestamp_sec': time(),
+            'timestamp_sec': timestamp or time(),
             'ns_session_id': ns_session_id,
             'vnf_id': vnf_uuid,
             'vnf_name': vnf_name
         }
-        logger.info('Attempting to open vnf session with payload {}'.format(payload))
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        logger.debug('Open vnf session response: {}, Status code: {}'.format(response.text, response.status_code))
-        if response.status_code == HTTP_200_OK:
-            vnf_session_id = int(response.text)
-            logger.info('Opened vnf session with id {}'.format(vnf_session_id))
-            return vnf_session_id
-        elif response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
-            logger.warning('Token has expired  and open_vnf_sesion failed; retrying')
-            return self.open_session_retrial(url, payload)
-
-    def open_vdu_session(self, vnf_session_id, vdu):
+        logger.debug('Attempting to open vnf session with payload %s', payload)
+        response = self.post(url, payload)
+        vnf_session_id = int(response.text)
+        logger.info('Opened vnf session', extra={'vnf_id': vnf_uuid, 'session_id': vnf_session_id})
+        return vnf_session_id
+
+    def open_vdu_session(self, vnf_session_id, vdu, timestamp=None):
         """Open a Virtual Deployment Unit (VDU) session.
 
         Args:
             vnf_session_id (int): The id of the VNF session where the VDU belongs.
             vdu (obj): A VDU object
+            timestamp (float, optional): The time the session started at; now if omitted
 
         Returns:
             vdu_session_id (int): The VDU session id.
 
+        Raises:
+            BillingServiceError: If the session could not be opened
+
         """
         url = BASE_URL + '/openVduSession'
         payload = {
-            'timestamp_sec': time(),
+            'timestamp_sec': timestamp or time(),
             'flavorCpuCount': vdu.vcpu,
             'flavorDiskGb': vdu.vdisk,
             'flavorMemoryMb': vdu.vram,
@@ -162,61 +246,36 @@ class AccountingClient(object):
             'vdu_type': 'FAAS_VNF' if 'faas' in vdu.nfvipop_id.lower() else 'PLAIN_VNF',
             'vnf_session_id': vnf_session_id
         }
-        logger.info('Attempting to open vdu session with payload {}'.format(payload))
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        logger.debug('Open vdu session response: {}, Status code: {}'.format(response.text, response.status_code))
-        if response.status_code == HTTP_200_OK:
-            vdu_session_id = int(response.text)
-            logger.info('Opened vdu session with id {}'.format(vdu_session_id))
-            return vdu_session_id
-        elif response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
-            logger.warning('Token has expired  and open_vdu_sesion failed; retrying')
-            return self.open_session_retrial(url, payload)
-
-    def log_vdu_consumption(self, metric_type, metric_value, vdu_session_id):
+        logger.debug('Attempting to open vdu session with payload %s', payload)
+        response = self.post(url, payload)
+        vdu_session_id = int(response.text)
+        logger.info('Opened vdu session', extra={'vdu_id': vdu.uuid, 'session_id': vdu_session_id})
+        return vdu_session_id
+
+    def log_vdu_consumption(self, metric_type, metric_value, vdu_session_id, timestamp=None):
         """Send measurement of VDU consumption for logging.
 
         Args:
             metric_type (str): The type of metric
             metric_value (double): The value of metric
             vdu_session_id (int): The id of the VDU session that the metric refers to
+            timestamp (float, optional): The time of the measurement; now if omitted
+
+        Raises:
+            BillingServiceError: If the consumption could not be logged
 
         """
         url = BASE_URL + '/logVduConsumption'
         payload = {
-            'timestamp': time(),
+            'timestamp': timestamp or time(),
             'consumption_type': metric_type,
             'consumption_value': metric_value,
             'vdu_session_id': vdu_session_id
         }
-        logger.info('Sending vdu consumption with payload {}'.format(payload))
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        logger.debug('Log vdu consumption response: {}, Status code: {}'.format(response.text, response.status_code))
-        if response.status_code == HTTP_200_OK:
-            logger.info('Vdu consumption logged successfully')
-            return
-        elif response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
-            logger.warning('Token has expired and log_vdu_consumption failed; retrying')
-            self.login()
-            response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-            if response.status_code == HTTP_200_OK:
-                logger.info('Vdu consumption logged successfully')
-                return json.loads(response.text)['id']
-
-    def close_session_retrial(self, url, payload):
-        """Retry closing a session after the authorization token has expired.
-
-        Args:
-            url (str): The url of the API call
-            payload (dict): The payload to send to the API call
-
-        """
-        self.login()
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        if response.status_code == HTTP_200_OK:
-            logger.warning('Session was closed')
-            return
-        return
+        logger.debug('Sending vdu consumption with payload %s', payload)
+        self.post(url, payload)
+        sampled_logger.info('Vdu consumption logged successfully', vdu_session_id=vdu_session_id,
+                            metric=metric_type, value=metric_value)
 
     def close_session(self, session_id, session_type):
         """Close a NS, VNF or VDU session.
@@ -225,19 +284,14 @@ class AccountingClient(object):
             session_id (int): The ID of the session
             session_type (str): The type of the session
 
+        Raises:
+            BillingServiceError: If the session could not be closed
+
         """
         url = BASE_URL + CLOSE_SESSIONS[session_type]
         payload = {'id': session_id}
-        logger.info('Closing {} session with id {}'.format(session_type, session_id))
-        response = self.__client.post(url=url, headers=self.__headers, payload=json.dumps(payload))
-        logger.debug('Close {} session response: {}, Status code: {}'.format(session_type, response.text,
-                                                                             response.status_code))
-        if response.status_code == HTTP_200_OK:
-            logger.info('Successfully closed {} session'.format(session_type))
-            return
-        elif response.status_code in [HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN]:
-            logger.warning('Token has expired and close_session failed; retrying')
-            self.close_session_retrial(url, payload)
-
+        logger.debug('Closing %s session with id %s', session_type, session_id)
+        self.post(url, payload)
+        logger.info('Successfully closed session', extra={'session_type': session_type, 'session_id': session_id})
 
 accounting_client = AccountingClient()
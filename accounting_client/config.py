@@ -20,3 +20,43 @@ CLOSE_SESSIONS = {
     'vnf': '/closeVnfSession',
     'vdu': '/closeVduSession'
 }
+
+# =================================
+# BILLING OUTBOX SETTINGS
+# =================================
+OUTBOX = {
+    # Messages claimed by a single drain of the outbox
+    'BATCH_SIZE': int(os.getenv('ACC_OUTBOX_BATCH_SIZE', 100)),
+    # Concurrent calls to the billing service while draining
+    'CONCURRENCY': int(os.getenv('ACC_OUTBOX_CONCURRENCY', 8)),
+    # Attempts before a message is marked as failed
+    'MAX_ATTEMPTS': int(os.getenv('ACC_OUTBOX_MAX_ATTEMPTS', 10)),
+    # Exponential backoff between attempts, in seconds
+    'BACKOFF_BASE': float(os.getenv('ACC_OUTBOX_BACKOFF_BASE', 5)),
+    'BACKOFF_MAX': float(os.getenv('ACC_OUTBOX_BACKOFF_MAX', 3600)),
+    # Seconds a claimed message stays invisible to other drains
+    'LEASE': float(os.getenv('ACC_OUTBOX_LEASE', 300)),
+    # Trigger a drain as soon as the transaction that wrote messages commits
+    'DRAIN_ON_COMMIT': os.getenv('ACC_OUTBOX_DRAIN_ON_COMMIT', 'true').lower() in ('1', 'true', 'yes'),
+}
+
+# =================================
+# BILLING RESILIENCE SETTINGS
+# =================================
+# Connect and read timeouts of the calls, in seconds
+TIMEOUT = (float(os.getenv('ACC_BILLING_CONNECT_TIMEOUT', 3.05)), float(os.getenv('ACC_BILLING_READ_TIMEOUT', 10)))
+
+CIRCUIT_BREAKER = {
+    # Consecutive failures of an endpoint that open its circuit
+    'FAILURE_THRESHOLD': int(os.getenv('ACC_BILLING_BREAKER_FAILURES', 5)),
+    # Seconds an open circuit waits before probing the endpoint again
+    'RESET_TIMEOUT': float(os.getenv('ACC_BILLING_BREAKER_RESET', 30)),
+}
+
+CONCURRENCY_LIMIT = {
+    'INITIAL': int(os.getenv('ACC_BILLING_CONCURRENCY_INITIAL', 8)),
+    'MIN': int(os.getenv('ACC_BILLING_CONCURRENCY_MIN', 1)),
+    'MAX': int(os.getenv('ACC_BILLING_CONCURRENCY_MAX', 64)),
+    # Calls slower than this, in seconds, reduce the limit like failures do
+    'LATENCY_THRESHOLD': float(os.getenv('ACC_BILLING_LATENCY_THRESHOLD', 2)),
+}
@@ -0,0 +1,18 @@
+class BillingServiceError(Exception):
+    """The Accounting/Billing service rejected or failed a request"""
+    pass
+
+
+class SessionNotOpen(Exception):
+    """The billing session that an operation depends on has not been opened yet"""
+    pass
+
+
+class CircuitOpen(BillingServiceError):
+    """The circuit breaker of a billing endpoint is open and the call was not attempted"""
+    pass
+
+
+class LoadShed(BillingServiceError):
+    """The concurrency limit of the billing service is reached and the call was not attempted"""
+    pass
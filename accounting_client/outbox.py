@@ -0,0 +1,334 @@
+import json
+import logging
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from time import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounting import tracing
+from accounting.celery import app
+from accounting_client.config import OUTBOX
+from accounting_client.exceptions import SessionNotOpen
+from api.models import BillingSession, Instance, OutboxMessage, Vdu, Vnf
+from api.signals import inventory_changed
+
+logger = logging.getLogger(__name__)
+
+OPEN_NS_SESSION = 'open_ns_session'
+OPEN_VNF_SESSION = 'open_vnf_session'
+OPEN_VDU_SESSION = 'open_vdu_session'
+LOG_VDU_CONSUMPTION = 'log_vdu_consumption'
+CLOSE_VDU_SESSION = 'close_vdu_session'
+CLOSE_VNF_SESSION = 'close_vnf_session'
+CLOSE_NS_SESSION = 'close_ns_session'
+
+# The order in which the operations of a batch are delivered: a session is opened after its parent
+# and closed before it. Operations on the same level are delivered concurrently.
+LEVELS = OrderedDict([
+    (OPEN_NS_SESSION, 0),
+    (OPEN_VNF_SESSION, 1),
+    (OPEN_VDU_SESSION, 2),
+    (LOG_VDU_CONSUMPTION, 3),
+    (CLOSE_VDU_SESSION, 4),
+    (CLOSE_VNF_SESSION, 5),
+    (CLOSE_NS_SESSION, 6),
+])
+
+# Operation -> level and state of the session that it opens or closes, as recorded in the session registry
+SESSIONS = {
+    OPEN_NS_SESSION: ('ns', 'open'),
+    OPEN_VNF_SESSION: ('vnf', 'open'),
+    OPEN_VDU_SESSION: ('vdu', 'open'),
+    CLOSE_VDU_SESSION: ('vdu', 'closed'),
+    CLOSE_VNF_SESSION: ('vnf', 'closed'),
+    CLOSE_NS_SESSION: ('ns', 'closed'),
+}
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+DRAIN_TASK = 'accounting_client.tasks.drain_billing_outbox'
+DRAIN_KICK_KEY = 'accounting_client.outbox.drain_kick'
+
+
+def enqueue(operation, instance=None, vnf=None, vdu=None, **payload):
+    """Record a call to the Billing Services, to be delivered once the current transaction commits.
+
+    The message is written in the same transaction as the state change that it reflects, so that
+    either both or none of them persist. The time of the call is kept in the payload, so that a
+    delayed delivery still reports the time the event happened at.
+
+    Args:
+        operation (str): One of the operations of `LEVELS`
+        instance (Instance, optional): The NS Instance that the operation refers to
+        vnf (Vnf, optional): The VNF that the operation refers to
+        vdu (Vdu, optional): The VDU that the operation refers to
+        **payload: Additional arguments of the operation
+
+    Returns:
+        message (OutboxMessage): The recorded message
+
+    Examples:
+        >>> from django.db import transaction
+        >>> from accounting_client import outbox
+        >>> with transaction.atomic():
+        >>>     vdu.save()
+        >>>     outbox.enqueue(outbox.OPEN_VDU_SESSION, vdu=vdu)
+
+    """
+    if operation not in LEVELS:
+        raise ValueError('Unknown billing operation `{}`'.format(operation))
+    payload.setdefault('timestamp', time())
+    message = OutboxMessage.objects.create(operation=operation, instance=instance, vnf=vnf, vdu=vdu,
+                                           payload=json.dumps(payload))
+    transaction.on_commit(kick)
+    return message
+
+
+def enqueue_once(operation, instance=None, vnf=None, vdu=None, **payload):
+    """Record a call that opens or closes a session, unless the session registry shows it was recorded already.
+
+    The call is registered by an insert into the registry, unique on (level, uuid, state), so that concurrent or
+    replayed lifecycle events record it only once, without a call to the Billing Services.
+
+    Args:
+        operation (str): One of the operations of `SESSIONS`
+        instance (Instance, optional): The NS Instance that the operation refers to
+        vnf (Vnf, optional): The VNF that the operation refers to
+        vdu (Vdu, optional): The VDU that the operation refers to
+        **payload: Additional arguments of the operation
+
+    Returns:
+        message (OutboxMessage): The recorded message, or None if the call was recorded already
+
+    """
+    level, state = SESSIONS[operation]
+    entity = instance or vnf or vdu
+    try:
+        with transaction.atomic():
+            BillingSession.objects.create(level=level, uuid=entity.uuid, state=state)
+            return enqueue(operation, instance=instance, vnf=vnf, vdu=vdu, **payload)
+    except IntegrityError:
+        logger.info('Skipping {} of {} as it was recorded already'.format(operation, entity.uuid))
+        return None
+
+
+def registered(level, uuid, state):
+    """Whether a session was recorded as opened or closed in the session registry."""
+    return BillingSession.objects.filter(level=level, uuid=uuid, state=state).exists()
+
+
+def kick():
+    """Schedule a drain of the outbox shortly, unless one has been scheduled already.
+
+    The drains requested within the same second are coalesced into one. If the broker is not
+    reachable, the messages are delivered by the periodic drain instead.
+    """
+    if not OUTBOX['DRAIN_ON_COMMIT'] or not cache.add(DRAIN_KICK_KEY, True, timeout=1):
+        return
+    try:
+        app.send_task(DRAIN_TASK, countdown=1)
+    except Exception as e:
+        logger.warning('Could not schedule a drain of the billing outbox: {}'.format(e))
+
+
+def claim(batch_size):
+    """Claim a batch of pending messages whose delivery is due.
+
+    The claimed messages are leased: they are not claimed again by concurrent drains until the
+    lease expires, so that a drain that dies midway does not lose them.
+
+    Args:
+        batch_size (int): The maximum number of messages to claim
+
+    Returns:
+        messages (list): The claimed messages, oldest first
+
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(OutboxMessage.objects.select_for_update(skip_locked=True)
+                   .filter(state=PENDING, next_attempt_at__lte=now)
+                   .order_by('id').values_list('id', flat=True)[:batch_size])
+        OutboxMessage.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1, next_attempt_at=now + timedelta(seconds=OUTBOX['LEASE']))
+    return list(OutboxMessage.objects.filter(id__in=ids).order_by('id'))
+
+
+def drain(batch_size=None, concurrency=None):
+    """Deliver a batch of pending messages to the Billing Services.
+
+    Messages are delivered level by level (see `LEVELS`) and concurrently within a level. A message
+    that fails is retried with an exponential backoff and marked as failed after `MAX_ATTEMPTS`.
+    Delivered messages are deleted.
+
+    Args:
+        batch_size (int, optional): The maximum number of messages to deliver
+        concurrency (int, optional): The number of concurrent calls to the Billing Services
+
+    Returns:
+        stats (dict): The number of claimed, delivered, retried and failed messages
+
+    """
+    batch_size = batch_size or OUTBOX['BATCH_SIZE']
+    concurrency = concurrency or OUTBOX['CONCURRENCY']
+    messages = claim(batch_size)
+    stats = {'claimed': len(messages), 'delivered': 0, 'retried': 0, 'failed': 0}
+    if not messages:
+        return stats
+
+    waves = {}
+    for message in messages:
+        waves.setdefault(LEVELS[message.operation], []).append(message)
+
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    try:
+        for level in sorted(waves):
+            wave = waves[level]
+            if executor is None or len(wave) == 1:
+                errors = [attempt(message) for message in wave]
+            else:
+                errors = list(executor.map(partial(attempt_in_thread, trace=tracing.current_span()), wave))
+            for message, error in zip(wave, errors):
+                stats[record(message, error)] += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    logger.info('Drained billing outbox', extra=stats)
+    return stats
+
+
+def attempt(message):
+    """Deliver a message, returning the error instead of raising it."""
+    try:
+        with tracing.start_span('outbox.{}'.format(message.operation), attributes={
+                'outbox.message_id': message.id, 'outbox.attempt': message.attempts}):
+            deliver(message)
+    except Exception as e:
+        return e
+    return None
+
+
+def attempt_in_thread(message, trace=None):
+    """Deliver a message on a worker thread, which must release its own database connection.
+
+    Args:
+        message (OutboxMessage): The message
+        trace (Span, optional): The span of the drain, that the delivery is traced under
+    """
+    try:
+        with tracing.use_span(trace):
+            return attempt(message)
+    finally:
+        connection.close()
+
+
+def record(message, error):
+    """Record the outcome of a delivery attempt.
+
+    Returns:
+        outcome (str): One of `delivered`, `retried` or `failed`
+    """
+    messages = OutboxMessage.objects.filter(id=message.id)
+    if error is None:
+        messages.delete()
+        return 'delivered'
+    if message.attempts >= OUTBOX['MAX_ATTEMPTS']:
+        logger.error('Giving up on billing message {} ({}) after {} attempts: {}'.format(
+            message.id, message.operation, message.attempts, error))
+        messages.update(state=FAILED, last_error=str(error))
+        return 'failed'
+    delay = backoff(message.attempts)
+    logger.warning('Billing message {} ({}) failed on attempt {}; retrying in {:.0f}s: {}'.format(
+        message.id, message.operation, message.attempts, delay, error))
+    messages.update(next_attempt_at=timezone.now() + timedelta(seconds=delay), last_error=str(error))
+    return 'retried'
+
+
+def backoff(attempts):
+    """The delay before the next attempt, doubling per attempt up to `BACKOFF_MAX` with jitter.
+
+    Args:
+        attempts (int): The number of attempts made so far
+
+    Returns:
+        delay (float): The delay in seconds
+    """
+    delay = min(OUTBOX['BACKOFF_MAX'], OUTBOX['BACKOFF_BASE'] * 2 ** max(attempts - 1, 0))
+    return random.uniform(delay / 2, delay)
+
+
+def open_session_id(session_id, session_type, uuid):
+    """Return the id of an open session or raise SessionNotOpen if the session has not been opened yet."""
+    if session_id is None or session_id == -1:
+        raise SessionNotOpen('The {} session of {} has not been opened yet'.format(session_type, uuid))
+    return session_id
+
+
+def deliver(message):
+    """Perform the billing call of a message.
+
+    The ids of the parent sessions are read when the message is delivered rather than when it is
+    enqueued, as the parent may have been opened by an earlier message of the outbox. Opened
+    session ids are stored on the respective NS Instance, VNF or VDU.
+
+    Args:
+        message (OutboxMessage): The message to deliver
+
+    Raises:
+        SessionNotOpen: If a session that the operation depends on has not been opened yet
+        BillingServiceError: If the Billing Services reject the call
+
+    """
+    # Imported here, as importing the client logs in to the Billing Services
+    from accounting_client.accounting_client import accounting_client
+
+    operation = message.operation
+    payload = json.loads(message.payload)
+    timestamp = payload.get('timestamp')
+
+    if operation == OPEN_NS_SESSION:
+        ns = Instance.objects.get(id=message.instance_id)
+        ns_session_id = accounting_client.open_ns_session(ns, timestamp)
+        Instance.objects.filter(id=ns.id).update(ns_session_id=ns_session_id)
+        inventory_changed.send(sender=Instance)
+
+    elif operation == OPEN_VNF_SESSION:
+        vnf = Vnf.objects.select_related('instance').get(id=message.vnf_id)
+        ns_session_id = open_session_id(vnf.instance.ns_session_id, 'ns', vnf.instance.uuid)
+        vnf_session_id = accounting_client.open_vnf_session(ns_session_id, vnf.uuid, vnf.name, timestamp)
+        Vnf.objects.filter(id=vnf.id).update(vnf_session_id=vnf_session_id)
+        inventory_changed.send(sender=Vnf)
+
+    elif operation == OPEN_VDU_SESSION:
+        vdu = Vdu.objects.select_related('vnf').get(id=message.vdu_id)
+        vnf_session_id = open_session_id(vdu.vnf.vnf_session_id, 'vnf', vdu.vnf.uuid)
+        vdu_session_id = accounting_client.open_vdu_session(vnf_session_id, vdu, timestamp)
+        Vdu.objects.filter(id=vdu.id).update(vdu_session_id=vdu_session_id)
+        inventory_changed.send(sender=Vdu)
+
+    elif operation == LOG_VDU_CONSUMPTION:
+        vdu = Vdu.objects.get(id=message.vdu_id)
+        vdu_session_id = open_session_id(vdu.vdu_session_id, 'vdu', vdu.uuid)
+        accounting_client.log_vdu_consumption(payload['metric_type'], payload['metric_value'], vdu_session_id,
+                                              timestamp)
+
+    elif operation == CLOSE_VDU_SESSION:
+        vdu = Vdu.objects.get(id=message.vdu_id)
+        accounting_client.close_session(open_session_id(vdu.vdu_session_id, 'vdu', vdu.uuid), 'vdu')
+
+    elif operation == CLOSE_VNF_SESSION:
+        vnf = Vnf.objects.get(id=message.vnf_id)
+        accounting_client.close_session(open_session_id(vnf.vnf_session_id, 'vnf', vnf.uuid), 'vnf')
+
+    elif operation == CLOSE_NS_SESSION:
+        ns = Instance.objects.get(id=message.instance_id)
+        accounting_client.close_session(open_session_id(ns.ns_session_id, 'ns', ns.uuid), 'ns')
@@ -0,0 +1,199 @@
+import logging
+import threading
+from time import monotonic
+
+from accounting_client.exceptions import CircuitOpen, LoadShed
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """Circuit Breaker Class.
+
+    Guards the calls to a single endpoint. After `failure_threshold` consecutive failures the
+    circuit opens and calls are rejected at once with CircuitOpen, instead of waiting on a service
+    that is down. After `reset_timeout` seconds a single probe call is let through (half-open):
+    the circuit closes if it succeeds and opens again if it fails.
+
+    Args:
+        name (str): The name of the guarded endpoint, used in logs and reports
+        failure_threshold (int): The consecutive failures that open the circuit
+        reset_timeout (float): The seconds the circuit stays open before a probe call is allowed
+
+    Examples:
+        >>> breaker = CircuitBreaker('openVduSession', failure_threshold=5, reset_timeout=30)
+        >>> breaker.before_call()
+        >>> breaker.record(success=True)
+
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        """Circuit Breaker Class Constructor."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.__state = CLOSED
+        self.__failures = 0
+        self.__opened_at = None
+        self.__probing = False
+        self.__rejected = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def state(self):
+        """str: The state of the circuit: closed, open or half_open."""
+        with self.__lock:
+            return self.__current_state()
+
+    def __current_state(self):
+        if self.__state == OPEN and monotonic() - self.__opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self.__state
+
+    def __transition(self, state):
+        if state != self.__state:
+            logger.warning('Circuit breaker of {} changed from {} to {}'.format(self.name, self.__state, state))
+            self.__state = state
+
+    def before_call(self):
+        """Admit a call or reject it if the circuit is open.
+
+        Raises:
+            CircuitOpen: If the circuit is open, or half-open with a probe call in flight
+
+        """
+        with self.__lock:
+            state = self.__current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self.__probing:
+                self.__transition(HALF_OPEN)
+                self.__probing = True
+                return
+            self.__rejected += 1
+        raise CircuitOpen('Circuit breaker of {} is {}'.format(self.name, state))
+
+    def record(self, success):
+        """Record the outcome of an admitted call.
+
+        Args:
+            success (bool): Whether the call succeeded
+
+        """
+        with self.__lock:
+            self.__probing = False
+            if success:
+                self.__failures = 0
+                self.__transition(CLOSED)
+                return
+            self.__failures += 1
+            if self.__state == HALF_OPEN or self.__failures >= self.failure_threshold:
+                self.__opened_at = monotonic()
+                self.__transition(OPEN)
+
+    def status(self):
+        """Report the state of the circuit.
+
+        Returns:
+            status (dict): The state, the consecutive failures and the number of rejected calls
+
+        """
+        with self.__lock:
+            return {'state': self.__current_state(), 'consecutive_failures': self.__failures,
+                    'rejected': self.__rejected}
+
+
+class AdaptiveLimiter(object):
+    """Adaptive Concurrency Limiter Class.
+
+    Bounds the calls in flight to a service with an AIMD (additive increase, multiplicative
+    decrease) limit: every call that succeeds within `latency_threshold` seconds raises the limit
+    by `1 / limit`, i.e. by about one per round of calls, while a failure or a slow call multiplies
+    it by `backoff_ratio`. Calls beyond the limit are rejected at once with LoadShed, so that callers
+    back off instead of queuing up on a slow service.
+
+    Args:
+        name (str): The name of the limited service, used in logs and reports
+        initial_limit (int): The limit to start from
+        min_limit (int): The lowest limit
+        max_limit (int): The highest limit
+        latency_threshold (float): The duration in seconds above which a call signals congestion
+        backoff_ratio (float): The factor applied to the limit on congestion
+
+    Examples:
+        >>> limiter = AdaptiveLimiter('billing', initial_limit=8)
+        >>> limiter.acquire()
+        >>> limiter.release(success=True, duration=0.05)
+
+    """
+
+    def __init__(self, name, initial_limit=8, min_limit=1, max_limit=64, latency_threshold=1.0, backoff_ratio=0.5):
+        """Adaptive Concurrency Limiter Class Constructor."""
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.__limit = float(initial_limit)
+        self.__in_flight = 0
+        self.__shed = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """int: The current concurrency limit."""
+        with self.__lock:
+            return int(self.__limit)
+
+    def acquire(self):
+        """Admit a call or reject it if the limit is reached.
+
+        Raises:
+            LoadShed: If as many calls as the limit are already in flight
+
+        """
+        with self.__lock:
+            if self.__in_flight < int(self.__limit):
+                self.__in_flight += 1
+                return
+            self.__shed += 1
+            limit = int(self.__limit)
+        raise LoadShed('{} calls to {} are already in flight'.format(limit, self.name))
+
+    def cancel(self):
+        """Release an admitted call that was not made, without adapting the limit."""
+        with self.__lock:
+            self.__in_flight -= 1
+
+    def release(self, success, duration):
+        """Release an admitted call and adapt the limit to its outcome.
+
+        Args:
+            success (bool): Whether the call succeeded
+            duration (float): The duration of the call in seconds
+
+        """
+        with self.__lock:
+            self.__in_flight -= 1
+            if success and duration <= self.latency_threshold:
+                self.__limit = min(self.max_limit, self.__limit + 1.0 / self.__limit)
+            else:
+                limit = max(self.min_limit, self.__limit * self.backoff_ratio)
+                if int(limit) != int(self.__limit):
+                    logger.warning('Concurrency limit of {} decreased from {} to {}'.format(
+                        self.name, int(self.__limit), int(limit)))
+                self.__limit = limit
+
+    def status(self):
+        """Report the state of the limiter.
+
+        Returns:
+            status (dict): The current limit, the calls in flight and the number of rejected calls
+
+        """
+        with self.__lock:
+            return {'limit': int(self.__limit), 'in_flight': self.__in_flight, 'shed': self.__shed}
@@ -0,0 +1,16 @@
+import logging
+
+from accounting.celery import app
+from accounting_client import outbox
+from accounting_client.config import OUTBOX
+
+logger = logging.getLogger(__name__)
+
+
+@app.task
+def drain_billing_outbox():
+    """Deliver the pending calls of the billing outbox, continuing while full batches are found."""
+    stats = outbox.drain()
+    if stats['claimed'] >= OUTBOX['BATCH_SIZE']:
+        drain_billing_outbox.delay()
+    return stats
@@ -0,0 +1,95 @@
+import hashlib
+from time import time
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+VERSION_KEY = 'api.response_cache.version'
+RESPONSE_KEY = 'api.response_cache.{version}.{format}.{path}'
+
+
+def data_version():
+    """Return the version of the inventory data, i.e. the time of its last change in seconds.
+
+    The version is kept in the shared cache, so that all the processes of the API agree on it. If it
+    is missing, e.g. after an eviction, the data are considered changed now.
+
+    Returns:
+        version (int): The version of the data
+
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, int(time()), timeout=None)
+        version = cache.get(VERSION_KEY) or int(time())
+    return version
+
+
+def invalidate():
+    """Invalidate all the cached responses by moving the inventory data to a new version.
+
+    The version always increases, so that two changes within the same second still produce different
+    versions and `Last-Modified` dates.
+    """
+    cache.set(VERSION_KEY, max(int(time()), (cache.get(VERSION_KEY) or 0) + 1), timeout=None)
+
+
+def is_not_modified(request, etag, last_modified):
+    """Evaluate the conditional headers of a GET request, giving precedence to `If-None-Match`."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return if_none_match.strip() == '*' or etag in parse_etags(if_none_match)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+class CachedResponseMixin(object):
+    """Cached Response View Mixin.
+
+    Caches the rendered responses of `list` and `retrieve` in the shared cache, per path, query string
+    and rendering format, under the current version of the inventory data. Any change of the inventory
+    moves it to a new version (see `api.signals`), so that stale responses are never served and simply
+    expire.
+
+    Successful responses carry an `ETag` and a `Last-Modified` header derived from the version, and
+    conditional requests whose validators still match are answered with `304 Not Modified`, without
+    querying the database if the response is cached. Errors carry no validators and are never answered
+    with a 304. Authentication and permissions are checked before the cache is looked up.
+
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super(CachedResponseMixin, self).list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super(CachedResponseMixin, self).retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = data_version()
+        key = RESPONSE_KEY.format(version=version, format=request.accepted_renderer.format,
+                                  path=request.get_full_path())
+        etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == 200:
+                response.add_post_render_callback(
+                    lambda rendered: cache.set(key, (rendered.content, rendered['Content-Type'])))
+
+        # Errors, e.g. a 404 of a missing object, carry no validators and are never turned into a 304
+        if response.status_code != 200:
+            return response
+        if is_not_modified(request, etag, version):
+            response = HttpResponseNotModified()
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept',))
+        return response
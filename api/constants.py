@@ -32,3 +32,11 @@ SCALE = 'scale'
 SCALED = 'scaled'
 SCALE_IN = 'SCALE_IN'
 SCALE_OUT = 'SCALE_OUT'
+
+# =================================
+#      USAGE ROLLUP GRANULARITY
+# =================================
+HOUR = 'hour'
+DAY = 'day'
+TOTAL = 'total'
+GRANULARITIES = (HOUR, DAY, TOTAL)
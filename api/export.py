@@ -0,0 +1,146 @@
+import csv
+from collections import OrderedDict
+
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.filters import TENANT_FILTERS, INSTANCE_FILTERS, VNF_FILTERS, VDU_FILTERS
+from api.models import Tenant, Instance, Vnf, Vdu
+
+# ==================================
+#       Exported Resources
+# ==================================
+# Resource -> (model, filters, column -> ORM path). The columns follow the fields of the serializers; the
+# relations to the parent entities are exported as their uuid, while the lists of child uuids are left out,
+# as every child row carries the uuid of its parents.
+EXPORTS = {
+    'tenants': (Tenant, TENANT_FILTERS, OrderedDict([
+        ('id', 'id'), ('uuid', 'uuid'), ('description', 'description'), ('name', 'name'),
+        ('created_at', 'created_at'),
+    ])),
+    'instances': (Instance, INSTANCE_FILTERS, OrderedDict([
+        ('id', 'id'), ('uuid', 'uuid'), ('ns_session_id', 'ns_session_id'), ('name', 'name'),
+        ('catalog_tenant', 'catalog_tenant'), ('catalog_user', 'catalog_user'), ('mano_id', 'mano_id'),
+        ('mano_project', 'mano_project'), ('mano_user', 'mano_user'), ('nfvipop_id', 'nfvipop_id'),
+        ('state', 'state'), ('created_at', 'created_at'), ('tenant_id', 'tenant__uuid'),
+    ])),
+    'vnfs': (Vnf, VNF_FILTERS, OrderedDict([
+        ('id', 'id'), ('uuid', 'uuid'), ('name', 'name'), ('vnf_session_id', 'vnf_session_id'),
+        ('tenant_id', 'tenant__uuid'), ('instance_id', 'instance__uuid'), ('state', 'state'),
+        ('creation_date', 'creation_date'),
+    ])),
+    'vdus': (Vdu, VDU_FILTERS, OrderedDict([
+        ('id', 'id'), ('creation_date', 'creation_date'), ('tenant_id', 'tenant__uuid'),
+        ('instance_id', 'instance__uuid'), ('vnf_id', 'vnf__uuid'), ('uuid', 'uuid'),
+        ('vdu_session_id', 'vdu_session_id'), ('vcpu', 'vcpu'), ('vram', 'vram'), ('vdisk', 'vdisk'),
+        ('state', 'state'), ('flavor', 'flavor'), ('nfvipop_id', 'nfvipop_id'), ('vim_type', 'vim_type'),
+    ])),
+}
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+CONTENT_TYPES = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv; charset=utf-8',
+}
+
+# The number of rows joined into a chunk of the streamed response
+ROWS_PER_CHUNK = 500
+
+# The number of rows read from the database at a time, which bounds the rows held in memory by an export
+ROWS_PER_FETCH = 2000
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Content Negotiation that ignores the Accept header, as the format of an export is set by its URL."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo(object):
+    """A file-like object that returns what is written to it, so that csv.writer formats a single row."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, columns, chunk_size=ROWS_PER_FETCH):
+    """Read the columns of a queryset in batches of `chunk_size` rows, by ranges of the primary key.
+
+    Each batch is a `WHERE id > ... ORDER BY id LIMIT chunk_size` query on the primary key index, so that at most a
+    batch is held in memory, on any database and even where server-side cursors are disabled, e.g. behind pgbouncer.
+
+    Args:
+        queryset (QuerySet): The filtered queryset to export
+        columns (OrderedDict): Column name -> ORM path
+        chunk_size (int, optional): The number of rows read at a time
+
+    Returns:
+        rows (generator): A tuple of values per row, in the order of the columns
+
+    """
+    queryset = queryset.order_by('id').values_list('id', *columns.values())
+    last = None
+    while True:
+        batch = list((queryset if last is None else queryset.filter(id__gt=last))[:chunk_size])
+        for row in batch:
+            yield row[1:]
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1][0]
+
+
+def ndjson_lines(rows, columns):
+    """Encode rows as JSON objects, one per line."""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    names = list(columns)
+    for row in rows:
+        yield encoder.encode(OrderedDict(zip(names, row))) + '\n'
+
+
+def csv_lines(rows, columns):
+    """Encode rows as CSV lines, preceded by a header with the column names."""
+    writer = csv.writer(Echo())
+    encoder = JSONEncoder()
+    yield writer.writerow(list(columns))
+    for row in rows:
+        yield writer.writerow([encoder.default(value) if hasattr(value, 'isoformat') else value for value in row])
+
+
+def chunked(lines, size=ROWS_PER_CHUNK):
+    """Join lines into chunks of `size` lines, so that the response is not written to the socket line by line."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def stream(queryset, columns, export_format):
+    """Serialize a queryset incrementally in the given format.
+
+    Only a chunk of rows is held in memory at a time, regardless of the size of the queryset.
+
+    Args:
+        queryset (QuerySet): The filtered queryset to export
+        columns (OrderedDict): Column name -> ORM path
+        export_format (str): `ndjson` or `csv`
+
+    Returns:
+        chunks (generator): The chunks of the response body
+
+    Examples:
+        >>> from django.http import StreamingHttpResponse
+        >>> model, filters, columns = EXPORTS['vdus']
+        >>> StreamingHttpResponse(stream(model.objects.all(), columns, 'ndjson'), content_type=CONTENT_TYPES['ndjson'])
+
+    """
+    encode = ndjson_lines if export_format == NDJSON else csv_lines
+    return chunked(encode(export_rows(queryset, columns), columns))
@@ -0,0 +1,163 @@
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+# ==================================
+#   Filters per Query Parameter
+# ==================================
+# Query parameter -> (ORM lookup, type of value)
+TENANT_FILTERS = {
+    'name': ('name', 'string'),
+    'created_after': ('created_at__gte', 'datetime'),
+    'created_before': ('created_at__lt', 'datetime'),
+}
+
+INSTANCE_FILTERS = {
+    'state': ('state', 'string'),
+    'vim_type': ('vim_type', 'string'),
+    'nfvipop_id': ('nfvipop_id', 'string'),
+    'created_after': ('created_at__gte', 'datetime'),
+    'created_before': ('created_at__lt', 'datetime'),
+}
+
+VNF_FILTERS = {
+    'state': ('state', 'string'),
+    'vim_type': ('vim_type', 'string'),
+    'created_after': ('creation_date__gte', 'datetime'),
+    'created_before': ('creation_date__lt', 'datetime'),
+}
+
+VDU_FILTERS = {
+    'state': ('state', 'string'),
+    'vim_type': ('vim_type', 'string'),
+    'nfvipop_id': ('nfvipop_id', 'string'),
+    'created_after': ('creation_date__gte', 'datetime'),
+    'created_before': ('creation_date__lt', 'datetime'),
+}
+
+FIELDS_PARAM = 'fields'
+
+
+def parse_datetime_param(name, value):
+    """Parse an ISO 8601 date or datetime query parameter, in the current time zone if none is given.
+
+    Raises:
+        ValidationError: If the value is neither a date nor a datetime
+
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            parsed = datetime(date.year, date.month, date.day) if date is not None else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Expected an ISO 8601 date or datetime, e.g. 2019-05-20T10:00:00Z'})
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def requested_fields(request, serializer_class):
+    """Read the sparse fieldset requested with `?fields=`.
+
+    Args:
+        request (Request): The request
+        serializer_class (class): The serializer of the view
+
+    Returns:
+        fields (tuple): The requested field names in the order of the serializer, or None if all fields are requested
+
+    Raises:
+        ValidationError: If a requested field is not a field of the serializer
+
+    """
+    if request is None or not request.query_params.get(FIELDS_PARAM):
+        return None
+    fields = set(field.strip() for field in request.query_params[FIELDS_PARAM].split(',') if field.strip())
+    unknown = fields - set(serializer_class.Meta.fields)
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: 'Unknown fields: {}. Expected any of {}.'.format(
+            ', '.join(sorted(unknown)), ', '.join(serializer_class.Meta.fields))})
+    return tuple(field for field in serializer_class.Meta.fields if field in fields)
+
+
+class QueryParameterFilter(BaseFilterBackend):
+    """Filter the queryset on the query parameters declared in the `filter_fields` of the view.
+
+    Each parameter maps to an ORM lookup, so the filtering happens in the database query.
+
+    Examples:
+        >>> # GET /api/v1/vdus?state=active&vim_type=openstack&created_after=2019-05-01
+        >>> # WHERE state = 'active' AND vim_type = 'openstack' AND creation_date >= '2019-05-01'
+
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        conditions = {}
+        for param, (lookup, value_type) in getattr(view, 'filter_fields', {}).items():
+            value = request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            conditions[lookup] = parse_datetime_param(param, value) if value_type == 'datetime' else value
+        return queryset.filter(**conditions) if conditions else queryset
+
+    @staticmethod
+    def describe(lookup, value_type):
+        field, _, operator = lookup.partition('__')
+        if value_type == 'datetime':
+            return 'Entries whose `{}` is {} the given ISO 8601 date or datetime'.format(
+                field, 'at or after' if operator == 'gte' else 'before')
+        return 'Entries whose `{}` equals the given value'.format(field)
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=param,
+                required=False,
+                location='query',
+                schema=coreschema.String(title=param, description=self.describe(lookup, value_type))
+            )
+            for param, (lookup, value_type) in sorted(getattr(view, 'filter_fields', {}).items())
+        ]
+
+
+class SparseFieldsFilter(BaseFilterBackend):
+    """Load only the columns and relations of the fields requested with `?fields=`.
+
+    The serializers drop the fields that were not requested, see `SparseFieldsMixin`, and this
+    backend restricts the query to match, through `setup_eager_loading` of the serializer.
+
+    Examples:
+        >>> # GET /api/v1/vdus?fields=uuid,state
+        >>> # SELECT id, uuid, state FROM api_vdu ...
+
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        serializer_class = view.get_serializer_class()
+        fields = requested_fields(request, serializer_class)
+        if fields is None:
+            return queryset
+        queryset = queryset.select_related(None).prefetch_related(None)
+        return serializer_class.setup_eager_loading(queryset, fields)
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(
+                name=FIELDS_PARAM,
+                required=False,
+                location='query',
+                schema=coreschema.String(
+                    title='Fields',
+                    description='Comma-separated fields to include in the response, e.g. `uuid,state`'
+                )
+            )
+        ]
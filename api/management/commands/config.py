@@ -1,3 +1,5 @@
+import os
+
 from django.conf import settings
 
 # =================================
@@ -5,6 +7,12 @@ from django.conf import settings
 # =================================
 KAFKA_SERVER = settings.OSM_KAFKA_BOOTSTRAP
 KAFKA_CLIENT_ID = 'osm-notification-handler'
-KAFKA_GROUP_ID = 'MON_ACC'
+# Distinct from the group of metric_collector, so that a rebalance of either consumer does not stop the other
+KAFKA_GROUP_ID = os.getenv('ACC_OSM_KAFKA_GROUP_ID', 'MON_ACC_NOTIFICATIONS')
 KAFKA_API_VERSION = (0, 10, 1)
-KAFKA_TOPICS = ['ns', ]
+KAFKA_TOPICS = [topic.strip() for topic in os.getenv('ACC_OSM_KAFKA_TOPICS', 'ns').split(',') if topic.strip()]
+# Partitions of the topics consumed, assigned statically instead of by the group; all of them if empty
+KAFKA_PARTITIONS = [int(partition) for partition in os.getenv('ACC_OSM_KAFKA_PARTITIONS', '').split(',')
+                    if partition.strip()]
+# Seconds between two logs of the count of the notifications skipped
+SKIPPED_LOG_INTERVAL = int(os.getenv('ACC_OSM_SKIPPED_LOG_INTERVAL', 60))
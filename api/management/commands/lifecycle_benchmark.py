@@ -0,0 +1,340 @@
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+import yaml
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.constants import INSTANTIATE, INSTANTIATED, SCALE, SCALED, TERMINATE, TERMINATED
+from stubs.billing import BillingStub
+from stubs.osm import OsmStub
+
+SAMPLES_DIR = os.path.join(settings.PROJECT_ROOT, 'samples')
+SAMPLE_NS_IDS = ('2c80ff71-1781-42c2-a438-9f6c2826be26', 'efd548ab-4d1a-44da-b530-1a45f0f56074')
+SAMPLE_VIM_ID = '41dab0c0-35f4-4c40-b1cd-13e4a79dab48'
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+# The notifications of a NS lifecycle: operation, sample used as template, change applied on OSM beforehand
+LIFECYCLE = (
+    (INSTANTIATE, 'instantiation_start.yaml', 'add_ns'),
+    (INSTANTIATED, 'instantiation_end.yaml', None),
+    (SCALE, 'scale_out_start.json', None),
+    (SCALED, 'scale_out_end.yaml', 'scale_out'),
+    (SCALE, 'scale_in_start.json', None),
+    (SCALED, 'scale_in_end.yaml', 'scale_in'),
+    (TERMINATE, 'termination_start.yaml', None),
+    (TERMINATED, 'termination_end.yaml', 'remove_ns'),
+)
+
+ConsumerRecord = namedtuple('ConsumerRecord', ['key', 'value'])
+
+
+def load_templates():
+    """Load the sample OSM notifications of the `samples` directory.
+
+    Returns:
+        templates (dict): The decoded samples per file name
+
+    """
+    templates = {}
+    for _, sample, _ in LIFECYCLE:
+        with open(os.path.join(SAMPLES_DIR, sample)) as f:
+            templates[sample] = yaml.safe_load(f)
+    return templates
+
+
+def render(template, ids):
+    """Copy a sample notification, replacing each UUID it contains.
+
+    Args:
+        template (obj): The sample notification or a part of it
+        ids (dict): The replacement per sample UUID; UUIDs missing from it get a new random replacement
+
+    Returns:
+        obj: The copy of the template
+
+    """
+    if isinstance(template, dict):
+        return {key: render(value, ids) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, ids) for value in template]
+    if isinstance(template, str):
+        return UUID_PATTERN.sub(lambda match: ids.setdefault(match.group(0), str(uuid.uuid4())), template)
+    return template
+
+
+def summarize(values):
+    """Summarize a list of measurements.
+
+    Args:
+        values (list): The measurements
+
+    Returns:
+        summary (dict): The count, mean, median, 95th/99th percentiles and maximum of the measurements
+
+    """
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def percentile(p):
+        return ordered[int(round(p / 100.0 * (len(ordered) - 1)))]
+
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered), 'p50': percentile(50),
+            'p95': percentile(95), 'p99': percentile(99), 'max': ordered[-1]}
+
+
+class LifecycleFeed(object):
+    """Lifecycle Feed Class.
+
+    An iterable of Kafka records that replays generated NS lifecycles, to be consumed by the
+    OSM notification handler in place of a Kafka consumer. As the handler pulls the next record
+    only once the previous one has been handled, the feed measures the latency, the DB queries
+    and the upstream HTTP calls of every notification between two pulls.
+
+    Args:
+        lifecycles (int): The number of NS lifecycles to generate
+        osm (OsmStub): The stub serving NBI & RO
+        billing (BillingStub): The stub serving the billing API
+        vnfs (int): The number of VNFs per NS
+        vdus (int): The number of VDUs per VNF
+
+    """
+
+    def __init__(self, lifecycles, osm, billing, vnfs=1, vdus=1):
+        """Lifecycle Feed Class Constructor."""
+        self.lifecycles = lifecycles
+        self.osm = osm
+        self.billing = billing
+        self.vnfs = vnfs
+        self.vdus = vdus
+        self.templates = load_templates()
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.http_calls = defaultdict(list)
+        self.osm_calls = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.lifecycle_latencies = []
+        self.current_event = None
+
+    def notifications(self, ns_uuid):
+        """Generate the raw notifications of a NS lifecycle.
+
+        Yields:
+            tuple: The event name, the operation, the OSM-side change and the raw value of the notification
+
+        """
+        ids = {sample_ns_id: ns_uuid for sample_ns_id in SAMPLE_NS_IDS}
+        ids[SAMPLE_VIM_ID] = self.osm.vim_accounts[0]['_id']
+        for operation, sample, osm_change in LIFECYCLE:
+            message = render(self.templates[sample], ids)
+            if operation in (INSTANTIATED, SCALED, TERMINATED):
+                message['operationState'] = 'COMPLETED'
+            if operation == SCALE:
+                message['operationParams']['scaleVnfData']['scaleByStepData']['member-vnf-index'] = '1'
+            value = yaml.safe_dump(message, default_flow_style=False).encode('utf-8')
+            yield os.path.splitext(sample)[0], operation, osm_change, value
+
+    def __iter__(self):
+        for i in range(self.lifecycles):
+            ns_uuid = str(uuid.uuid4())
+            tenant_uuid = self.osm.tenants[i % len(self.osm.tenants)]['uuid']
+            lifecycle_latency = 0.0
+            for event, operation, osm_change, value in self.notifications(ns_uuid):
+                self.current_event = event
+                if osm_change == 'add_ns':
+                    self.osm.add_ns(ns_uuid, tenant_uuid, vnfs=self.vnfs, vdus=self.vdus)
+                elif osm_change is not None:
+                    getattr(self.osm, osm_change)(ns_uuid)
+                http_calls = self.osm.total_requests + self.billing.total_requests
+                osm_calls = self.osm.snapshot()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    yield ConsumerRecord(key=operation.encode('ascii'), value=value)
+                    latency = time.perf_counter() - start
+                lifecycle_latency += latency
+                self.latencies[event].append(latency * 1000)
+                self.queries[event].append(len(queries))
+                self.http_calls[event].append(self.osm.total_requests + self.billing.total_requests - http_calls)
+                for route, count in self.osm.snapshot().items():
+                    self.osm_calls[event][route] += count - osm_calls.get(route, 0)
+            self.lifecycle_latencies.append(lifecycle_latency * 1000)
+
+    def fail(self, error):
+        """Record that the handling of the current notification raised an error."""
+        self.errors['{}: {}'.format(self.current_event, type(error).__name__)] += 1
+
+    def results(self):
+        """Aggregate the measurements of the replayed notifications.
+
+        Returns:
+            results (dict): The latency (ms), DB queries and HTTP calls per event, overall and per event name, along
+                with the mean number of calls per OSM endpoint for each event name
+
+        """
+        events = sorted(self.latencies)
+        all_latencies = [value for event in events for value in self.latencies[event]]
+        all_queries = [value for event in events for value in self.queries[event]]
+        all_http_calls = [value for event in events for value in self.http_calls[event]]
+        return {
+            'events': len(all_latencies),
+            'latency_ms': summarize(all_latencies),
+            'lifecycle_latency_ms': summarize(self.lifecycle_latencies),
+            'db_queries_per_event': summarize(all_queries),
+            'http_calls_per_event': summarize(all_http_calls),
+            'errors': dict(self.errors),
+            'per_event': {event: {'latency_ms': summarize(self.latencies[event]),
+                                  'db_queries': summarize(self.queries[event]),
+                                  'http_calls': summarize(self.http_calls[event]),
+                                  'osm_calls': {route: count / len(self.latencies[event])
+                                                for route, count in self.osm_calls[event].items() if count}}
+                          for event in events},
+        }
+
+
+class Command(BaseCommand):
+    help = 'Replay generated NS lifecycles through the OSM notification handler against local NBI, RO and ' \
+           'billing stubs, on a throwaway test database, and report throughput, latency, DB queries and ' \
+           'HTTP calls per event in a JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lifecycles', type=int, default=1000, help='Number of NS lifecycles to replay')
+        parser.add_argument('--tenants', type=int, default=3, help='Number of RO tenants served by the OSM stub')
+        parser.add_argument('--vnfs', type=int, default=2, help='Number of VNFs per NS')
+        parser.add_argument('--vdus', type=int, default=1, help='Number of VDUs per VNF')
+        parser.add_argument('--nbi-latency', help='Latency distribution of the NBI stub, e.g. uniform:0.01:0.1')
+        parser.add_argument('--ro-latency', help='Latency distribution of the RO stub, e.g. uniform:0.01:0.1')
+        parser.add_argument('--billing-latency', help='Latency distribution of the billing stub, e.g. uniform:0.01:0.1')
+        parser.add_argument('--billing-token-ttl', type=float, help='Lifetime of the billing stub tokens in seconds')
+        parser.add_argument('--billing-error-rate', type=float, default=0.0,
+                            help='Probability of a billing stub request to fail')
+        parser.add_argument('--outbox-concurrency', type=int, default=None,
+                            help='Concurrent billing calls while draining the outbox')
+        parser.add_argument('--keepdb', action='store_true', help='Preserve the test database between runs')
+        parser.add_argument('--output', default=os.path.join(settings.PROJECT_ROOT, 'logs', 'lifecycle_benchmark.json'),
+                            help='Path of the JSON file of the results')
+
+    def handle(self, *args, **options):
+        osm = OsmStub(tenants=options['tenants'], nbi_latency=options['nbi_latency'],
+                      ro_latency=options['ro_latency']).start()
+        billing = BillingStub(latency=options['billing_latency'], token_ttl=options['billing_token_ttl'],
+                              error_rate=options['billing_error_rate']).start()
+        try:
+            self.point_clients_at(osm, billing)
+            test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                         keepdb=options['keepdb'])
+            try:
+                results = self.run(osm, billing, options)
+            finally:
+                connection.creation.destroy_test_db(test_db, verbosity=0, keepdb=options['keepdb'])
+        finally:
+            osm.stop()
+            billing.stop()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write('{} events in {:.2f}s: {:.1f} events/s, {:.2f} HTTP calls/event, {:.2f} DB queries/event, '
+                          'p95 latency {:.2f}ms, {} failed'.format(results['events'], results['duration_sec'],
+                                                                   results['events_per_sec'],
+                                                                   results['http_calls_per_event']['mean'],
+                                                                   results['db_queries_per_event']['mean'],
+                                                                   results['latency_ms']['p95'],
+                                                                   sum(results['errors'].values())))
+        self.stdout.write('Billing outbox drained in {:.2f}s: {} delivered, {} retried, {} failed, {} pending'.format(
+            results['outbox']['duration_sec'], results['outbox']['delivered'], results['outbox']['retried'],
+            results['outbox']['failed'], results['outbox']['pending']))
+        self.stdout.write('Results written to {}'.format(options['output']))
+
+    @staticmethod
+    def point_clients_at(osm, billing):
+        """Direct the NBI, RO and billing clients to the stubs.
+
+        The RO and billing clients read their URLs once, on import, so this must happen before
+        the lifecycle handlers are imported. The billing calls are left in the outbox while the
+        notifications are replayed and delivered afterwards, see `drain`.
+        """
+        for module in ('accounting_client.config', 'openmanoapi.config'):
+            if module in sys.modules:
+                raise CommandError('{} is already imported; the benchmark must run in a fresh process'.format(module))
+        host, port = billing.url.rsplit('//', 1)[1].split(':')
+        os.environ.update({'ACC_BILLING_PROTOCOL': 'http', 'ACC_BILLING_IP': host, 'ACC_BILLING_PORT': port,
+                           'ACC_OUTBOX_DRAIN_ON_COMMIT': 'false'})
+        settings.OSM_COMPONENTS['NBI-API'] = osm.url
+        settings.OSM_COMPONENTS['RO-API'] = osm.url
+
+    @staticmethod
+    def run(osm, billing, options):
+        # Imported here, as the clients read their URLs on import
+        from accounting.celery import app
+        from api.management.commands.osm_notifications import osm_notification_handler
+
+        # The notifications are handled within the consumer loop, as they would be by the lifecycle workers
+        app.conf.task_always_eager = True
+        app.conf.task_eager_propagates = True
+
+        feed = LifecycleFeed(options['lifecycles'], osm, billing, vnfs=options['vnfs'], vdus=options['vdus'])
+        osm.reset()
+        billing.reset()
+        started_at = datetime.utcnow().isoformat()
+        start = time.perf_counter()
+        records = iter(feed)
+        while True:
+            # A failed notification stops the handler; resume it on the next notification of the feed
+            try:
+                osm_notification_handler(records)
+                break
+            except Exception as e:
+                feed.fail(e)
+        duration = time.perf_counter() - start
+        outbox_results = Command.drain(options['outbox_concurrency'])
+
+        results = feed.results()
+        results.update({
+            'started_at': started_at,
+            'parameters': {key: options[key] for key in ('lifecycles', 'tenants', 'vnfs', 'vdus', 'nbi_latency',
+                                                         'ro_latency', 'billing_latency', 'billing_token_ttl',
+                                                         'billing_error_rate')},
+            'duration_sec': duration,
+            'events_per_sec': results['events'] / duration if duration else 0.0,
+            'outbox': outbox_results,
+            'http_calls': {'osm': osm.stats(), 'billing': billing.stats()},
+        })
+        return results
+
+    @staticmethod
+    def drain(concurrency):
+        """Deliver the billing calls queued in the outbox until no delivery is due.
+
+        Returns:
+            results (dict): The duration of the drain, the number of delivered, retried, failed and still
+                pending messages and the state of the circuit breakers and concurrency limit of the billing client
+        """
+        from accounting_client import outbox
+        from accounting_client.accounting_client import accounting_client
+        from api.models import OutboxMessage
+
+        if concurrency is None and connection.vendor == 'sqlite':
+            # SQLite locks whole tables, which fails concurrent deliveries
+            concurrency = 1
+        results = {'delivered': 0, 'retried': 0, 'failed': 0}
+        start = time.perf_counter()
+        while True:
+            stats = outbox.drain(concurrency=concurrency)
+            if not stats['claimed']:
+                break
+            for key in results:
+                results[key] += stats[key]
+        results['duration_sec'] = time.perf_counter() - start
+        results['delivered_per_sec'] = results['delivered'] / results['duration_sec'] if results['duration_sec'] \
+            else 0.0
+        results['pending'] = OutboxMessage.objects.filter(state=outbox.PENDING).count()
+        results['billing_client'] = accounting_client.status()
+        return results
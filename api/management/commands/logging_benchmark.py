@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from accounting.log import AsyncHandler, JSONFormatter, Lazy, SampledLogger
+
+STANDARD_FORMAT = "[%(asctime)s] - [%(name)s:%(lineno)s] - [%(levelname)s] %(message)s"
+
+
+class Response(object):
+    """Stand-in for a response of OSM, whose body is decoded each time `text` is read."""
+
+    def __init__(self, size):
+        self.url = 'https://osm:9999/osm/nslcm/v1/ns_instances'
+        self.status_code = 200
+        self.headers = {'Content-Type': 'application/json'}
+        self.content = json.dumps([{'_id': str(uuid.uuid4()), 'name': 'ns'}] * (size // 60)).encode('utf-8')
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+
+def metric_message():
+    """A message of the metric collector, as decoded from Kafka."""
+    return {
+        'metric': {'name': 'cpu_util', 'value': 42.5, 'timestamp': '2019-05-20T10:00:00.000000Z', 'unit': '%'},
+        'mano': {'vdu': {'id': str(uuid.uuid4()), 'name': 'vdu', 'image_id': str(uuid.uuid4()), 'flavor': {}},
+                 'vnf': {'id': str(uuid.uuid4())}, 'ns': {'id': str(uuid.uuid4())}},
+    }
+
+
+def eager_metric(logger, sampled_logger, message):
+    """Log a saved metric as the metric collector used to: two lines formatted before the level is checked."""
+    logger.debug('Metric: {}, Vdu: {}'.format(message['metric'], message['mano']['vdu']['id']))
+    logger.info('Received and saved {} metric for vdu {}'.format('CPU_CYCLE', message['mano']['vdu']['id']))
+
+
+def lazy_metric(logger, sampled_logger, message):
+    """Log a saved metric as the metric collector does: lazily, with the per-message event sampled."""
+    logger.debug('Metric: %s, Vdu: %s', message['metric'], message['mano']['vdu']['id'])
+    sampled_logger.info('Received and saved metric', metric='CPU_CYCLE', vdu=message['mano']['vdu']['id'])
+
+
+def eager_response(logger, sampled_logger, response):
+    """Log a response of OSM as the NBI client used to: its body is decoded and formatted at any level."""
+    logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
+                 .format(response.url, response.status_code, response.headers, response.text))
+
+
+def lazy_response(logger, sampled_logger, response):
+    """Log a response of OSM as the NBI client does: its body is decoded only if DEBUG is enabled."""
+    logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                 response.url, response.status_code, response.headers, Lazy(lambda: response.text))
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-message overhead of logging on the hot paths, before and after the async JSON logging'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=20000, help='The messages logged per scenario')
+        parser.add_argument('--sample-rate', type=int, default=settings.LOG_SAMPLE_RATE,
+                            help='One in this many per-message events is logged')
+        parser.add_argument('--body-size', type=int, default=20000, help='The size of the OSM responses in bytes')
+        parser.add_argument('--output', default=os.path.join(settings.PROJECT_ROOT, 'logs', 'logging_benchmark.json'),
+                            help='The JSON file that the results are written to')
+
+    def handle(self, *args, **options):
+        messages = [metric_message() for _ in range(options['messages'])]
+        response = Response(options['body_size'])
+        directory = tempfile.mkdtemp()
+
+        def sync_handler(name):
+            handler = RotatingFileHandler(os.path.join(directory, name + '.log'), maxBytes=2024 * 2024, backupCount=5)
+            handler.setFormatter(logging.Formatter(STANDARD_FORMAT))
+            return handler
+
+        def async_handler(name):
+            handler = AsyncHandler('logging.handlers.RotatingFileHandler', queue_size=len(messages) * 2,
+                                   filename=os.path.join(directory, name + '.log'), maxBytes=2024 * 2024,
+                                   backupCount=5)
+            handler.setFormatter(JSONFormatter())
+            return handler
+
+        # Name -> (log function, payloads, handler factory, level of the logger)
+        scenarios = OrderedDict([
+            ('metric_before', (eager_metric, messages, sync_handler, logging.DEBUG)),
+            ('metric_after', (lazy_metric, messages, async_handler, logging.INFO)),
+            ('metric_after_debug', (lazy_metric, messages, async_handler, logging.DEBUG)),
+            ('response_before', (eager_response, [response] * len(messages), sync_handler, logging.INFO)),
+            ('response_after', (lazy_response, [response] * len(messages), async_handler, logging.INFO)),
+        ])
+
+        results = OrderedDict()
+        for name, (log, payloads, handler_factory, level) in scenarios.items():
+            logger = logging.getLogger('logging_benchmark.{}'.format(name))
+            logger.propagate = False
+            logger.setLevel(level)
+            sampled_logger = SampledLogger(logger, options['sample_rate'])
+            handler = handler_factory(name)
+            logger.addHandler(handler)
+
+            start = time.perf_counter()
+            for payload in payloads:
+                log(logger, sampled_logger, payload)
+            duration = time.perf_counter() - start
+            start = time.perf_counter()
+            handler.close()
+            flush = time.perf_counter() - start
+            logger.removeHandler(handler)
+
+            results[name] = {
+                'level': logging.getLevelName(level),
+                'us_per_message': round(duration / len(payloads) * 1e6, 2),
+                'flush_ms': round(flush * 1000, 2),
+                'bytes_written': os.path.getsize(os.path.join(directory, name + '.log')),
+            }
+            self.stdout.write('{:>18}: {:8.2f}us per message, flushed in {:8.2f}ms, {} bytes written'.format(
+                name, results[name]['us_per_message'], results[name]['flush_ms'], results[name]['bytes_written']))
+
+        for path in os.listdir(directory):
+            os.remove(os.path.join(directory, path))
+        os.rmdir(directory)
+
+        with open(options['output'], 'w') as f:
+            json.dump({'messages': options['messages'], 'sample_rate': options['sample_rate'],
+                       'body_size': options['body_size'], 'scenarios': results}, f, indent=2)
+        self.stdout.write('Results written to {}'.format(options['output']))
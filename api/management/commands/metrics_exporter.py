@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+from prometheus_client import start_http_server
+
+from accounting import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_exporter(port, address=''):
+    """Serve the metrics of all the accounting processes, i.e. gunicorn, Celery and the commands, over HTTP.
+
+    The processes share their metrics through the `prometheus_multiproc_dir` directory, which is aggregated on each
+    scrape, so that a single endpoint serves each series once. It is meant for an internal port, scraped by
+    Prometheus, rather than for the public one of the API.
+
+    Args:
+        port (int): The port to listen on
+        address (str, optional): The address to listen on; all of them by default
+
+    """
+    start_http_server(port, addr=address, registry=metrics.registry())
+    logger.info('Serving the metrics of the accounting processes on port {}'.format(port))
+    while True:
+        time.sleep(3600)
+
+
+class Command(BaseCommand):
+    help = 'Serve the Prometheus metrics of all the accounting processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=9100, help='The port that the metrics are served on')
+        parser.add_argument('--address', default='', help='The address that the metrics are served on; all of them '
+                                                          'by default')
+
+    def handle(self, *args, **options):
+        metrics_exporter(options['port'], options['address'])
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+import yaml
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from api.management.commands.osm_notifications import OPERATIONS, SafeLoader, notification_deserializer
+
+SAMPLES_DIR = os.path.join(settings.PROJECT_ROOT, 'samples')
+
+# Keys of the notifications of the `ns` topic that the handler ignores, e.g. those of the NS records and actions
+IGNORED_KEYS = ('create', 'created', 'delete', 'deleted', 'action', 'actioned')
+
+
+def safe_load(value):
+    """Decode a notification as the handler used to: with the pure Python YAML parser."""
+    return yaml.safe_load(value.decode('utf-8', 'ignore'))
+
+
+def best(function, values, repeat):
+    """The best time of `repeat` runs of a function over a list of values, in microseconds per value."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        durations.append(time.perf_counter() - start)
+    return min(durations) / len(values) * 1e6
+
+
+class Command(BaseCommand):
+    help = 'Measure the decoding time of the OSM notifications of the samples directory, before and after the ' \
+           'JSON-first, libyaml and lazy decoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='The decodes per sample and decoder')
+        parser.add_argument('--repeat', type=int, default=3, help='The runs per sample and decoder; the best counts')
+        parser.add_argument('--ignored', type=int, default=3,
+                            help='The notifications with an ignored key per handled one, in the stream scenario')
+        parser.add_argument('--output', default=os.path.join(settings.PROJECT_ROOT, 'logs',
+                                                             'notification_benchmark.json'),
+                            help='The JSON file that the results are written to')
+
+    def handle(self, *args, **options):
+        samples = OrderedDict()
+        for name in sorted(os.listdir(SAMPLES_DIR)):
+            with open(os.path.join(SAMPLES_DIR, name), 'rb') as f:
+                samples[name] = f.read()
+
+        decoders = OrderedDict([
+            ('safe_load', safe_load),
+            ('libyaml', lambda value: yaml.load(value.decode('utf-8', 'ignore'), Loader=SafeLoader)),
+            ('deserializer', notification_deserializer),
+        ])
+        self.stdout.write('YAML loader: {}'.format(SafeLoader.__name__))
+
+        results = OrderedDict()
+        for name, value in samples.items():
+            values = [value] * options['messages']
+            results[name] = OrderedDict([('bytes', len(value)),
+                                         ('identical', notification_deserializer(value) == safe_load(value))])
+            for decoder, function in decoders.items():
+                results[name]['{}_us'.format(decoder)] = round(best(function, values, options['repeat']), 2)
+            results[name]['speedup'] = round(results[name]['safe_load_us'] / results[name]['deserializer_us'], 1)
+            self.stdout.write('{:>24}: {:8.2f}us with safe_load, {:8.2f}us with libyaml, {:8.2f}us decoded, '
+                              '{:5.1f}x faster{}'.format(name, results[name]['safe_load_us'],
+                                                         results[name]['libyaml_us'],
+                                                         results[name]['deserializer_us'], results[name]['speedup'],
+                                                         '' if results[name]['identical'] else ', DIFFERENT OUTPUT'))
+
+        # A stream of the `ns` topic, in which each handled notification comes along with some ignored ones
+        stream = []
+        for name, value in samples.items():
+            stream.append((b'instantiate', value))
+            stream.extend((IGNORED_KEYS[i % len(IGNORED_KEYS)].encode('ascii'), value)
+                          for i in range(options['ignored']))
+        stream = stream * max(1, options['messages'] // len(stream))
+
+        def eager(record):
+            key, value = record
+            message = safe_load(value)
+            return message if key.decode('ascii') in OPERATIONS else None
+
+        def lazy(record):
+            key, value = record
+            return notification_deserializer(value) if key.decode('ascii') in OPERATIONS else None
+
+        before, after = best(eager, stream, options['repeat']), best(lazy, stream, options['repeat'])
+        results['stream'] = OrderedDict([('ignored_per_handled', options['ignored']),
+                                         ('before_us', round(before, 2)), ('after_us', round(after, 2)),
+                                         ('speedup', round(before / after, 1))])
+        self.stdout.write('{:>24}: {:8.2f}us per message before, {:8.2f}us after, {:5.1f}x faster'.format(
+            'stream', before, after, before / after))
+
+        with open(options['output'], 'w') as f:
+            json.dump({'messages': options['messages'], 'loader': SafeLoader.__name__, 'samples': results}, f,
+                      indent=2)
+        self.stdout.write('Results written to {}'.format(options['output']))
@@ -1,82 +1,171 @@
+import json
 import logging
+import time
+from collections import Counter
 
 import yaml
 from django.core.management import BaseCommand
-from kafka import KafkaConsumer
+from kafka import KafkaConsumer, TopicPartition
 
-from api.constants import INSTANTIATE, TERMINATE, INSTANTIATED, TERMINATED, SCALE, SCALED, SCALE_OUT, SCALE_IN
-from api.models import Instance
-from api.utils import ns_termination_handler, ns_instantiation_handler, ns_pre_instantiation_handler, \
-    vnf_scaling_out_handler, vnf_scaling_in_handler
-from .config import KAFKA_SERVER, KAFKA_CLIENT_ID, KAFKA_API_VERSION, KAFKA_GROUP_ID, KAFKA_TOPICS
+from accounting import metrics, tracing
+from api import tasks
+from api.constants import INSTANTIATE, TERMINATE, INSTANTIATED, TERMINATED, SCALE, SCALED
+from api.renderers import load_json_backend
+from .config import KAFKA_SERVER, KAFKA_CLIENT_ID, KAFKA_API_VERSION, KAFKA_GROUP_ID, KAFKA_TOPICS, \
+    KAFKA_PARTITIONS, SKIPPED_LOG_INTERVAL
+
+try:
+    # The libyaml parser, about ten times faster than the pure Python one
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 logger = logging.getLogger(__name__)
 
+# The operations whose notifications are handled; the others are never decoded
+OPERATIONS = frozenset([INSTANTIATE, INSTANTIATED, TERMINATE, TERMINATED, SCALE, SCALED])
+
+json_backend = load_json_backend('auto') or json
+
+
+def notification_deserializer(value):
+    """Decode the raw value of an OSM notification.
+
+    OSM sends its notifications as YAML, or as JSON, which YAML is a superset of. JSON values are decoded as JSON,
+    which is much faster, and the others with the libyaml parser if available.
+
+    Args:
+        value (bytes): The value of the Kafka message
+
+    Returns:
+        message (dict): The decoded notification
 
-def osm_notification_handler():
-    """Connects on OSM Kafka Bus and subscribes to NS-related topics."""
+    """
+    text = value.decode('utf-8', 'ignore')
+    if text.lstrip().startswith('{'):
+        try:
+            return json_backend.loads(text)
+        except ValueError:
+            pass
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def create_consumer(topics=None, partitions=None):
+    """Create a consumer of the OSM notifications, with the raw bytes of the messages as their values.
+
+    Args:
+        topics (list, optional): The topics consumed; `KAFKA_TOPICS` by default
+        partitions (list, optional): The partitions of the topics consumed, assigned statically rather than by the
+            consumer group; `KAFKA_PARTITIONS` by default, all of them if empty
+
+    Returns:
+        consumer (KafkaConsumer): The consumer, subscribed to the topics or assigned their partitions
+    """
+    topics = topics or KAFKA_TOPICS
+    partitions = KAFKA_PARTITIONS if partitions is None else partitions
     consumer = KafkaConsumer(bootstrap_servers=KAFKA_SERVER, client_id=KAFKA_CLIENT_ID, enable_auto_commit=True,
-                             value_deserializer=lambda v: yaml.safe_load(v.decode('utf-8', 'ignore')),
                              api_version=KAFKA_API_VERSION, group_id=KAFKA_GROUP_ID)
-    consumer.subscribe(KAFKA_TOPICS)
-    logger.info('Initialized Kafka Consumer & subscribed to OSM topics')
+    if partitions:
+        consumer.assign([TopicPartition(topic, partition) for topic in topics for partition in partitions])
+        logger.info('Initialized Kafka Consumer & assigned partitions {} of OSM topics {}'.format(partitions, topics))
+    else:
+        consumer.subscribe(topics)
+        logger.info('Initialized Kafka Consumer & subscribed to OSM topics {}'.format(topics))
+    return consumer
+
+
+def osm_notification_handler(consumer=None, metrics_port=None):
+    """Connects on OSM Kafka Bus, subscribes to NS-related topics and queues the handling of each notification.
 
+    The operation of each notification is read from the key of its message, and the notifications of the
+    operations that are not handled are skipped without being decoded, and those that cannot be decoded are skipped
+    too. The skipped ones are counted per operation and logged every `SKIPPED_LOG_INTERVAL` seconds.
+
+    Args:
+        consumer (iterable, optional): The source of the Kafka messages; a consumer of the OSM topics is created if
+            omitted
+        metrics_port (int, optional): The port that the metrics of the handler are served on
+
+    """
+    metrics.start_sidecar(metrics_port)
+    if consumer is None:
+        consumer = create_consumer()
+
+    skipped = Counter()
+    logged = time.monotonic()
     for msg in consumer:
+        metrics.record_consumed(consumer, 'osm_notifications', msg)
+        if skipped and time.monotonic() - logged >= SKIPPED_LOG_INTERVAL:
+            log_skipped(skipped, time.monotonic() - logged)
+            skipped.clear()
+            logged = time.monotonic()
+
+        # Get operation type from key; the notification is decoded only if it is handled, by the lifecycle workers
+        operation = msg.key.decode('ascii', 'ignore') if msg.key else ''
+        if operation not in OPERATIONS:
+            skipped[operation] += 1
+            metrics.NOTIFICATIONS_SKIPPED.labels(operation).inc()
+            continue
+        try:
+            message = notification_deserializer(msg.value)
+            if not isinstance(message, dict):
+                raise ValueError('not a mapping but {}'.format(type(message).__name__))
+        except (ValueError, yaml.YAMLError) as e:
+            skipped['{} (malformed)'.format(operation)] += 1
+            metrics.NOTIFICATIONS_MALFORMED.labels(operation).inc()
+            logger.warning('Skipping malformed OSM notification at {}-{}@{}: {}'.format(
+                getattr(msg, 'topic', None), getattr(msg, 'partition', None), getattr(msg, 'offset', None), e))
+            continue
+        with tracing.start_span('osm.{}'.format(operation), tracing.CONSUMER,
+                                attributes=event_attributes(msg, message)):
+            tasks.enqueue(operation, message)
+
+
+def log_skipped(skipped, seconds):
+    """Log the count of the notifications skipped per operation.
 
-        # Get operation type from key
-        operation = msg.key.decode('ascii')
-        message = msg.value
-        if operation == INSTANTIATE:
-            logger.info('Instantiation of NS with UUID {} started'.format(message['nsInstanceId']))
-            ns_pre_instantiation_handler(message['operationParams'])
-        elif operation == TERMINATE:
-            logger.info('Termination of NS with UUID {} started'.format(message['nsInstanceId']))
-            ns = Instance.objects.filter(uuid=message['nsInstanceId'])
-            if ns.exists():
-                ns.update(state='terminate')
-        elif operation == SCALE:
-            scale_vnf_type = message['operationParams']['scaleVnfData']['scaleVnfType']
-            if scale_vnf_type == SCALE_OUT:
-                logger.info('Scaling-out VNF of NS with UUID {} started'.format(message['nsInstanceId']))
-            elif scale_vnf_type == SCALE_IN:
-                logger.info('Scaling-in VNF of NS with UUID {} started'.format(message['nsInstanceId']))
-        elif operation == INSTANTIATED:
-            ns = Instance.objects.filter(uuid=message['nsr_id'])
-            if ns.exists():
-                if message['operationState'] == 'COMPLETED':
-                    ns.update(state='active')
-                    ns_instantiation_handler(ns[0])
-                    logger.info('Instantiation of NS with UUID {} completed'.format(ns[0].uuid))
-                elif message['operationState'] == 'FAILED':
-                    logger.info('Instantiation of NS with UUID {} failed'.format(ns[0].uuid))
-                    ns.delete()
-        elif operation == TERMINATED:
-            ns = Instance.objects.filter(uuid=message['nsr_id'])
-            if ns.exists():
-                if message['operationState'] == 'COMPLETED':
-                    ns.update(state='deleted')
-                    ns_termination_handler(ns[0])
-                    logger.info('Termination of NS with UUID {} completed'.format(ns[0].uuid))
-                elif message['operationState'] == 'FAILED':
-                    ns.update(state='active')
-                    logger.info('Termination of NS with UUID {} failed'.format(ns[0].uuid))
-        elif operation == SCALED:
-            ns = Instance.objects.filter(uuid=message['nsr_id'])
-            if ns.exists():
-                if scale_vnf_type == SCALE_OUT:
-                    if message['operationState'] == 'COMPLETED':
-                        vnf_scaling_out_handler(ns[0])
-                        logger.info('Scaling-out VNF of NS with UUID {} completed'.format(ns[0].uuid))
-                    elif message['operationState'] == 'FAILED':
-                        logger.info('Scaling-out VNF of NS with UUID {} failed'.format(ns[0].uuid))
-                elif scale_vnf_type == SCALE_IN:
-                    if message['operationState'] == 'COMPLETED':
-                        vnf_scaling_in_handler(ns[0])
-                        logger.info('Scaling-in VNF of NS with UUID {} completed'.format(ns[0].uuid))
-                    elif message['operationState'] == 'FAILED':
-                        logger.info('Scaling-in VNF of NS with UUID {} failed'.format(ns[0].uuid))
+    Args:
+        skipped (Counter): The notifications skipped, per operation
+        seconds (float): The period over which they were skipped
+
+    """
+    logger.info('Skipped {} OSM notifications in {:.0f}s: {}'.format(
+        sum(skipped.values()), seconds,
+        ', '.join('{}={}'.format(operation or '<no key>', count) for operation, count in skipped.most_common())))
+
+
+def event_attributes(msg, message):
+    """The attributes of the span of an OSM notification, following the OpenTelemetry messaging conventions.
+
+    Args:
+        msg (ConsumerRecord): The Kafka message of the notification
+        message (dict): The decoded notification
+
+    Returns:
+        attributes (dict): The topic, partition and offset of the message and the NS it refers to
+    """
+    value = message if isinstance(message, dict) else {}
+    return {
+        'messaging.system': 'kafka',
+        'messaging.operation': 'process',
+        'messaging.destination': getattr(msg, 'topic', None),
+        'messaging.kafka.partition': getattr(msg, 'partition', None),
+        'messaging.kafka.offset': getattr(msg, 'offset', None),
+        'osm.operation': msg.key.decode('ascii'),
+        'osm.ns_id': value.get('nsr_id') or value.get('nsInstanceId'),
+    }
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics-port', type=int, default=0,
+                            help='The port that the Prometheus metrics are served on; none by default')
+        parser.add_argument('--topics', nargs='+', default=None,
+                            help='The OSM topics consumed; `ACC_OSM_KAFKA_TOPICS` by default')
+        parser.add_argument('--partitions', type=int, nargs='+', default=None,
+                            help='The partitions of the topics consumed, assigned statically; '
+                                 '`ACC_OSM_KAFKA_PARTITIONS` by default, or all of them through the consumer group')
+
     def handle(self, *args, **options):
-        osm_notification_handler()
+        consumer = create_consumer(options['topics'], options['partitions'])
+        osm_notification_handler(consumer, metrics_port=options['metrics_port'])
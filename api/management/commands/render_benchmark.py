@@ -0,0 +1,87 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FAST_JSON_BACKENDS, FastJSONRenderer, XMLRenderer, load_json_backend
+
+
+def vdu_page(size):
+    """Build a page of the VDU list as the serializer outputs it.
+
+    Args:
+        size (int): The number of VDUs
+
+    Returns:
+        page (OrderedDict): The `next` and `previous` page URLs and the `results`
+
+    """
+    created_at = datetime(2019, 5, 20, 10, 0, 0)
+    results = [
+        OrderedDict([
+            ('id', i), ('creation_date', (created_at + timedelta(seconds=i)).isoformat() + 'Z'),
+            ('tenant_id', str(uuid.uuid4())), ('instance_id', str(uuid.uuid4())), ('vnf_id', str(uuid.uuid4())),
+            ('uuid', str(uuid.uuid4())), ('vdu_session_id', i), ('vcpu', 2), ('vram', 4.0), ('vdisk', 20),
+            ('state', 'active'),
+        ])
+        for i in range(size)
+    ]
+    return OrderedDict([('next', 'http://localhost/api/v1/vdus?cursor=cD0xMDAwMA%3D%3D'), ('previous', None),
+                        ('results', results)])
+
+
+class Command(BaseCommand):
+    help = 'Compare the render time and throughput of the JSON and XML renderers on a page of VDUs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vdus', type=int, default=10000, help='The number of VDUs of the page')
+        parser.add_argument('--repeat', type=int, default=5, help='The renders per renderer; the best one counts')
+        parser.add_argument('--output', default=os.path.join(settings.PROJECT_ROOT, 'logs', 'render_benchmark.json'),
+                            help='The JSON file that the results are written to')
+
+    def handle(self, *args, **options):
+        page = vdu_page(options['vdus'])
+        reference = JSONRenderer().render(page)
+
+        renderers = [('json', JSONRenderer())]
+        for name in FAST_JSON_BACKENDS:
+            backend = load_json_backend(name)
+            if backend is None:
+                self.stdout.write('{} is not installed; skipped'.format(name))
+                continue
+            renderer = FastJSONRenderer()
+            renderer.backend = backend
+            renderers.append((name, renderer))
+        renderers.append(('xml', XMLRenderer()))
+
+        results = OrderedDict()
+        baseline = None
+        for name, renderer in renderers:
+            durations = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                content = renderer.render(page, renderer.media_type, {})
+                durations.append(time.perf_counter() - start)
+            best = min(durations)
+            baseline = baseline or best
+            results[name] = {
+                'bytes': len(content),
+                'best_ms': round(best * 1000, 2),
+                'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+                'mb_per_sec': round(len(content) / best / 1e6, 1),
+                'speedup': round(baseline / best, 2),
+                'identical_to_json': content == reference if name != 'xml' else None,
+            }
+            self.stdout.write('{:>6}: {:8.2f}ms, {:7.1f} MB/s, {} bytes, {:.2f}x'.format(
+                name, results[name]['best_ms'], results[name]['mb_per_sec'], results[name]['bytes'],
+                results[name]['speedup']))
+
+        with open(options['output'], 'w') as f:
+            json.dump({'vdus': options['vdus'], 'repeat': options['repeat'], 'renderers': results}, f, indent=2)
+        self.stdout.write('Results written to {}'.format(options['output']))
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from api.models import Tenant, Instance, Vnf, Vdu
+from api.serializers import TenantSerializer, InstanceSerializer, VnfSerializer, VduSerializer
+
+SERIALIZERS = OrderedDict([
+    ('tenants', (Tenant, TenantSerializer)),
+    ('instances', (Instance, InstanceSerializer)),
+    ('vnfs', (Vnf, VnfSerializer)),
+    ('vdus', (Vdu, VduSerializer)),
+])
+
+
+def seed(vdus, vdus_per_vnf=10, vnfs_per_instance=4, instances_per_tenant=50):
+    """Create an inventory of the given number of VDUs.
+
+    Returns:
+        counts (dict): The number of entities created per resource
+
+    """
+    instances = max(1, vdus // (vdus_per_vnf * vnfs_per_instance))
+    Tenant.objects.bulk_create(
+        Tenant(uuid=str(uuid.uuid4()), name='tenant') for _ in range(max(1, instances // instances_per_tenant)))
+    tenants = list(Tenant.objects.all())
+    Instance.objects.bulk_create(
+        Instance(tenant=tenants[i % len(tenants)], uuid=str(uuid.uuid4()), name='ns', state='active')
+        for i in range(instances))
+    instances = list(Instance.objects.all())
+    Vnf.objects.bulk_create(
+        Vnf(tenant_id=ns.tenant_id, instance=ns, uuid=str(uuid.uuid4()), name='vnf', state='active')
+        for ns in instances for _ in range(vnfs_per_instance))
+    vnfs = list(Vnf.objects.all())
+    Vdu.objects.bulk_create(
+        Vdu(tenant_id=vnf.tenant_id, instance_id=vnf.instance_id, vnf=vnf, uuid=str(uuid.uuid4()), vcpu=2,
+            vram=4.0, vdisk=20, state='active')
+        for vnf in vnfs for _ in range(vdus_per_vnf))
+    return {resource: model.objects.count() for resource, (model, _) in SERIALIZERS.items()}
+
+
+def best_of(repeat, function):
+    """Call a function `repeat` times and return its shortest duration in seconds and its last result."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+
+class Command(BaseCommand):
+    help = 'Compare the serializers with the values() read path of the list views on a generated inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vdus', type=int, default=10000, help='The number of VDUs of the inventory')
+        parser.add_argument('--repeat', type=int, default=3, help='The runs per path; the best one counts')
+        parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+        parser.add_argument('--output',
+                            default=os.path.join(settings.PROJECT_ROOT, 'logs', 'serializer_benchmark.json'),
+                            help='The JSON file that the results are written to')
+
+    def handle(self, *args, **options):
+        test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                                     keepdb=options['keepdb'])
+        try:
+            counts = seed(options['vdus'])
+            results = OrderedDict()
+            for resource, (model, serializer_class) in SERIALIZERS.items():
+                queryset = model.objects.order_by('-id')
+                serializer_sec, expected = best_of(options['repeat'], lambda: serializer_class(
+                    serializer_class.setup_eager_loading(queryset), many=True).data)
+                values_sec, actual = best_of(options['repeat'], lambda: serializer_class.represent(
+                    list(serializer_class.values(queryset))))
+                if json.dumps(actual) != json.dumps(expected):
+                    raise CommandError('The values() path of {} differs from its serializer'.format(resource))
+                results[resource] = {
+                    'rows': counts[resource],
+                    'serializer_ms': round(serializer_sec * 1000, 2),
+                    'values_ms': round(values_sec * 1000, 2),
+                    'speedup': round(serializer_sec / values_sec, 2),
+                }
+                self.stdout.write('{:>9}: {:6} rows, serializer {:9.2f}ms, values {:8.2f}ms, {:.1f}x'.format(
+                    resource, counts[resource], results[resource]['serializer_ms'], results[resource]['values_ms'],
+                    results[resource]['speedup']))
+        finally:
+            connection.creation.destroy_test_db(test_db, verbosity=0, keepdb=options['keepdb'])
+
+        with open(options['output'], 'w') as f:
+            json.dump({'vdus': options['vdus'], 'repeat': options['repeat'], 'results': results}, f, indent=2)
+        self.stdout.write('Representations are identical. Results written to {}'.format(options['output']))
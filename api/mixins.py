@@ -0,0 +1,53 @@
+from rest_framework.response import Response
+
+from api.filters import TENANT_FILTERS, INSTANCE_FILTERS, VNF_FILTERS, VDU_FILTERS, requested_fields
+
+
+class ValuesListMixin(object):
+    """List View Mixin that builds the rows of the list straight from `values()`.
+
+    The serializer's representation is reproduced field for field by its `values` and `represent`
+    class methods, without creating a model instance or running the serializer per row. The filter,
+    ordering and pagination backends of the view apply as they do to the queryset.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        fields = requested_fields(request, serializer_class)
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = serializer_class.values(queryset, fields, extra=getattr(self, 'ordering_fields', ()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer_class.represent(page, fields))
+        return Response(serializer_class.represent(list(rows), fields))
+
+
+class ListFiltersMixin(object):
+    """List View Mixin that declares the query parameters the list is filtered and ordered on.
+
+    The lists are ordered from the newest entry by default, and may be ordered on their id or creation date.
+    """
+    filter_fields = {}
+    ordering_fields = ('id',)
+    ordering = ('-id',)
+
+
+class TenantFiltersMixin(ListFiltersMixin):
+    filter_fields = TENANT_FILTERS
+    ordering_fields = ('id', 'created_at')
+
+
+class InstanceFiltersMixin(ListFiltersMixin):
+    filter_fields = INSTANCE_FILTERS
+    ordering_fields = ('id', 'created_at')
+
+
+class VnfFiltersMixin(ListFiltersMixin):
+    filter_fields = VNF_FILTERS
+    ordering_fields = ('id', 'creation_date')
+
+
+class VduFiltersMixin(ListFiltersMixin):
+    filter_fields = VDU_FILTERS
+    ordering_fields = ('id', 'creation_date')
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from accounting.settings import MAX_STR_LEN, MID_STR_LEN, MIN_STR_LEN
 from api.constants import CATALOG_USER_DEFAULT, CATALOG_TENANT_DEFAULT, MANO_ID_DEFAULT, MANO_PROJECT_DEFAULT, \
@@ -7,7 +8,7 @@ from api.constants import CATALOG_USER_DEFAULT, CATALOG_TENANT_DEFAULT, MANO_ID_
 
 class Tenant(models.Model):
     """ Tenant Model. """
-    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of Tenant\'s creation')
+    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of Tenant\'s creation', db_index=True)
     description = models.CharField(max_length=MAX_STR_LEN, null=True, help_text='Description of Tenant')
     name = models.CharField(max_length=MID_STR_LEN, null=True, help_text='Tenant\'s Name')
     uuid = models.CharField(max_length=MID_STR_LEN, null=True, help_text='Tenant\'s OSM UUID')
@@ -22,7 +23,7 @@ class Instance(models.Model):
         null=True,
         help_text="NS Instance\'s Tenant",
     )
-    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of NS Instance\'s Creation')
+    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of NS Instance\'s Creation', db_index=True)
     catalog_user = models.CharField(max_length=MID_STR_LEN, default=CATALOG_USER_DEFAULT, help_text='Catalog User')
     catalog_tenant = models.CharField(max_length=MID_STR_LEN, default=CATALOG_TENANT_DEFAULT, help_text='Catalog Tenant')
     description = models.CharField(max_length=MAX_STR_LEN, null=True, help_text='Description of NS Instance')
@@ -30,11 +31,11 @@ class Instance(models.Model):
     mano_project = models.CharField(max_length=MID_STR_LEN, default=MANO_PROJECT_DEFAULT, help_text='The MANO Project')
     mano_user = models.CharField(max_length=MID_STR_LEN, null=True, help_text='The user of the MANO')
     name = models.CharField(max_length=MID_STR_LEN, null=True, help_text='NS Instance\'s Name')
-    nfvipop_id = models.CharField(max_length=MID_STR_LEN, default=NFVIPOP_ID_DEFAULT)
+    nfvipop_id = models.CharField(max_length=MID_STR_LEN, default=NFVIPOP_ID_DEFAULT, db_index=True)
     ns_session_id = models.IntegerField(default=-1, help_text='NS Instance\'s Session ID')
-    state = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='NS Instance\'s State')
+    state = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='NS Instance\'s State', db_index=True)
     uuid = models.CharField(max_length=MID_STR_LEN, null=True, help_text='NS Instance\'s OSM UUID')
-    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='NS Instance\'s VIM Type')
+    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='NS Instance\'s VIM Type', db_index=True)
 
 
 class Vnf(models.Model):
@@ -51,11 +52,11 @@ class Vnf(models.Model):
         on_delete=models.CASCADE,
         help_text='VNF\'s NS Instance'
     )
-    creation_date = models.DateTimeField(auto_now_add=True, help_text='Datetime of VNF\'s Creation')
+    creation_date = models.DateTimeField(auto_now_add=True, help_text='Datetime of VNF\'s Creation', db_index=True)
     name = models.CharField(max_length=MID_STR_LEN, help_text='VNF\'s Name', null=True)
-    state = models.CharField(max_length=MIN_STR_LEN, help_text='VNF\'s State', null=True)
+    state = models.CharField(max_length=MIN_STR_LEN, help_text='VNF\'s State', null=True, db_index=True)
     uuid = models.CharField(max_length=MID_STR_LEN, help_text='VNF\'s OSM UUID', null=True)
-    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VNF\'s VIM Type')
+    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VNF\'s VIM Type', db_index=True)
     vnf_session_id = models.IntegerField(default=-1, help_text='VNF\'s Session ID')
 
 
@@ -79,17 +80,17 @@ class Vdu(models.Model):
         on_delete=models.CASCADE,
         help_text='VDU\'s VNF'
     )
-    creation_date = models.DateTimeField(auto_now_add=True, help_text='Datetime of VDU\'s Creation')
+    creation_date = models.DateTimeField(auto_now_add=True, help_text='Datetime of VDU\'s Creation', db_index=True)
     flavor = models.CharField(max_length=MIN_STR_LEN, default=FLAVOR_DEFAULT, help_text='VDU\'s Flavor')
-    nfvipop_id = models.CharField(max_length=MID_STR_LEN, null=True, default=NFVIPOP_ID_DEFAULT)
+    nfvipop_id = models.CharField(max_length=MID_STR_LEN, null=True, default=NFVIPOP_ID_DEFAULT, db_index=True)
     project_name = models.CharField(max_length=MID_STR_LEN, null=True, help_text='VDU\'s Project Name')
-    state = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VDU\'s State')
+    state = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VDU\'s State', db_index=True)
     uuid = models.CharField(max_length=MID_STR_LEN, null=True, help_text='VDU\'s VIM UUID')
     vcpu = models.IntegerField(null=True, help_text='VDU\'s CPU')
     vdisk = models.IntegerField(null=True, help_text='VDU\'s Disk')
     vram = models.FloatField(null=True, help_text='VDU\'s RAM (GB)')
     vdu_session_id = models.IntegerField(default=-1, null=True, help_text='VDU\'s Session ID')
-    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VDU\'s VIM Type')
+    vim_type = models.CharField(max_length=MIN_STR_LEN, null=True, help_text='VDU\'s VIM Type', db_index=True)
 
 
 class VduMetric(models.Model):
@@ -102,3 +103,189 @@ class VduMetric(models.Model):
     )
     metric_name = models.CharField(max_length=MID_STR_LEN, null=True, help_text='The Metric\'s Type')
     metric_value = models.FloatField(default=0.0, help_text='The Metric\'s Value')
+
+
+class Usage(models.Model):
+    """ Usage Rollup Base Model.
+
+    The samples of a metric aggregated per hour, per day or in total, from which the average is derived.
+    Subclasses add the entity whose usage is aggregated.
+    """
+    metric_name = models.CharField(max_length=MID_STR_LEN, help_text='The Metric\'s Type')
+    granularity = models.CharField(max_length=MIN_STR_LEN, help_text='The Length of the Period: hour, day or total')
+    period_start = models.DateTimeField(help_text='Datetime of the Period\'s Start')
+    samples = models.IntegerField(default=0, help_text='The Number of Samples in the Period')
+    total = models.FloatField(default=0.0, help_text='The Sum of the Samples in the Period')
+    minimum = models.FloatField(null=True, help_text='The Lowest Sample in the Period')
+    maximum = models.FloatField(null=True, help_text='The Highest Sample in the Period')
+
+    class Meta:
+        abstract = True
+
+
+class VduUsage(Usage):
+    """ VDU Usage Rollup Model. """
+    vdu = models.ForeignKey(
+        Vdu,
+        related_name='usage',
+        on_delete=models.CASCADE,
+        help_text='The VDU whose usage is aggregated'
+    )
+
+    class Meta:
+        unique_together = [('vdu', 'metric_name', 'granularity', 'period_start')]
+        index_together = [('granularity', 'period_start')]
+
+
+class VnfUsage(Usage):
+    """ VNF Usage Rollup Model, over the VDUs of the VNF. """
+    vnf = models.ForeignKey(
+        Vnf,
+        related_name='usage',
+        on_delete=models.CASCADE,
+        help_text='The VNF whose usage is aggregated'
+    )
+
+    class Meta:
+        unique_together = [('vnf', 'metric_name', 'granularity', 'period_start')]
+        index_together = [('granularity', 'period_start')]
+
+
+class InstanceUsage(Usage):
+    """ NS Instance Usage Rollup Model, over the VDUs of the NS Instance. """
+    instance = models.ForeignKey(
+        Instance,
+        related_name='usage',
+        on_delete=models.CASCADE,
+        help_text='The NS Instance whose usage is aggregated'
+    )
+
+    class Meta:
+        unique_together = [('instance', 'metric_name', 'granularity', 'period_start')]
+        index_together = [('granularity', 'period_start')]
+
+
+class TenantUsage(Usage):
+    """ Tenant Usage Rollup Model, over the VDUs of the Tenant. """
+    tenant = models.ForeignKey(
+        Tenant,
+        related_name='usage',
+        on_delete=models.CASCADE,
+        help_text='The Tenant whose usage is aggregated'
+    )
+
+    class Meta:
+        unique_together = [('tenant', 'metric_name', 'granularity', 'period_start')]
+        index_together = [('granularity', 'period_start')]
+
+
+class UsageWindow(models.Model):
+    """ Pending Usage Window Model.
+
+    A window of samples of a VDU metric, added to the rollups of the VDU and yet to be added to those of its VNF,
+    NS Instance and Tenant, which the shards of `send_metrics` leave to the end of the run.
+    """
+    vnf = models.ForeignKey(
+        Vnf,
+        related_name='usage_windows',
+        on_delete=models.CASCADE,
+        help_text='The VNF of the VDU'
+    )
+    instance = models.ForeignKey(
+        Instance,
+        related_name='usage_windows',
+        on_delete=models.CASCADE,
+        help_text='The NS Instance of the VDU'
+    )
+    tenant = models.ForeignKey(
+        Tenant,
+        related_name='usage_windows',
+        on_delete=models.CASCADE,
+        help_text='The Tenant of the VDU'
+    )
+    metric_name = models.CharField(max_length=MID_STR_LEN, help_text='The Metric\'s Type')
+    moment = models.DateTimeField(help_text='Datetime of the Window\'s End')
+    samples = models.IntegerField(help_text='The Number of Samples in the Window')
+    total = models.FloatField(help_text='The Sum of the Samples in the Window')
+    minimum = models.FloatField(help_text='The Lowest Sample in the Window')
+    maximum = models.FloatField(help_text='The Highest Sample in the Window')
+
+
+class OutboxMessage(models.Model):
+    """ Billing Outbox Message Model. """
+    instance = models.ForeignKey(
+        Instance,
+        related_name='outbox_messages',
+        on_delete=models.CASCADE,
+        null=True,
+        help_text='The NS Instance that the message refers to'
+    )
+    vnf = models.ForeignKey(
+        Vnf,
+        related_name='outbox_messages',
+        on_delete=models.CASCADE,
+        null=True,
+        help_text='The VNF that the message refers to'
+    )
+    vdu = models.ForeignKey(
+        Vdu,
+        related_name='outbox_messages',
+        on_delete=models.CASCADE,
+        null=True,
+        help_text='The VDU that the message refers to'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of the Message\'s Creation')
+    operation = models.CharField(max_length=MID_STR_LEN, help_text='The Billing Operation')
+    payload = models.TextField(default='{}', help_text='The JSON Arguments of the Billing Operation')
+    state = models.CharField(max_length=MIN_STR_LEN, default='pending', db_index=True,
+                             help_text='The Message\'s State: pending or failed')
+    attempts = models.IntegerField(default=0, help_text='The Number of Delivery Attempts')
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True,
+                                           help_text='Datetime after which the Message may be delivered')
+    last_error = models.TextField(null=True, help_text='The Error of the last Delivery Attempt')
+
+    class Meta:
+        index_together = [('state', 'next_attempt_at')]
+
+
+class BillingSession(models.Model):
+    """ Billing Session Registry Model.
+
+    A row per session opened or closed on the Billing Services, recorded along with the outbox message of the call,
+    so that a replayed lifecycle event finds it and never calls the Billing Services twice.
+    """
+    level = models.CharField(max_length=MIN_STR_LEN, help_text='The Level of the Session: ns, vnf or vdu')
+    uuid = models.CharField(max_length=MID_STR_LEN, help_text='The OSM or VIM UUID of the Entity of the Session')
+    state = models.CharField(max_length=MIN_STR_LEN, help_text='The Call Recorded: open or closed')
+    created_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of the Call\'s Recording')
+
+    class Meta:
+        unique_together = [('level', 'uuid', 'state')]
+
+
+class LifecycleNotification(models.Model):
+    """ Handled Lifecycle Notification Registry Model.
+
+    A row per OSM notification handled, unique on its idempotency key, so that its redeliveries are skipped. The
+    completion of an operation finds the row of its start by the OSM operation id, along with the scale type
+    announced by the start of a scaling.
+    """
+    key = models.CharField(max_length=MAX_STR_LEN, unique=True, help_text='The Idempotency Key of the Notification')
+    ns_uuid = models.CharField(max_length=MID_STR_LEN, null=True, help_text='The OSM UUID of the NS Instance')
+    operation = models.CharField(max_length=MIN_STR_LEN, help_text='The Operation Type, as found in the Kafka Key')
+    operation_id = models.CharField(max_length=MID_STR_LEN, null=True, db_index=True,
+                                    help_text='The OSM Operation ID, shared by its Start and its Completion')
+    scale_type = models.CharField(max_length=MIN_STR_LEN, null=True,
+                                  help_text='The Scale Type announced by a Scaling Start: SCALE_OUT or SCALE_IN')
+    handled_at = models.DateTimeField(auto_now_add=True, help_text='Datetime of the Notification\'s Handling')
+
+
+class NsLock(models.Model):
+    """ NS Lock Model.
+
+    Leased while a notification of a NS is handled, so that the notifications of a NS are handled one at a time
+    across the workers. A lease that was never released, e.g. by a worker that died, may be taken over once expired.
+    """
+    ns_uuid = models.CharField(max_length=MID_STR_LEN, unique=True, help_text='The OSM UUID of the NS Instance')
+    owner = models.CharField(max_length=MAX_STR_LEN, help_text='The Idempotency Key of the Notification Handled')
+    expires_at = models.DateTimeField(help_text='Datetime after which the Lease may be taken over')
@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework import pagination
+
+
+class CursorPagination(pagination.CursorPagination):
+    """Cursor Pagination Class.
+
+    Paginates the list views on the primary key, newest first. The cursor encodes the position of
+    the last entry of the page, so fetching any page is a `WHERE id < ... LIMIT page_size` query
+    on the primary key index, no matter how deep the page is, and entries created between two
+    requests neither shift nor repeat the pages that follow.
+
+    The page size defaults to `PAGE_SIZE` of the REST framework settings and can be changed per
+    request with `?page_size=`, up to `API_MAX_PAGE_SIZE`.
+
+    Examples:
+        >>> # GET /api/v1/vdus?page_size=500
+        >>> # {"next": "http://.../api/v1/vdus?cursor=cD0xNTAw&page_size=500", "previous": null, "results": [...]}
+
+    """
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
@@ -0,0 +1,10 @@
+from rest_framework.parsers import BaseParser
+
+
+class XMLParser(BaseParser):
+    """XML Parser that imports `rest_framework_xml` only once a request body is parsed as XML."""
+    media_type = 'application/xml'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        from rest_framework_xml.parsers import XMLParser
+        return XMLParser().parse(stream, media_type, parser_context)
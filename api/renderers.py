@@ -0,0 +1,118 @@
+import logging
+import math
+from importlib import import_module
+from itertools import chain, compress
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+# The JSON libraries tried in order by the `auto` backend; the standard library is the last resort
+FAST_JSON_BACKENDS = ('orjson', 'ujson')
+
+# The range of the floats that the standard library writes without an exponent, as the fast libraries do
+PLAIN_FLOAT_MIN = 1e-4
+PLAIN_FLOAT_MAX = 1e16
+
+
+def load_json_backend(name):
+    """Import the JSON library that the fast renderer encodes with.
+
+    Args:
+        name (str): `auto` for the first installed of `FAST_JSON_BACKENDS`, `orjson`, `ujson` or `json`
+
+    Returns:
+        module: The JSON library, or None for the standard library
+
+    """
+    for backend in (FAST_JSON_BACKENDS if name == 'auto' else (name,)):
+        if backend == 'json':
+            break
+        try:
+            return import_module(backend)
+        except ImportError:
+            if name != 'auto':
+                logger.warning('JSON backend {} is not installed; falling back to the standard library'.format(name))
+    return None
+
+
+def plain_floats(data):
+    """Check that the floats of the data are written alike by the standard library and the fast ones.
+
+    The fast libraries write the floats that the standard library writes with an exponent differently, e.g.
+    `1e-7` instead of `1e-07`, and write the non-finite floats as `null` or `NaN` instead of rejecting them.
+    The data is walked a level at a time, each level being filtered and flattened with builtins rather than
+    value by value, so that the check costs a fraction of the encoding it saves.
+
+    Args:
+        data: The data to render
+
+    Returns:
+        bool: True if all the floats of the data are zero or finite and written without an exponent
+
+    """
+    level = [data]
+    while level:
+        types = list(map(type, level))
+        kinds = set(types)
+        floats = set(kind for kind in kinds if issubclass(kind, float))
+        if floats:
+            values = list(filter(None, map(abs, compress(level, map(floats.__contains__, types)))))
+            if values and not (all(map(math.isfinite, values)) and
+                               PLAIN_FLOAT_MIN <= min(values) and max(values) < PLAIN_FLOAT_MAX):
+                return False
+        mappings = set(kind for kind in kinds if issubclass(kind, dict))
+        sequences = set(kind for kind in kinds if issubclass(kind, (list, tuple)))
+        children = []
+        if mappings:
+            children.extend(chain.from_iterable(map(dict.values, compress(level, map(mappings.__contains__, types)))))
+        if sequences:
+            children.extend(chain.from_iterable(compress(level, map(sequences.__contains__, types))))
+        level = children
+    return True
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON Renderer backed by orjson or ujson, if installed.
+
+    The output is byte for byte that of `JSONRenderer`: compact, UTF-8, with U+2028 and U+2029 escaped. The
+    standard renderer is used instead for indented responses, i.e. for the browsable API or an `indent` media
+    type parameter, for data that the fast library cannot encode and for data with floats that the fast library
+    writes differently, see `plain_floats`. Non-finite floats are thus rejected with a ValueError, as `STRICT_JSON`
+    makes the standard renderer do.
+
+    The backend is set with `API_JSON_BACKEND`: `auto` (default), `orjson`, `ujson` or `json`.
+    """
+    backend = load_json_backend(settings.API_JSON_BACKEND)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.backend is None or self.get_indent(accepted_media_type, renderer_context or {}) or \
+                not plain_floats(data):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        try:
+            content = self.dumps(data)
+        except (TypeError, ValueError, OverflowError):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+    def dumps(self, data):
+        if self.backend.__name__ == 'orjson':
+            return self.backend.dumps(data, default=JSONEncoder().default,
+                                      option=self.backend.OPT_UTC_Z | self.backend.OPT_NON_STR_KEYS)
+        return self.backend.dumps(data, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+
+class XMLRenderer(BaseRenderer):
+    """XML Renderer that imports `rest_framework_xml` only once a response is rendered as XML."""
+    media_type = 'application/xml'
+    format = 'xml'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        from rest_framework_xml.renderers import XMLRenderer
+        return XMLRenderer().render(data, accepted_media_type, renderer_context)
+
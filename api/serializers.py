@@ -1,9 +1,158 @@
-from rest_framework import serializers
+from collections import OrderedDict
 
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from api.filters import requested_fields
 from api.models import *
 
 
-class InstanceSerializer(serializers.ModelSerializer):
+# The fields whose representation is the value read from the database as is
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.FloatField, serializers.ReadOnlyField)
+
+
+def fast_representation(field):
+    """The function that turns a value read with `values()` into the field's representation.
+
+    Returns:
+        function: None if the value is represented as is, or a shortcut of `field.to_representation`
+
+    """
+    if type(field) in PASSTHROUGH_FIELDS:
+        return None
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if type(field) is serializers.DateTimeField and output_format and output_format.lower() == ISO_8601:
+        field_timezone = getattr(field, 'timezone', field.default_timezone())
+
+        def datetime_representation(value):
+            if field_timezone is not None and timezone.is_aware(value):
+                value = value.astimezone(field_timezone)
+            else:
+                value = field.enforce_timezone(value)
+            representation = value.isoformat()
+            return representation[:-6] + 'Z' if representation.endswith('+00:00') else representation
+        return datetime_representation
+    return field.to_representation
+
+
+class SparseFieldsMixin(object):
+    """Sparse Fields Serializer Mixin.
+
+    Drops the fields that were not requested with `?fields=` and loads the related entities of the
+    remaining fields in a constant number of queries. Subclasses declare the relations walked by
+    their fields in:
+
+      * `select_related_fields`: field name -> forward relation that is joined
+      * `prefetch_related_fields`: field name -> (reverse relation, related model, foreign key of
+        the related model) that is prefetched, loading only the `uuid` of the related entities
+
+    """
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super(SparseFieldsMixin, self).__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'), self.__class__)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """Load the related entities walked by the serializer, in a constant number of queries.
+
+        Args:
+            queryset (QuerySet): The queryset to serialize
+            fields (tuple, optional): The requested fields; if given, only their columns and relations are loaded
+
+        Returns:
+            queryset (QuerySet): The queryset with the related entities joined or prefetched
+
+        """
+        columns = ['id']
+        for name in fields or cls.Meta.fields:
+            if name in cls.select_related_fields:
+                relation = cls.select_related_fields[name]
+                queryset = queryset.select_related(relation)
+                columns += [relation, '{}__uuid'.format(relation)]
+            elif name in cls.prefetch_related_fields:
+                relation, model, foreign_key = cls.prefetch_related_fields[name]
+                queryset = queryset.prefetch_related(
+                    Prefetch(relation, queryset=model.objects.only('uuid', foreign_key).order_by('id')))
+            else:
+                columns.append(name)
+        return queryset.only(*columns) if fields else queryset
+
+    @classmethod
+    def values(cls, queryset, fields=None, extra=()):
+        """Read the columns of the serializer's fields as dictionaries, without creating model instances.
+
+        Args:
+            queryset (QuerySet): The queryset to serialize
+            fields (tuple, optional): The requested fields; all the fields of the serializer by default
+            extra (tuple, optional): Additional columns to read, e.g. the ones the list is paginated on
+
+        Returns:
+            rows (QuerySet): A dictionary per entity, to be turned into the representation with `represent`
+
+        """
+        columns = ['id']
+        for name in fields or cls.Meta.fields:
+            if name in cls.select_related_fields:
+                columns.append('{}__uuid'.format(cls.select_related_fields[name]))
+            elif name not in cls.prefetch_related_fields:
+                columns.append(name)
+        columns += [column for column in extra if column not in columns]
+        return queryset.prefetch_related(None).values(*columns)
+
+    @classmethod
+    def represent(cls, rows, fields=None):
+        """Turn the rows read with `values` into the same representation as the serializer.
+
+        The uuids of the related entities of each many-relation are read in a single query.
+
+        Args:
+            rows (list): The rows read with `values`
+            fields (tuple, optional): The requested fields; all the fields of the serializer by default
+
+        Returns:
+            data (list): An OrderedDict per row, equal to the serializer's representation of the entity
+
+        """
+        ids = [row['id'] for row in rows]
+        serializer_fields = cls().fields
+        readers = []
+        for name in fields or cls.Meta.fields:
+            if name in cls.select_related_fields:
+                readers.append((name, '{}__uuid'.format(cls.select_related_fields[name]), None, None))
+            elif name in cls.prefetch_related_fields:
+                _, model, foreign_key = cls.prefetch_related_fields[name]
+                related = dict((entity_id, []) for entity_id in ids)
+                for entity_id, uuid in model.objects.filter(**{'{}__in'.format(foreign_key): ids}) \
+                        .order_by('id').values_list(foreign_key, 'uuid'):
+                    related[entity_id].append(uuid)
+                readers.append((name, 'id', None, related))
+            else:
+                readers.append((name, name, fast_representation(serializer_fields[name]), None))
+
+        data = []
+        for row in rows:
+            item = OrderedDict()
+            for name, column, to_representation, related in readers:
+                value = row[column]
+                if related is not None:
+                    item[name] = related[value]
+                elif value is None or to_representation is None:
+                    item[name] = value
+                else:
+                    item[name] = to_representation(value)
+            data.append(item)
+        return data
+
+
+class InstanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tenant_id = serializers.SlugRelatedField(
         source='tenant',
         read_only=True,
@@ -22,13 +171,16 @@ class InstanceSerializer(serializers.ModelSerializer):
         slug_field="uuid"
     )
 
+    select_related_fields = {'tenant_id': 'tenant'}
+    prefetch_related_fields = {'vdu_ids': ('vdus', Vdu, 'instance'), 'vnf_ids': ('vnfs', Vnf, 'instance')}
+
     class Meta:
         model = Instance
         fields = ('id', 'uuid', 'ns_session_id', 'name', 'catalog_tenant', 'catalog_user', 'mano_id', 'mano_project',
                   'mano_user', 'nfvipop_id', 'state', 'created_at', 'tenant_id', 'vdu_ids', 'vnf_ids')
 
 
-class VnfSerializer(serializers.HyperlinkedModelSerializer):
+class VnfSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     tenant_id = serializers.SlugRelatedField(
         source='tenant',
         read_only=True,
@@ -46,12 +198,15 @@ class VnfSerializer(serializers.HyperlinkedModelSerializer):
         slug_field="uuid"
     )
 
+    select_related_fields = {'tenant_id': 'tenant', 'instance_id': 'instance'}
+    prefetch_related_fields = {'vdu_ids': ('vdus', Vdu, 'vnf')}
+
     class Meta:
         model = Vnf
         fields = ('id', 'uuid', 'name', 'vnf_session_id', 'tenant_id', 'instance_id', 'vdu_ids')
 
 
-class VduSerializer(serializers.HyperlinkedModelSerializer):
+class VduSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     tenant_id = serializers.SlugRelatedField(
         source='tenant',
         read_only=True,
@@ -63,18 +218,20 @@ class VduSerializer(serializers.HyperlinkedModelSerializer):
         slug_field='uuid'
     )
     vnf_id = serializers.SlugRelatedField(
-        source='instance',
+        source='vnf',
         read_only=True,
         slug_field='uuid'
     )
 
+    select_related_fields = {'tenant_id': 'tenant', 'instance_id': 'instance', 'vnf_id': 'vnf'}
+
     class Meta:
         model = Vdu
         fields = ('id', 'creation_date', 'tenant_id', 'instance_id', 'vnf_id',
                   'uuid', 'vdu_session_id', 'vcpu', 'vram', 'vdisk', 'state')
 
 
-class TenantSerializer(serializers.HyperlinkedModelSerializer):
+class TenantSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     vdu_ids = serializers.SlugRelatedField(
         source='vdus',
         many=True,
@@ -94,6 +251,23 @@ class TenantSerializer(serializers.HyperlinkedModelSerializer):
         slug_field="uuid"
     )
 
+    prefetch_related_fields = {'instance_ids': ('instances', Instance, 'tenant'), 'vnf_ids': ('vnfs', Vnf, 'tenant'),
+                               'vdu_ids': ('vdus', Vdu, 'tenant')}
+
     class Meta:
         model = Tenant
         fields = ('id', 'uuid', 'description', 'name', 'created_at', 'instance_ids', 'vnf_ids', 'vdu_ids')
+
+
+class UsageSerializer(serializers.Serializer):
+    """The usage of a metric over a period, aggregated from the rollups of the VDUs."""
+    metric = serializers.CharField(source='metric_name', read_only=True)
+    period_start = serializers.DateTimeField(read_only=True)
+    samples = serializers.IntegerField(read_only=True)
+    total = serializers.FloatField(read_only=True)
+    average = serializers.SerializerMethodField()
+    minimum = serializers.FloatField(read_only=True)
+    maximum = serializers.FloatField(read_only=True)
+
+    def get_average(self, row):
+        return row['total'] / row['samples'] if row['samples'] else None
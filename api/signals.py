@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from api.cache import invalidate
+from api.models import Tenant, Instance, Vnf, Vdu
+
+# Sent after bulk changes of the inventory that bypass the model signals, e.g. `QuerySet.update()`
+inventory_changed = Signal()
+
+
+@receiver(inventory_changed)
+@receiver(post_save, sender=Tenant)
+@receiver(post_save, sender=Instance)
+@receiver(post_save, sender=Vnf)
+@receiver(post_save, sender=Vdu)
+@receiver(post_delete, sender=Tenant)
+@receiver(post_delete, sender=Instance)
+@receiver(post_delete, sender=Vnf)
+@receiver(post_delete, sender=Vdu)
+def invalidate_response_cache(sender, **kwargs):
+    """Invalidate the cached API responses once the change of the inventory is committed.
+
+    Invalidating before the commit would let a concurrent request cache the old data as current.
+    """
+    transaction.on_commit(invalidate)
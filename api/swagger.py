@@ -7,8 +7,8 @@ from api.serializers import *
 # ==================================
 #     Accounting API Responses
 # ==================================
+# The successful responses of the list views are generated from their paginator
 TenantList_GET = {
-    status.HTTP_200_OK: TenantSerializer(many=True),
     status.HTTP_401_UNAUTHORIZED: 'Unauthorized to access tenants',
     status.HTTP_404_NOT_FOUND: 'Information not found',
 }
@@ -20,7 +20,6 @@ TenantDetail_GET = {
 }
 
 InstanceList_GET = {
-    status.HTTP_200_OK: InstanceSerializer(many=True),
     status.HTTP_401_UNAUTHORIZED: 'Unauthorized to access instances',
     status.HTTP_404_NOT_FOUND: 'Information not found',
 }
@@ -32,7 +31,6 @@ InstanceDetail_GET = {
 }
 
 VnfList_GET = {
-    status.HTTP_200_OK: VnfSerializer(many=True),
     status.HTTP_401_UNAUTHORIZED: 'Unauthorized to access VNFs',
     status.HTTP_404_NOT_FOUND: 'Information not found',
 }
@@ -44,7 +42,6 @@ VnfDetail_GET = {
 }
 
 VduList_GET = {
-    status.HTTP_200_OK: VduSerializer(many=True),
     status.HTTP_401_UNAUTHORIZED: 'Unauthorized to access VDUs',
     status.HTTP_404_NOT_FOUND: 'Information not found',
 }
@@ -55,6 +52,19 @@ VduDetail_GET = {
     status.HTTP_404_NOT_FOUND: 'Requested VDU not found',
 }
 
+Usage_GET = {
+    status.HTTP_200_OK: UsageSerializer(many=True),
+    status.HTTP_400_BAD_REQUEST: 'Invalid range or step',
+    status.HTTP_401_UNAUTHORIZED: 'Unauthorized to access usage',
+    status.HTTP_404_NOT_FOUND: 'Requested entity not found',
+}
+
+Export_GET = {
+    status.HTTP_200_OK: 'A stream of NDJSON lines or CSV rows',
+    status.HTTP_400_BAD_REQUEST: 'Invalid filter',
+    status.HTTP_401_UNAUTHORIZED: 'Unauthorized to export',
+}
+
 # ==================================
 #    Accounting API Parameters
 # ==================================
@@ -93,6 +103,63 @@ UUID = openapi.Parameter(
     required=True
 )
 
+USAGE_PARAMETERS = [
+    openapi.Parameter(
+        name='from', in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description='The start of the range as an ISO 8601 date or datetime; a day (hourly) or 30 days (daily) '
+                    'before `to` by default. Ignored for the total.',
+        required=False
+    ),
+    openapi.Parameter(
+        name='to', in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description='The end of the range as an ISO 8601 date or datetime; now by default. Ignored for the total.',
+        required=False
+    ),
+    openapi.Parameter(
+        name='step', in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        enum=['hour', 'day', 'total'],
+        description='The period of the aggregates, or `total` for the usage since the entity was created; '
+                    '`hour` by default',
+        required=False
+    ),
+]
+
+EXPORT_RESOURCE = openapi.Parameter(
+    name='resource', in_=openapi.IN_PATH,
+    type=openapi.TYPE_STRING,
+    enum=['tenants', 'instances', 'vnfs', 'vdus'],
+    description='The resource to export',
+    required=True
+)
+
+EXPORT_FORMAT = openapi.Parameter(
+    name='export_format', in_=openapi.IN_PATH,
+    type=openapi.TYPE_STRING,
+    enum=['ndjson', 'csv'],
+    description='The format of the export: one JSON object per line, or CSV with a header line',
+    required=True
+)
+
+EXPORT_FILTERS = [
+    openapi.Parameter(
+        name=name, in_=openapi.IN_QUERY,
+        type=openapi.TYPE_STRING,
+        description=description,
+        required=False
+    )
+    for name, description in (
+        ('state', 'Entries in the given state (not applicable to tenants)'),
+        ('vim_type', 'Entries of the given VIM type (not applicable to tenants)'),
+        ('nfvipop_id', 'Entries of the given NFVI PoP (instances and VDUs only)'),
+        ('name', 'Tenants of the given name (tenants only)'),
+        ('created_after', 'Entries created at or after the given ISO 8601 date or datetime'),
+        ('created_before', 'Entries created before the given ISO 8601 date or datetime'),
+    )
+]
+
 # ==================================
 #    Instance Swagger Decorators
 # ==================================
@@ -147,3 +214,21 @@ vdu_list_by_instance_uuid = swagger_auto_schema(
 vdu_retrieve_by_instance_uuid = \
     swagger_auto_schema(operation_description='Retrieve VDU by NS Instance UUID',
                         responses=VduDetail_GET, manual_parameters=[INSTANCE_UUID, UUID])
+
+# ==================================
+#     Usage Swagger Decorators
+# ==================================
+vdu_usage = swagger_auto_schema(operation_description='Usage of a VDU by UUID', responses=Usage_GET,
+                                manual_parameters=[UUID] + USAGE_PARAMETERS)
+vnf_usage = swagger_auto_schema(operation_description='Usage of the VDUs of a VNF by UUID', responses=Usage_GET,
+                                manual_parameters=[UUID] + USAGE_PARAMETERS)
+instance_usage = swagger_auto_schema(operation_description='Usage of the VDUs of a NS Instance by UUID',
+                                     responses=Usage_GET, manual_parameters=[UUID] + USAGE_PARAMETERS)
+tenant_usage = swagger_auto_schema(operation_description='Usage of the VDUs of a Tenant by UUID',
+                                   responses=Usage_GET, manual_parameters=[UUID] + USAGE_PARAMETERS)
+
+# ==================================
+#     Export Swagger Decorators
+# ==================================
+export = swagger_auto_schema(operation_description='Export all the entries of a resource as NDJSON or CSV',
+                             responses=Export_GET, manual_parameters=[EXPORT_RESOURCE, EXPORT_FORMAT] + EXPORT_FILTERS)
@@ -0,0 +1,264 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from accounting import metrics
+from accounting.celery import app
+from accounting.database import DISCONNECT_ERRORS
+from api.constants import INSTANTIATE, TERMINATE, INSTANTIATED, TERMINATED, SCALE, SCALED, SCALE_OUT, SCALE_IN
+from api.models import Instance, LifecycleNotification, NsLock
+from api.signals import inventory_changed
+from api.utils import ns_termination_handler, ns_instantiation_handler, ns_pre_instantiation_handler, \
+    vnf_scaling_out_handler, vnf_scaling_in_handler
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which the lock of a NS may be taken over, should its holder never release it
+NS_LOCK_TIMEOUT = 600
+
+# The notification that starts the operation completed by each notification
+STARTED_BY = {INSTANTIATED: INSTANTIATE, TERMINATED: TERMINATE, SCALED: SCALE}
+
+# Seconds between two attempts of a notification waiting for the lock of its NS or for the start of its operation
+RETRY_DELAY = 5
+# Attempts of a completion waiting for the start of its operation, before it is handled regardless
+START_WAIT_RETRIES = 6
+
+
+class UnknownScaleType(LookupError):
+    """The completion of a scaling whose start, announcing the scale type, was not handled."""
+
+
+def ns_id(message):
+    """The UUID of the NS that an OSM notification refers to."""
+    return message.get('nsr_id') or message.get('nsInstanceId')
+
+
+def operation_id(message):
+    """The id of the OSM operation, shared by the notifications of its start and of its completion."""
+    return message.get('_id') or message.get('nslcmop_id')
+
+
+def idempotency_key(operation, message):
+    """The key that identifies an OSM notification across redeliveries.
+
+    Args:
+        operation (str): The operation type, as found in the key of the Kafka message
+        message (dict): The decoded notification
+
+    Returns:
+        key (str): The UUID of the NS, the operation type and the id of the OSM operation
+
+    Examples:
+        >>> idempotency_key('instantiated', {'nsr_id': '2c80ff71-...', 'nslcmop_id': '08f4b767-...'})
+        '2c80ff71-...:instantiated:08f4b767-...'
+
+    """
+    return '{}:{}:{}'.format(ns_id(message), operation, operation_id(message))
+
+
+def enqueue(operation, message):
+    """Queue the handling of an OSM notification, with its idempotency key as task id.
+
+    Args:
+        operation (str): The operation type, as found in the key of the Kafka message
+        message (dict): The decoded notification
+
+    """
+    handle_notification.apply_async((operation, message), task_id=idempotency_key(operation, message))
+
+
+@app.task(bind=True, acks_late=True, max_retries=NS_LOCK_TIMEOUT // RETRY_DELAY, default_retry_delay=RETRY_DELAY)
+def handle_notification(self, operation, message):
+    """Handle an OSM notification, unless it was already handled.
+
+    The notifications of a NS are handled one at a time, and those completing an operation wait for the start
+    of the operation to be handled first, as the tasks may run in any order across the workers. The handled
+    notifications and the locks of the NS are kept in the database, along with the sessions opened or closed, so
+    that a redelivery is skipped even if the cache is lost. The task is acknowledged once it ends, so that it is
+    redelivered if the worker dies, and retried if the database is lost. The completion of a scaling whose scale
+    type is unknown is retried, and fails once out of retries, rather than being marked as handled.
+
+    Args:
+        operation (str): The operation type, as found in the key of the Kafka message
+        message (dict): The decoded notification
+
+    """
+    key = idempotency_key(operation, message)
+    ns = ns_id(message)
+    try:
+        if handled(key):
+            metrics.NOTIFICATION_DUPLICATES.labels(operation).inc()
+            logger.info('Skipping notification {} as it was already handled'.format(key))
+            return
+        if operation in STARTED_BY and self.request.retries < START_WAIT_RETRIES and \
+                not started(STARTED_BY[operation], message):
+            raise self.retry()
+        if not acquire(ns, key):
+            raise self.retry()
+    except DISCONNECT_ERRORS as e:
+        raise self.retry(exc=e)
+
+    start = time.perf_counter()
+    try:
+        if handled(key):
+            metrics.NOTIFICATION_DUPLICATES.labels(operation).inc()
+            return
+        notification_handler(operation, message)
+        record(key, operation, message)
+    except UnknownScaleType as e:
+        logger.warning('Retrying notification {}: {}'.format(key, e))
+        raise self.retry(exc=e)
+    except DISCONNECT_ERRORS as e:
+        metrics.NOTIFICATION_ERRORS.labels(operation).inc()
+        raise self.retry(exc=e)
+    except Exception:
+        metrics.NOTIFICATION_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        metrics.NOTIFICATION_DURATION.labels(operation).observe(time.perf_counter() - start)
+        release(ns, key)
+
+
+def handled(key):
+    """Whether the notification of an idempotency key was handled."""
+    return LifecycleNotification.objects.filter(key=key).exists()
+
+
+def started(operation, message):
+    """Whether the start of the OSM operation that a notification completes was handled."""
+    return LifecycleNotification.objects.filter(operation=operation, operation_id=operation_id(message)).exists()
+
+
+def scale_type(message):
+    """The scale type announced by the start of the scaling that a notification completes.
+
+    Args:
+        message (dict): The decoded notification of the completion
+
+    Returns:
+        scale_type (str): `SCALE_OUT` or `SCALE_IN`
+
+    Raises:
+        UnknownScaleType: If the start of the scaling was not handled, or announced no scale type
+
+    """
+    scale_vnf_type = LifecycleNotification.objects.filter(operation=SCALE, operation_id=operation_id(message)) \
+        .values_list('scale_type', flat=True).first()
+    if scale_vnf_type is None:
+        raise UnknownScaleType('the scale type of operation {} is unknown'.format(operation_id(message)))
+    return scale_vnf_type
+
+
+def record(key, operation, message):
+    """Record a notification as handled, along with the scale type announced by the start of a scaling.
+
+    Args:
+        key (str): The idempotency key of the notification
+        operation (str): The operation type, as found in the key of the Kafka message
+        message (dict): The decoded notification
+
+    """
+    scale_vnf_type = message['operationParams']['scaleVnfData']['scaleVnfType'] if operation == SCALE else None
+    try:
+        with transaction.atomic():
+            LifecycleNotification.objects.create(key=key, ns_uuid=ns_id(message), operation=operation,
+                                                 operation_id=operation_id(message), scale_type=scale_vnf_type)
+    except IntegrityError:
+        logger.info('Notification {} was recorded already'.format(key))
+
+
+def acquire(ns, key):
+    """Lease the lock of a NS, taking it over if its lease expired.
+
+    Args:
+        ns (str): The UUID of the NS
+        key (str): The idempotency key of the notification that holds the lock
+
+    Returns:
+        acquired (bool): Whether the lock was acquired
+
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=NS_LOCK_TIMEOUT)
+    try:
+        with transaction.atomic():
+            NsLock.objects.create(ns_uuid=ns, owner=key, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return NsLock.objects.filter(ns_uuid=ns, expires_at__lte=now).update(owner=key, expires_at=expires_at) == 1
+
+
+def release(ns, key):
+    """Release the lock of a NS, if still held by the notification; an unreleased lock expires anyway."""
+    try:
+        NsLock.objects.filter(ns_uuid=ns, owner=key).delete()
+    except DatabaseError as e:
+        logger.warning('Could not release the lock of NS {}: {}'.format(ns, e))
+
+
+def notification_handler(operation, message):
+    """Dispatch an OSM notification to the relevant lifecycle handler.
+
+    Args:
+        operation (str): The operation type, as found in the key of the Kafka message
+        message (dict): The decoded notification
+
+    """
+    if operation == INSTANTIATE:
+        logger.info('Instantiation of NS with UUID {} started'.format(message['nsInstanceId']))
+        ns_pre_instantiation_handler(message['operationParams'])
+    elif operation == TERMINATE:
+        logger.info('Termination of NS with UUID {} started'.format(message['nsInstanceId']))
+        ns = Instance.objects.filter(uuid=message['nsInstanceId'])
+        if ns.exists():
+            ns.update(state='terminate')
+            inventory_changed.send(sender=Instance)
+    elif operation == SCALE:
+        scale_vnf_type = message['operationParams']['scaleVnfData']['scaleVnfType']
+        if scale_vnf_type == SCALE_OUT:
+            logger.info('Scaling-out VNF of NS with UUID {} started'.format(message['nsInstanceId']))
+        elif scale_vnf_type == SCALE_IN:
+            logger.info('Scaling-in VNF of NS with UUID {} started'.format(message['nsInstanceId']))
+    elif operation == INSTANTIATED:
+        ns = Instance.objects.filter(uuid=message['nsr_id'])
+        if ns.exists():
+            if message['operationState'] == 'COMPLETED':
+                ns.update(state='active')
+                inventory_changed.send(sender=Instance)
+                ns_instantiation_handler(ns[0])
+                logger.info('Instantiation of NS with UUID {} completed'.format(ns[0].uuid))
+            elif message['operationState'] == 'FAILED':
+                logger.info('Instantiation of NS with UUID {} failed'.format(ns[0].uuid))
+                ns.delete()
+    elif operation == TERMINATED:
+        ns = Instance.objects.filter(uuid=message['nsr_id'])
+        if ns.exists():
+            if message['operationState'] == 'COMPLETED':
+                ns.update(state='deleted')
+                inventory_changed.send(sender=Instance)
+                ns_termination_handler(ns[0])
+                logger.info('Termination of NS with UUID {} completed'.format(ns[0].uuid))
+            elif message['operationState'] == 'FAILED':
+                ns.update(state='active')
+                inventory_changed.send(sender=Instance)
+                logger.info('Termination of NS with UUID {} failed'.format(ns[0].uuid))
+    elif operation == SCALED:
+        ns = Instance.objects.filter(uuid=message['nsr_id'])
+        if ns.exists():
+            scale_vnf_type = scale_type(message)
+            if scale_vnf_type == SCALE_OUT:
+                if message['operationState'] == 'COMPLETED':
+                    vnf_scaling_out_handler(ns[0])
+                    logger.info('Scaling-out VNF of NS with UUID {} completed'.format(ns[0].uuid))
+                elif message['operationState'] == 'FAILED':
+                    logger.info('Scaling-out VNF of NS with UUID {} failed'.format(ns[0].uuid))
+            elif scale_vnf_type == SCALE_IN:
+                if message['operationState'] == 'COMPLETED':
+                    vnf_scaling_in_handler(ns[0])
+                    logger.info('Scaling-in VNF of NS with UUID {} completed'.format(ns[0].uuid))
+                elif message['operationState'] == 'FAILED':
+                    logger.info('Scaling-in VNF of NS with UUID {} failed'.format(ns[0].uuid))
@@ -0,0 +1,337 @@
+import json
+import os
+from importlib import import_module
+from unittest import mock
+
+import yaml
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from accounting_client import outbox
+from api.constants import INSTANTIATE, INSTANTIATED, TERMINATE, TERMINATED
+from api.models import Tenant, Instance, Vnf, Vdu, LifecycleNotification, OutboxMessage
+from api.renderers import FAST_JSON_BACKENDS, FastJSONRenderer
+from api.serializers import TenantSerializer, InstanceSerializer, VnfSerializer, VduSerializer
+from api.tasks import handle_notification, notification_handler
+
+# The responses are not cached, so that each request runs the queries of its view
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def create_inventory(tenants=1, instances=1, vnfs=1, vdus=1):
+    """Create an inventory of `tenants` tenants, each with `instances` NS, each with `vnfs` VNFs of `vdus` VDUs."""
+    for t in range(tenants):
+        tenant = Tenant.objects.create(uuid='tenant-{}'.format(t), name='tenant {}'.format(t))
+        for n in range(instances):
+            instance = Instance.objects.create(tenant=tenant, uuid='ns-{}-{}'.format(t, n), name='ns', state='active',
+                                               vim_type='openstack')
+            for v in range(vnfs):
+                vnf = Vnf.objects.create(tenant=tenant, instance=instance, uuid='vnf-{}-{}-{}'.format(t, n, v),
+                                         name='vnf', state='active', vim_type='openstack')
+                for d in range(vdus):
+                    Vdu.objects.create(tenant=tenant, instance=instance, vnf=vnf,
+                                       uuid='vdu-{}-{}-{}-{}'.format(t, n, v, d), state='active',
+                                       vim_type='openstack', vcpu=1, vram=1.0, vdisk=2)
+
+
+@override_settings(CACHES=NO_CACHE)
+class ListQueryCountTestCase(APITestCase):
+    """The list endpoints run a fixed number of queries, whatever the number of rows in the page."""
+
+    # The list endpoints along with the queries that each one runs: the page, then one per list of related ids
+    ENDPOINTS = (
+        ('/api/v1/tenants', 4),
+        ('/api/v1/instances', 3),
+        ('/api/v1/vnfs', 2),
+        ('/api/v1/vdus', 1),
+        ('/api/v1/tenants/tenant-0/instances', 3),
+        ('/api/v1/tenants/tenant-0/vnfs', 2),
+        ('/api/v1/tenants/tenant-0/vdus', 1),
+        ('/api/v1/instances/ns-0-0/vnfs', 2),
+        ('/api/v1/instances/ns-0-0/vdus', 1),
+    )
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('accounting'))
+
+    def assertListQueries(self, rows):
+        for path, queries in self.ENDPOINTS:
+            with self.subTest(path=path, rows=rows), self.assertNumQueries(queries):
+                response = self.client.get(path, {'page_size': 1000})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.data['results'])
+
+    def test_one_row(self):
+        create_inventory()
+        self.assertListQueries(rows=1)
+
+    def test_many_rows(self):
+        create_inventory(tenants=3, instances=3, vnfs=2, vdus=2)
+        self.assertListQueries(rows='many')
+
+
+@override_settings(CACHES=NO_CACHE)
+class ValuesListTestCase(APITestCase):
+    """The list views, built from `values()`, output what the serializers output for the same rows."""
+
+    # The list views along with their serializer, the rows they list and the datetime field they may be ordered on
+    VIEWS = (
+        ('/api/v1/tenants', TenantSerializer, lambda: Tenant.objects.all(), 'created_at'),
+        ('/api/v1/instances', InstanceSerializer, lambda: Instance.objects.all(), 'created_at'),
+        ('/api/v1/vnfs', VnfSerializer, lambda: Vnf.objects.all(), 'creation_date'),
+        ('/api/v1/vdus', VduSerializer, lambda: Vdu.objects.all(), 'creation_date'),
+        ('/api/v1/tenants/tenant-1/instances', InstanceSerializer,
+         lambda: Instance.objects.filter(tenant__uuid='tenant-1'), 'created_at'),
+        ('/api/v1/tenants/tenant-1/vnfs', VnfSerializer, lambda: Vnf.objects.filter(tenant__uuid='tenant-1'),
+         'creation_date'),
+        ('/api/v1/tenants/tenant-1/vdus', VduSerializer, lambda: Vdu.objects.filter(tenant__uuid='tenant-1'),
+         'creation_date'),
+        ('/api/v1/instances/ns-1-0/vnfs', VnfSerializer, lambda: Vnf.objects.filter(instance__uuid='ns-1-0'),
+         'creation_date'),
+        ('/api/v1/instances/ns-1-0/vdus', VduSerializer, lambda: Vdu.objects.filter(instance__uuid='ns-1-0'),
+         'creation_date'),
+    )
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('accounting'))
+        create_inventory(tenants=2, instances=2, vnfs=2, vdus=2)
+
+    def walk(self, path, params):
+        """Request all the pages of a list view, following its cursors, and return their rows."""
+        rows = []
+        response = self.client.get(path, dict(params, page_size=3))
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.content.decode('utf-8'))
+            rows.extend(page['results'])
+            if not page['next']:
+                self.assertTrue(rows)
+                return rows
+            response = self.client.get(page['next'])
+
+    @staticmethod
+    def serialized(serializer_class, queryset, fields):
+        """Represent rows with the serializer, for the sparse fieldset requested."""
+        request = Request(APIRequestFactory().get('/', {'fields': ','.join(fields)} if fields else {}))
+        data = serializer_class(serializer_class.setup_eager_loading(queryset, fields), many=True,
+                                context={'request': request}).data
+        return json.loads(JSONRenderer().render(data).decode('utf-8'))
+
+    def test_values_match_serializers(self):
+        for path, serializer_class, rows, date_field in self.VIEWS:
+            all_fields = serializer_class.Meta.fields
+            for fields in (None, (all_fields[1], all_fields[-1])):
+                params = {'fields': ','.join(fields)} if fields else {}
+                with self.subTest(path=path, fields=fields, ordering='-id'):
+                    self.assertEqual(self.walk(path, params),
+                                     self.serialized(serializer_class, rows().order_by('-id'), fields))
+                with self.subTest(path=path, fields=fields, ordering='id'):
+                    self.assertEqual(self.walk(path, dict(params, ordering='id')),
+                                     self.serialized(serializer_class, rows().order_by('id'), fields))
+                with self.subTest(path=path, fields=fields, ordering=date_field):
+                    # Rows created within the same tick may come in any order, so only their sequence is checked
+                    expected = self.serialized(serializer_class, rows().order_by(date_field, 'id'), fields)
+                    listed = self.walk(path, dict(params, ordering=date_field))
+                    self.assertEqual(sorted(listed, key=json.dumps), sorted(expected, key=json.dumps))
+                    if date_field in listed[0]:
+                        self.assertEqual([row[date_field] for row in listed], [row[date_field] for row in expected])
+
+
+
+@override_settings(CACHES=NO_CACHE)
+class FastJSONRendererTestCase(APITestCase):
+    """The fast JSON renderer outputs the same bytes as the standard one, with any of the fast libraries."""
+
+    # Floats around the bounds of the range that the standard library writes without an exponent
+    FLOATS = (0.0, -0.0, 0.1, -2.5, 1e-4, 9.999999999999999e-05, 1e-7, 1.5e-5, 5e-324, 1e15, 9999999999999998.0,
+              1e16, 1.2345678901234568e16, 2.5e300, -1e-7)
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('accounting'))
+        create_inventory(tenants=2, instances=2, vnfs=2, vdus=2)
+
+    def renderers(self):
+        """A fast renderer per installed fast library."""
+        for name in FAST_JSON_BACKENDS:
+            try:
+                backend = import_module(name)
+            except ImportError:
+                continue
+            renderer = FastJSONRenderer()
+            renderer.backend = backend
+            yield name, renderer
+
+    def test_responses(self):
+        data = [self.client.get(path).data for path in ('/api/v1/tenants', '/api/v1/instances', '/api/v1/vnfs',
+                                                        '/api/v1/vdus', '/api/v1/vdus/by-uuid/vdu-0-0-0-0')]
+        for name, renderer in self.renderers():
+            for item in data:
+                with self.subTest(backend=name, item=item):
+                    self.assertEqual(renderer.render(item), JSONRenderer().render(item))
+
+    def test_floats_and_strings(self):
+        data = {'floats': list(self.FLOATS), 'nested': [{'vram': value} for value in self.FLOATS],
+                'text': 'caf\u00e9 / \u2028 \u2029 "quoted" \\', 'none': None, 'integers': [0, -1, 2 ** 62]}
+        for name, renderer in self.renderers():
+            for value in (data,) + tuple({'value': value} for value in self.FLOATS):
+                with self.subTest(backend=name, value=value):
+                    self.assertEqual(renderer.render(value), JSONRenderer().render(value))
+
+    def test_non_finite_floats_are_rejected(self):
+        for name, renderer in self.renderers():
+            for value in (float('nan'), float('inf'), -float('inf')):
+                with self.subTest(backend=name, value=value):
+                    with self.assertRaises(ValueError):
+                        JSONRenderer().render({'results': [{'vram': value}]})
+                    with self.assertRaises(ValueError):
+                        renderer.render({'results': [{'vram': value}]})
+
+@override_settings(CACHES=NO_CACHE)
+class VduParentsTestCase(APITestCase):
+    """The API and the exports give the uuids of the parents of each VDU, in particular that of its VNF."""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('accounting'))
+        create_inventory(tenants=1, instances=1, vnfs=2, vdus=2)
+        self.parents = dict((vdu.uuid, (vdu.tenant.uuid, vdu.instance.uuid, vdu.vnf.uuid))
+                            for vdu in Vdu.objects.select_related('tenant', 'instance', 'vnf'))
+
+    def assertParents(self, rows):
+        self.assertEqual(dict((row['uuid'], (row['tenant_id'], row['instance_id'], row['vnf_id'])) for row in rows),
+                         self.parents)
+
+    def test_list(self):
+        response = self.client.get('/api/v1/vdus')
+        self.assertEqual(response.status_code, 200)
+        self.assertParents(response.data['results'])
+
+    def test_detail(self):
+        for uuid in self.parents:
+            with self.subTest(uuid=uuid):
+                response = self.client.get('/api/v1/vdus/by-uuid/{}'.format(uuid))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual((response.data['tenant_id'], response.data['instance_id'], response.data['vnf_id']),
+                                 self.parents[uuid])
+
+    def test_export(self):
+        response = self.client.get('/api/v1/export/vdus.ndjson')
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertParents([json.loads(line) for line in content.splitlines()])
+
+
+@override_settings(CACHES=NO_CACHE)
+class DetailFiltersTestCase(APITestCase):
+    """The by-uuid views retrieve their entity whatever the filters of the lists in the query string."""
+
+    # The by-uuid views along with a filter of their list that the entity does not match
+    VIEWS = (
+        ('/api/v1/tenants/by-uuid/tenant-0', {'name': 'other'}),
+        ('/api/v1/instances/by-uuid/ns-0-0', {'state': 'deleted'}),
+        ('/api/v1/vnfs/by-uuid/vnf-0-0-0', {'state': 'deleted'}),
+        ('/api/v1/vdus/by-uuid/vdu-0-0-0-0', {'state': 'deleted'}),
+    )
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('accounting'))
+        create_inventory()
+
+    def test_filters_are_ignored(self):
+        for path, params in self.VIEWS:
+            with self.subTest(path=path):
+                expected = self.client.get(path)
+                self.assertEqual(expected.status_code, 200)
+                response = self.client.get(path, dict(params, ordering='id'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data, expected.data)
+
+
+@override_settings(CACHES=NO_CACHE)
+class NotificationReplayTestCase(APITestCase):
+    """A redelivered OSM notification makes no NBI or RO call and changes neither the inventory nor the outbox."""
+
+    # The notifications of the samples directory along with their operation, in the order OSM sends them
+    NOTIFICATIONS = (
+        (INSTANTIATE, 'instantiation_start.yaml'),
+        (INSTANTIATED, 'instantiation_end.yaml'),
+        (TERMINATE, 'termination_start.yaml'),
+        (TERMINATED, 'termination_end.yaml'),
+    )
+    # The NBI and RO clients of the lifecycle handlers
+    CLIENTS = ('bearer_token', 'NsLcm', 'OsmAdmin', 'VnfPkgM', 'OsmTenant', 'OsmInstance')
+
+    def setUp(self):
+        self.messages = {}
+        for operation, name in self.NOTIFICATIONS:
+            with open(os.path.join(settings.PROJECT_ROOT, 'samples', name)) as f:
+                self.messages[operation] = yaml.safe_load(f)
+        self.clients = {}
+        for name in self.CLIENTS:
+            patcher = mock.patch('api.utils.{}'.format(name))
+            self.clients[name] = patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.dict(outbox.OUTBOX, {'DRAIN_ON_COMMIT': False})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_osm()
+
+    def mock_osm(self):
+        """Serve a NS of a VNF with two VDUs, on a single RO tenant."""
+        nslcm = self.clients['NsLcm'].return_value
+        nslcm.get_ns.return_value = mock.Mock(status_code=200, json=mock.Mock(return_value={
+            '_admin': {'deployed': {'RO': {'nsr_id': 'ro-ns'}}, 'projects_read': ['project']}}))
+        nslcm.get_vnf_list_by_ns.return_value.json.return_value = [{
+            'id': 'vnf-0', 'vnfd-id': 'vnfd-0', 'vnfd-ref': 'vnfd', 'member-vnf-index-ref': '1',
+            'vdur': [{'vim-id': 'vdu-0'}, {'vim-id': 'vdu-1'}]}]
+        self.clients['VnfPkgM'].return_value.get_vnfd.return_value.json.return_value = {
+            'vdu': [{'vm-flavor': {'vcpu-count': 2, 'memory-mb': 4096, 'storage-gb': 20}}]}
+        self.clients['OsmAdmin'].return_value.get_vim.return_value.json.return_value = {'vim_type': 'openstack'}
+        self.clients['OsmTenant'].return_value.get_list.return_value.json.return_value = {'tenants': [{
+            'uuid': 'tenant-0', 'name': 'tenant', 'description': 'tenant', 'created_at': '2019-05-20T10:00:00Z'}]}
+        self.clients['OsmInstance'].return_value.get.return_value.status_code = 200
+
+    def handle(self, *operations):
+        for operation in operations:
+            handle_notification(operation, self.messages[operation])
+
+    def counts(self):
+        return Instance.objects.count(), Vnf.objects.count(), Vdu.objects.count(), OutboxMessage.objects.count()
+
+    def assertReplayed(self, operations, expected_counts, dispatched):
+        """Handle the notifications of the operations once more, and check that nothing was called nor changed.
+
+        The notifications are expected to reach the lifecycle handlers only if `dispatched`, i.e. if they are not
+        skipped as already handled beforehand.
+        """
+        for client in self.clients.values():
+            client.reset_mock()
+        with mock.patch('api.tasks.notification_handler', wraps=notification_handler) as handler:
+            self.handle(*operations)
+        self.assertEqual(handler.called, dispatched)
+        for name, client in self.clients.items():
+            self.assertEqual(client.mock_calls, [], name)
+        self.assertEqual(self.counts(), expected_counts)
+
+    def test_instantiated(self):
+        self.handle(INSTANTIATE, INSTANTIATED)
+        self.assertTrue(self.clients['NsLcm'].return_value.get_ns.called)
+        # The NS, VNF and VDUs are created, and the opening of their four sessions queued
+        self.assertEqual(self.counts(), (1, 1, 2, 4))
+        self.assertReplayed((INSTANTIATE, INSTANTIATED), (1, 1, 2, 4), dispatched=False)
+
+    def test_terminated(self):
+        self.handle(INSTANTIATE, INSTANTIATED, TERMINATE, TERMINATED)
+        # The closing of the four sessions is queued as well
+        self.assertEqual(self.counts(), (1, 1, 2, 8))
+        self.assertEqual(set(Vdu.objects.values_list('state', flat=True)), {'deleted'})
+        self.assertReplayed((TERMINATE, TERMINATED), (1, 1, 2, 8), dispatched=False)
+
+    def test_replay_without_handled_notifications(self):
+        # Even if the handled notifications are lost, the session registry makes the handlers skip the replays
+        self.handle(INSTANTIATE, INSTANTIATED, TERMINATE, TERMINATED)
+        LifecycleNotification.objects.filter(operation__in=(INSTANTIATED, TERMINATED)).delete()
+        self.assertReplayed((INSTANTIATED, TERMINATED), (1, 1, 2, 8), dispatched=True)
@@ -40,6 +40,9 @@ api_urlpatterns = [
     url(r'^tenants/by-uuid/(?P<uuid>[^/]+)$',
         views.TenantByUuid.as_view(),
         name='tenant-detail'),
+    url(r'^tenants/(?P<uuid>[^/]+)/usage$',
+        views.TenantUsageView.as_view(),
+        name='tenant-usage'),
     url(r'^tenants/(?P<tenant_uuid>[^/]+)/instances$',
         views.InstanceByTenant.as_view({'get': 'list'}),
         name='instance-list'),
@@ -69,6 +72,9 @@ api_urlpatterns = [
     url(r'^instances/by-uuid/(?P<uuid>[^/]+)$',
         views.InstanceByUuid.as_view(),
         name='instance-detail'),
+    url(r'^instances/(?P<uuid>[^/]+)/usage$',
+        views.InstanceUsageView.as_view(),
+        name='instance-usage'),
     url(r'^instances/(?P<instance_uuid>[^/]+)/vnfs$',
         views.VnfsByInstance.as_view({'get': 'list'}),
         name='vnf-list'),
@@ -98,6 +104,9 @@ api_urlpatterns = [
     url(r'^vnfs/by-uuid/(?P<uuid>[^/]+)$',
         views.VnfByUuid.as_view(),
         name='vnf-detail'),
+    url(r'^vnfs/(?P<uuid>[^/]+)/usage$',
+        views.VnfUsageView.as_view(),
+        name='vnf-usage'),
     url(r'^vnfs/by-tenant/(?P<tenant_uuid>[^/]+)$',
         views.VnfsByTenant.as_view({'get': 'list'}),
         name='vnf-list'),
@@ -121,6 +130,9 @@ api_urlpatterns = [
     url(r'^vdus/by-uuid/(?P<uuid>[^/]+)$',
         views.VduByUuid.as_view(),
         name='vdu-detail'),
+    url(r'^vdus/(?P<uuid>[^/]+)/usage$',
+        views.VduUsageView.as_view(),
+        name='vdu-usage'),
     url(r'^vdus/by-tenant/(?P<tenant_uuid>[^/]+)$',
         views.VdusByTenant.as_view({'get': 'list'}),
         name='vdu-list'),
@@ -134,6 +146,11 @@ api_urlpatterns = [
         views.VdusByInstance.as_view({'get': 'retrieve'}),
         name='vdu-detail'),
 
+    # Exports
+    url(r'^export/(?P<resource>tenants|instances|vnfs|vdus)\.(?P<export_format>ndjson|csv)$',
+        views.Export.as_view(),
+        name='export'),
+
     # Documentation
     url(r'^swagger(?P<format>\.json|\.yaml)$',
         schema_view.without_ui(cache_timeout=0),
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from api.constants import DAY, GRANULARITIES, HOUR, TOTAL
+from api.models import VduUsage, VnfUsage, InstanceUsage, TenantUsage, UsageWindow
+
+# The period queried when no `from` is given, per granularity
+DEFAULT_RANGE = {
+    HOUR: timedelta(days=1),
+    DAY: timedelta(days=30),
+}
+
+# The start of the single period of the total usage
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Foreign key of a VDU -> rollup model of the referenced entity, from the VDU up to its Tenant
+LEVELS = OrderedDict([
+    ('id', (VduUsage, 'vdu_id')),
+    ('vnf_id', (VnfUsage, 'vnf_id')),
+    ('instance_id', (InstanceUsage, 'instance_id')),
+    ('tenant_id', (TenantUsage, 'tenant_id')),
+])
+
+# The foreign keys of a VDU whose rollups are shared with other VDUs, and updated by `roll_up`
+PARENT_LEVELS = [attribute for attribute in LEVELS if attribute != 'id']
+
+
+def period_start(moment, granularity):
+    """The start of the hour or day (UTC) that a datetime falls in, or the epoch for the total usage."""
+    if granularity == TOTAL:
+        return EPOCH
+    start = timezone.localtime(moment, timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if granularity == DAY else start
+
+
+def merge(aggregate, samples, total, minimum, maximum):
+    """Merge a window of samples into an aggregate (samples, total, minimum, maximum)."""
+    if aggregate is None:
+        return samples, total, minimum, maximum
+    return (aggregate[0] + samples, aggregate[1] + total, min(aggregate[2], minimum),
+            max(aggregate[3], maximum))
+
+
+def upsert(model, keys, samples, total, minimum, maximum):
+    """Add a window of samples to a rollup row, creating the row if it does not exist yet.
+
+    The row is updated in place with the deltas, so that it never has to be recomputed from the samples.
+
+    Args:
+        model (Model): The rollup model
+        keys (dict): The fields that identify the row
+        samples (int): The number of samples of the window
+        total (float): The sum of the samples of the window
+        minimum (float): The lowest sample of the window
+        maximum (float): The highest sample of the window
+
+    Raises:
+        IntegrityError: If the row can be neither created nor updated, e.g. as its entity no longer exists
+
+    """
+    if add(model, keys, samples, total, minimum, maximum):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(samples=samples, total=total, minimum=minimum, maximum=maximum, **keys)
+    except IntegrityError:
+        # The row was created by a concurrent window in the meantime, unless the error is of another kind
+        if not add(model, keys, samples, total, minimum, maximum):
+            raise
+
+
+def add(model, keys, samples, total, minimum, maximum):
+    """Add a window of samples to a rollup row, if it exists.
+
+    Returns:
+        updated (bool): Whether the row exists
+
+    """
+    return bool(model.objects.filter(**keys).update(
+        samples=F('samples') + samples, total=F('total') + total,
+        minimum=Least('minimum', Value(minimum, output_field=FloatField())),
+        maximum=Greatest('maximum', Value(maximum, output_field=FloatField()))))
+
+
+def record(windows, moment=None):
+    """Add windows of samples of VDU metrics to the rollups of the VDUs, and stage them for those of their VNFs,
+    NS Instances and Tenants.
+
+    The windows are first merged per VDU and metric, so that each rollup row is updated once, for the hour, the
+    day and the total of the moment, in a deterministic order. The rollups shared by the VDUs of several shards
+    of `send_metrics` are left to `roll_up`, so that the shards never wait on each other's rows.
+
+    Args:
+        windows (iterable): The (vdu, metric_name, samples, total, minimum, maximum) of each window
+        moment (datetime, optional): The end of the windows; now by default
+
+    Examples:
+        >>> from api import usage
+        >>> usage.record([(vdu, 'CPU_CYCLE', 10, 452.0, 30.1, 60.4)])
+        >>> usage.roll_up()
+
+    """
+    moment = moment or timezone.now()
+    vdus, aggregates = {}, {}
+    for vdu, metric_name, samples, total, minimum, maximum in windows:
+        vdus[vdu.id] = vdu
+        aggregates[(vdu.id, metric_name)] = merge(aggregates.get((vdu.id, metric_name)), samples, total, minimum,
+                                                  maximum)
+
+    for vdu_id, metric_name in sorted(aggregates):
+        for granularity in GRANULARITIES:
+            upsert(VduUsage, {'vdu_id': vdu_id, 'metric_name': metric_name, 'granularity': granularity,
+                              'period_start': period_start(moment, granularity)}, *aggregates[(vdu_id, metric_name)])
+
+    UsageWindow.objects.bulk_create([
+        UsageWindow(vnf_id=vdus[vdu_id].vnf_id, instance_id=vdus[vdu_id].instance_id,
+                    tenant_id=vdus[vdu_id].tenant_id, metric_name=metric_name, moment=moment,
+                    samples=samples, total=total, minimum=minimum, maximum=maximum)
+        for (vdu_id, metric_name), (samples, total, minimum, maximum) in sorted(aggregates.items())])
+
+
+def roll_up():
+    """Add the staged windows to the rollups of the VNFs, NS Instances and Tenants, and delete them.
+
+    The windows are merged per entity, metric and period, and the rollup rows updated in the order of their
+    level, entity, metric, granularity and period, so that concurrent roll-ups never lock rows in opposite
+    orders. The windows are added and deleted in a single transaction; those that fail are left to the next
+    roll-up.
+
+    Returns:
+        windows (int): The number of windows added
+
+    """
+    with transaction.atomic():
+        ids = list(UsageWindow.objects.select_for_update().order_by('id').values_list('id', flat=True))
+        if not ids:
+            return 0
+        aggregates = {}
+        for window in UsageWindow.objects.filter(id__in=ids):
+            for level, attribute in enumerate(PARENT_LEVELS):
+                for granularity in GRANULARITIES:
+                    key = (level, getattr(window, attribute), window.metric_name, granularity,
+                           period_start(window.moment, granularity))
+                    aggregates[key] = merge(aggregates.get(key), window.samples, window.total, window.minimum,
+                                            window.maximum)
+
+        for (level, entity_id, metric_name, granularity, start), aggregate in sorted(aggregates.items()):
+            model, foreign_key = LEVELS[PARENT_LEVELS[level]]
+            upsert(model, {foreign_key: entity_id, 'metric_name': metric_name, 'granularity': granularity,
+                           'period_start': start}, *aggregate)
+        UsageWindow.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def query(rows, granularity, start, end):
+    """Aggregate rollup rows per period and metric.
+
+    Args:
+        rows (QuerySet): The rollup rows of the entity
+        granularity (str): `hour`, `day` or `total`
+        start (datetime): The start of the range; the period it falls in is included. Ignored for the total.
+        end (datetime): The end of the range, excluded. Ignored for the total.
+
+    Returns:
+        usage (QuerySet): The `metric_name`, `period_start`, `samples`, `total`, `minimum` and `maximum` per
+            period and metric, in chronological order
+
+    """
+    rows = rows.filter(granularity=granularity)
+    if granularity != TOTAL:
+        rows = rows.filter(period_start__gte=period_start(start, granularity), period_start__lt=end)
+    return rows.values('metric_name', 'period_start') \
+        .annotate(samples=Sum('samples'), total=Sum('total'), minimum=Min('minimum'), maximum=Max('maximum')) \
+        .order_by('period_start', 'metric_name')
@@ -1,11 +1,14 @@
 import logging
 
 from django.conf import settings
+from django.db import transaction
 from rest_framework.status import HTTP_200_OK
 
-from accounting_client.accounting_client import accounting_client
+from accounting import tracing
+from accounting_client import outbox
 from api.constants import NFVIPOP_ID_DEFAULT
 from api.models import Tenant, Vdu, Instance, Vnf
+from api.signals import inventory_changed
 from nbiapi.identity import bearer_token
 from nbiapi.nslcm import NsLcm
 from nbiapi.osm_admin import OsmAdmin
@@ -16,6 +19,7 @@ from openmanoapi.tenants import Tenant as OsmTenant
 logger = logging.getLogger(__name__)
 
 
+@tracing.traced
 def ns_pre_instantiation_handler(ns_params):
     """Handles instantiation of NS before deployment of VDUs is completed.
 
@@ -27,13 +31,22 @@ def ns_pre_instantiation_handler(ns_params):
                             uuid=ns_params['nsInstanceId'], nfvipop_id=ns_params['vimAccountId'], state='instantiate')
 
 
+@tracing.traced
 def ns_instantiation_handler(ns):
     """Handles instantiation of NS when deployment of VDUs completes.
 
+    The NS, its VNFs and VDUs are saved and the opening of their sessions queued in a single transaction, once
+    they are fetched from NBI and RO. A replayed instantiation, e.g. redelivered after a worker died, thus finds
+    the session of the NS in the registry and returns without any call, or else creates them all anew.
+
     Args:
         ns (obj): The NS object under instantiation
 
     """
+    if outbox.registered('ns', ns.uuid, 'open'):
+        logger.info('Session of NS with UUID {} is already open. Skipping instantiation'.format(ns.uuid))
+        return
+
     # Get auth token from NBI
     token = bearer_token(settings.OSM_ADMIN_CREDENTIALS.get('username'),
                          settings.OSM_ADMIN_CREDENTIALS.get('password'))
@@ -45,6 +58,7 @@ def ns_instantiation_handler(ns):
         logger.info('NS with UUID {} no longer exists. Aborting instantiation'.format(ns.uuid))
         ns_object = Instance.objects.filter(uuid=ns.uuid)
         ns_object.update(state='deleted')
+        inventory_changed.send(sender=Instance)
         return
     ns_info = ns_response.json()
     nsr_id = ns_info['_admin']['deployed']['RO']['nsr_id']
@@ -69,70 +83,79 @@ def ns_instantiation_handler(ns):
         # Get VIM Information
         vim_data = osm_admin.get_vim(ns.nfvipop_id).json()
 
-        # Update NS Information
-        ns.tenant = tn
-        ns.mano_user = tn.name
-        ns.mano_project = ns_info['_admin']['projects_read'][0]
-        # TODO: Change accordingly in case of central OSM
-        ns.nfvipop_id = NFVIPOP_ID_DEFAULT
-        ns.vim_type = vim_data['vim_type']
-        ns.ns_session_id = accounting_client.open_ns_session(ns)
-        ns.save()
-
-        logger.info('New NS instance object: {}, Tenant: {}'.format(ns.uuid, tn.uuid))
-
-        # Get VNFs of NS
+        # Get VNFs of NS and their VM Flavors
+        # TODO: Fix if VNFs include more than one VDU
         vnfs = nslcm.get_vnf_list_by_ns(ns.uuid).json()
-
-        for vnf in vnfs:
-
-            # VNF Name
-            vnf_name = '{}.{}'.format(vnf['vnfd-ref'], vnf['member-vnf-index-ref'])
-
-            # Get VM Flavor
-            # TODO: Fix if VNFs include more than one VDU
-            vm_flavor = vnfpkgm.get_vnfd(vnf['vnfd-id']).json()['vdu'][0]['vm-flavor']
-
-            # Create and open VNF session
-            v = Vnf.objects.create(
-                tenant=tn, instance=ns, uuid=vnf['id'], name=vnf_name, state='active', vim_type=ns.vim_type)
-            v.vnf_session_id = accounting_client.open_vnf_session(ns.ns_session_id, v.uuid, v.name)
-            v.save()
-
-            logger.info('New VNF object: {}, NS instance: {}'.format(v.uuid, ns.uuid))
-
-            for vdur in vnf['vdur']:
-                vdu = Vdu.objects.create(
-                    tenant=tn, instance=ns, vnf=v, uuid=vdur['vim-id'], nfvipop_id=ns.nfvipop_id, state='active',
-                    project_name=ns.mano_project, vcpu=vm_flavor['vcpu-count'], vram=vm_flavor['memory-mb'],
-                    vdisk=vm_flavor['storage-gb'], vim_type=ns.vim_type,
-                    flavor='{}_{}_{}'.format(vm_flavor['vcpu-count'], vm_flavor['memory-mb'], vm_flavor['storage-gb']))
-                vdu.vdu_session_id = accounting_client.open_vdu_session(v.vnf_session_id, vdu)
-                vdu.save()
-
-                logger.info('New VDU object: {}, VNF: {}, NS: {}'.format(vdu.uuid, v.uuid, ns.uuid))
+        vm_flavors = [vnfpkgm.get_vnfd(vnf['vnfd-id']).json()['vdu'][0]['vm-flavor'] for vnf in vnfs]
+
+        with transaction.atomic():
+            # Update NS Information
+            ns.tenant = tn
+            ns.mano_user = tn.name
+            ns.mano_project = ns_info['_admin']['projects_read'][0]
+            # TODO: Change accordingly in case of central OSM
+            ns.nfvipop_id = NFVIPOP_ID_DEFAULT
+            ns.vim_type = vim_data['vim_type']
+            ns.save()
+            if outbox.enqueue_once(outbox.OPEN_NS_SESSION, instance=ns) is None:
+                # Instantiated concurrently by a replay of the notification
+                return
+
+            logger.info('New NS instance object: {}, Tenant: {}'.format(ns.uuid, tn.uuid))
+
+            for vnf, vm_flavor in zip(vnfs, vm_flavors):
+
+                # VNF Name
+                vnf_name = '{}.{}'.format(vnf['vnfd-ref'], vnf['member-vnf-index-ref'])
+
+                # Create VNF & VDUs and queue the opening of their sessions
+                v = Vnf.objects.create(
+                    tenant=tn, instance=ns, uuid=vnf['id'], name=vnf_name, state='active', vim_type=ns.vim_type)
+                outbox.enqueue_once(outbox.OPEN_VNF_SESSION, vnf=v)
+
+                logger.info('New VNF object: {}, NS instance: {}'.format(v.uuid, ns.uuid))
+
+                for vdur in vnf['vdur']:
+                    vdu = Vdu.objects.create(
+                        tenant=tn, instance=ns, vnf=v, uuid=vdur['vim-id'], nfvipop_id=ns.nfvipop_id, state='active',
+                        project_name=ns.mano_project, vcpu=vm_flavor['vcpu-count'], vram=vm_flavor['memory-mb'],
+                        vdisk=vm_flavor['storage-gb'], vim_type=ns.vim_type,
+                        flavor='{}_{}_{}'.format(vm_flavor['vcpu-count'], vm_flavor['memory-mb'],
+                                                 vm_flavor['storage-gb']))
+                    outbox.enqueue_once(outbox.OPEN_VDU_SESSION, vdu=vdu)
+
+                    logger.info('New VDU object: {}, VNF: {}, NS: {}'.format(vdu.uuid, v.uuid, ns.uuid))
         break
 
 
+@tracing.traced
 def ns_termination_handler(ns):
     """Handles termination of NS and closes related sessions on the Billing Services.
 
+    A replayed termination finds the session of the NS closed in the registry and returns without any call.
+
     Args:
         ns (obj): The NS under termination
 
     """
+    if outbox.registered('ns', ns.uuid, 'closed'):
+        logger.info('Session of NS with UUID {} is already closed. Skipping termination'.format(ns.uuid))
+        return
     vnfs = Vnf.objects.select_related('tenant', 'instance').prefetch_related('vdus').filter(instance__uuid=ns.uuid)
     vdus = Vdu.objects.select_related('tenant', 'instance', 'vnf').filter(instance__uuid=ns.uuid)
-    vnfs.update(state='deleted')
-    vdus.update(state='deleted')
-    for vdu in vdus:
-        accounting_client.close_session(vdu.vdu_session_id, 'vdu')
-    for vnf in vnfs:
-        accounting_client.close_session(vnf.vnf_session_id, 'vnf')
-    accounting_client.close_session(ns.ns_session_id, 'ns')
+    with transaction.atomic():
+        vnfs.update(state='deleted')
+        vdus.update(state='deleted')
+        inventory_changed.send(sender=Vdu)
+        for vdu in vdus:
+            outbox.enqueue_once(outbox.CLOSE_VDU_SESSION, vdu=vdu)
+        for vnf in vnfs:
+            outbox.enqueue_once(outbox.CLOSE_VNF_SESSION, vnf=vnf)
+        outbox.enqueue_once(outbox.CLOSE_NS_SESSION, instance=ns)
     logger.info('NS with uuid {} was deleted'.format(ns.uuid))
 
 
+@tracing.traced
 def vnf_scaling_out_handler(ns):
     """Handlers the scaling-out of a VNF and opens related sessions on the Billing Services.
 
@@ -165,13 +188,14 @@ def vnf_scaling_out_handler(ns):
             vdu_object = Vdu.objects.filter(uuid=vdur['vim-id'])
             if vdu_object.exists():
                 continue
-            vdu = Vdu.objects.create(
-                tenant=tn, instance=ns, vnf=v, uuid=vdur['vim-id'], nfvipop_id=ns.nfvipop_id, state='active',
-                project_name=ns.mano_project, vcpu=vm_flavor['vcpu-count'], vram=vm_flavor['memory-mb'],
-                vdisk=vm_flavor['storage-gb'], vim_type=ns.vim_type,
-                flavor='{}_{}_{}'.format(vm_flavor['vcpu-count'], vm_flavor['memory-mb'], vm_flavor['storage-gb']))
-            vdu.vdu_session_id = accounting_client.open_vdu_session(v.vnf_session_id, vdu)
-            vdu.save()
+            with transaction.atomic():
+                vdu = Vdu.objects.create(
+                    tenant=tn, instance=ns, vnf=v, uuid=vdur['vim-id'], nfvipop_id=ns.nfvipop_id, state='active',
+                    project_name=ns.mano_project, vcpu=vm_flavor['vcpu-count'], vram=vm_flavor['memory-mb'],
+                    vdisk=vm_flavor['storage-gb'], vim_type=ns.vim_type,
+                    flavor='{}_{}_{}'.format(vm_flavor['vcpu-count'], vm_flavor['memory-mb'],
+                                             vm_flavor['storage-gb']))
+                outbox.enqueue_once(outbox.OPEN_VDU_SESSION, vdu=vdu)
             vdu_is_created = True
 
             logger.info('New VDU object: {}, VNF: {}, NS: {}'.format(vdu.uuid, v.uuid, ns.uuid))
@@ -180,6 +204,7 @@ def vnf_scaling_out_handler(ns):
             break
 
 
+@tracing.traced
 def vnf_scaling_in_handler(ns):
     """Handles scaling-in of NS and closes related sessions on the Billing Services.
 
@@ -206,7 +231,9 @@ def vnf_scaling_in_handler(ns):
         else:
             vdu_scaled_in_id = vdu_scaled_in_ids[0]
             vdus = Vdu.objects.select_related('tenant', 'instance', 'vnf').filter(uuid=vdu_scaled_in_id)
-            vdus.update(state='deleted')
-            accounting_client.close_session(vdus[0].vdu_session_id, 'vdu')
+            with transaction.atomic():
+                vdus.update(state='deleted')
+                inventory_changed.send(sender=Vdu)
+                outbox.enqueue_once(outbox.CLOSE_VDU_SESSION, vdu=vdus[0])
             logger.info('VDU with UUID {} was deleted'.format(vdus[0].uuid))
             break
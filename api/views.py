@@ -1,10 +1,20 @@
 import logging
 
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from rest_framework import viewsets, generics
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api import export, usage
+from api.cache import CachedResponseMixin
+from api.constants import GRANULARITIES, HOUR, TOTAL
+from api.filters import QueryParameterFilter, parse_datetime_param
+from api.mixins import ValuesListMixin, TenantFiltersMixin, InstanceFiltersMixin, VnfFiltersMixin, VduFiltersMixin
 from api.serializers import *
 import api.swagger as swagger_decorators
 
@@ -13,9 +23,9 @@ logger = logging.getLogger(__name__)
 
 @method_decorator(name='list', decorator=swagger_decorators.instance_list)
 @method_decorator(name='retrieve', decorator=swagger_decorators.instance_retrieve)
-class InstanceViewSet(viewsets.ReadOnlyModelViewSet):
+class InstanceViewSet(CachedResponseMixin, ValuesListMixin, InstanceFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """ Instance (Network Service) Resource """
-    queryset = Instance.objects.select_related('tenant').prefetch_related('vnfs', 'vdus').all()
+    queryset = InstanceSerializer.setup_eager_loading(Instance.objects.all())
     serializer_class = InstanceSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
@@ -23,9 +33,9 @@ class InstanceViewSet(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.tenant_list)
 @method_decorator(name='retrieve', decorator=swagger_decorators.tenant_retrieve)
-class TenantViewSet(viewsets.ReadOnlyModelViewSet):
+class TenantViewSet(CachedResponseMixin, ValuesListMixin, TenantFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """ Tenant Resource """
-    queryset = Tenant.objects.all()
+    queryset = TenantSerializer.setup_eager_loading(Tenant.objects.all())
     serializer_class = TenantSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
@@ -33,9 +43,9 @@ class TenantViewSet(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.vnf_list)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vnf_retrieve)
-class VnfViewSet(viewsets.ReadOnlyModelViewSet):
+class VnfViewSet(CachedResponseMixin, ValuesListMixin, VnfFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """ VNF Resource """
-    queryset = Vnf.objects.select_related('tenant', 'instance').prefetch_related('vdus').all()
+    queryset = VnfSerializer.setup_eager_loading(Vnf.objects.all())
     serializer_class = VnfSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
@@ -43,27 +53,28 @@ class VnfViewSet(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.vdu_list)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vdu_retrieve)
-class VduViewSet(viewsets.ReadOnlyModelViewSet):
+class VduViewSet(CachedResponseMixin, ValuesListMixin, VduFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """ VDU Resource """
-    queryset = Vdu.objects.select_related('tenant', 'instance', 'vnf').all()
+    queryset = VduSerializer.setup_eager_loading(Vdu.objects.all())
     serializer_class = VduSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
 
 
 @method_decorator(name='retrieve', decorator=swagger_decorators.vnf_retrieve_by_uuid)
-class VnfByUuid(generics.RetrieveAPIView):
+class VnfByUuid(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a VNF by its uuid."""
-    queryset = Vnf.objects.select_related('instance', 'tenant').prefetch_related('vdus').all()
+    queryset = VnfSerializer.setup_eager_loading(Vnf.objects.all())
     serializer_class = VnfSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
+    filter_backends = ()
     lookup_field = 'uuid'
 
 
 @method_decorator(name='list', decorator=swagger_decorators.vnf_list_by_tenant_uuid)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vnf_retrieve_by_tenant_uuid)
-class VnfsByTenant(viewsets.ReadOnlyModelViewSet):
+class VnfsByTenant(CachedResponseMixin, ValuesListMixin, VnfFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """List or Retrieve the VNFs of a specific tenant by its uuid."""
     serializer_class = VnfSerializer
     permission_classes = (IsAuthenticated,)
@@ -71,7 +82,7 @@ class VnfsByTenant(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
 
     def get_queryset(self):
-        queryset = Vnf.objects.select_related('instance', 'tenant').prefetch_related('vdus').all()
+        queryset = VnfSerializer.setup_eager_loading(Vnf.objects.all())
         if "tenant_uuid" in self.kwargs:
             queryset = queryset.filter(tenant__uuid=self.kwargs["tenant_uuid"])
         return queryset
@@ -79,7 +90,7 @@ class VnfsByTenant(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.vnf_list_by_instance_uuid)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vnf_retrieve_by_instance_uuid)
-class VnfsByInstance(viewsets.ReadOnlyModelViewSet):
+class VnfsByInstance(CachedResponseMixin, ValuesListMixin, VnfFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """List or Retrieve the VNFs of a specific network service instance by the instance's uuid."""
     serializer_class = VnfSerializer
     permission_classes = (IsAuthenticated,)
@@ -87,25 +98,26 @@ class VnfsByInstance(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
 
     def get_queryset(self):
-        queryset = Vnf.objects.select_related('instance', 'tenant').prefetch_related('vdus').all()
+        queryset = VnfSerializer.setup_eager_loading(Vnf.objects.all())
         if "instance_uuid" in self.kwargs:
             queryset = queryset.filter(instance__uuid=self.kwargs["instance_uuid"])
         return queryset
 
 
 @method_decorator(name='retrieve', decorator=swagger_decorators.vdu_retrieve_by_uuid)
-class VduByUuid(generics.RetrieveAPIView):
+class VduByUuid(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a VDU by its UUID."""
-    queryset = Vdu.objects.select_related('tenant', 'instance', 'vnf').all()
+    queryset = VduSerializer.setup_eager_loading(Vdu.objects.all())
     serializer_class = VduSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
+    filter_backends = ()
     lookup_field = 'uuid'
 
 
 @method_decorator(name='list', decorator=swagger_decorators.vdu_list_by_tenant_uuid)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vdu_retrieve_by_tenant_uuid)
-class VdusByTenant(viewsets.ReadOnlyModelViewSet):
+class VdusByTenant(CachedResponseMixin, ValuesListMixin, VduFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """List or Retrieve the VDUs of a specific tenant by its UUID."""
     serializer_class = VduSerializer
     permission_classes = (IsAuthenticated,)
@@ -113,7 +125,7 @@ class VdusByTenant(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
 
     def get_queryset(self):
-        queryset = Vdu.objects.select_related('tenant', 'instance', 'vnf').all()
+        queryset = VduSerializer.setup_eager_loading(Vdu.objects.all())
         if "tenant_uuid" in self.kwargs:
             queryset = queryset.filter(tenant__uuid=self.kwargs["tenant_uuid"])
         return queryset
@@ -121,7 +133,7 @@ class VdusByTenant(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.vdu_list_by_instance_uuid)
 @method_decorator(name='retrieve', decorator=swagger_decorators.vdu_retrieve_by_instance_uuid)
-class VdusByInstance(viewsets.ReadOnlyModelViewSet):
+class VdusByInstance(CachedResponseMixin, ValuesListMixin, VduFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """List or Retrieve the VDUs of a specific network service instance by the instance's UUID."""
     serializer_class = VduSerializer
     permission_classes = (IsAuthenticated,)
@@ -129,7 +141,7 @@ class VdusByInstance(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
 
     def get_queryset(self):
-        queryset = Vdu.objects.select_related('tenant', 'instance', 'vnf').all()
+        queryset = VduSerializer.setup_eager_loading(Vdu.objects.all())
         if "instance_uuid" in self.kwargs:
             queryset = queryset.filter(instance__uuid=self.kwargs["instance_uuid"])
         return queryset
@@ -137,7 +149,7 @@ class VdusByInstance(viewsets.ReadOnlyModelViewSet):
 
 @method_decorator(name='list', decorator=swagger_decorators.instance_list_by_tenant_uuid)
 @method_decorator(name='retrieve', decorator=swagger_decorators.instance_retrieve_by_tenant_uuid)
-class InstanceByTenant(viewsets.ReadOnlyModelViewSet):
+class InstanceByTenant(CachedResponseMixin, ValuesListMixin, InstanceFiltersMixin, viewsets.ReadOnlyModelViewSet):
     """List or Retrieve the Network Service Instances by a Tenant's UUID."""
     serializer_class = InstanceSerializer
     permission_classes = (IsAuthenticated,)
@@ -145,27 +157,108 @@ class InstanceByTenant(viewsets.ReadOnlyModelViewSet):
     lookup_field = "uuid"
 
     def get_queryset(self):
-        queryset = Instance.objects.select_related('tenant').prefetch_related('vnfs', 'vdus').all()
+        queryset = InstanceSerializer.setup_eager_loading(Instance.objects.all())
         if "tenant_uuid" in self.kwargs:
             queryset = queryset.filter(tenant__uuid=self.kwargs["tenant_uuid"])
         return queryset
 
 
 @method_decorator(name='retrieve', decorator=swagger_decorators.instance_retrieve_by_uuid)
-class InstanceByUuid(generics.RetrieveAPIView):
+class InstanceByUuid(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a NS Instance by its UUID."""
-    queryset = Instance.objects.select_related('tenant').prefetch_related('vnfs', 'vdus').all()
+    queryset = InstanceSerializer.setup_eager_loading(Instance.objects.all())
     serializer_class = InstanceSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
+    filter_backends = ()
     lookup_field = 'uuid'
 
 
 @method_decorator(name='retrieve', decorator=swagger_decorators.tenant_retrieve_by_uuid)
-class TenantByUuid(generics.RetrieveAPIView):
+class TenantByUuid(CachedResponseMixin, generics.RetrieveAPIView):
     """Retrieve a Tenant by its UUID."""
-    queryset = Tenant.objects.all()
+    queryset = TenantSerializer.setup_eager_loading(Tenant.objects.all())
     serializer_class = TenantSerializer
     permission_classes = (IsAuthenticated,)
     authentication_classes = (BasicAuthentication, SessionAuthentication)
+    filter_backends = ()
     lookup_field = 'uuid'
+
+
+@method_decorator(name='get', decorator=swagger_decorators.export)
+class Export(APIView):
+    """Stream all the entries of a resource as NDJSON or CSV, e.g. `/export/vdus.ndjson`.
+
+    The entries are read in batches of the primary key and serialized incrementally, so that neither the
+    API nor the client has to hold the whole inventory in memory. The filters of the list views apply.
+    """
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (BasicAuthentication, SessionAuthentication)
+    content_negotiation_class = export.IgnoreClientContentNegotiation
+
+    def get(self, request, resource, export_format):
+        model, self.filter_fields, columns = export.EXPORTS[resource]
+        queryset = QueryParameterFilter().filter_queryset(request, model.objects.all(), self)
+        response = StreamingHttpResponse(export.stream(queryset, columns, export_format),
+                                         content_type=export.CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(resource, export_format)
+        return response
+
+
+class UsageView(APIView):
+    """Report the hourly, daily or total usage of an entity, from the rollups maintained by `send_metrics`.
+
+    Subclasses set the `model` of the entity and the `rollup` model of its usage.
+    """
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (BasicAuthentication, SessionAuthentication)
+    model = None
+    rollup = None
+
+    def get(self, request, uuid):
+        entities = self.model.objects.filter(uuid=uuid)
+        if not entities.exists():
+            raise Http404
+        step = request.query_params.get('step') or HOUR
+        if step not in GRANULARITIES:
+            raise ValidationError({'step': 'Expected one of {}'.format(', '.join(GRANULARITIES))})
+        start = end = None
+        if step != TOTAL:
+            end = parse_datetime_param('to', request.query_params['to']) if request.query_params.get('to') \
+                else timezone.now()
+            start = parse_datetime_param('from', request.query_params['from']) \
+                if request.query_params.get('from') else end - usage.DEFAULT_RANGE[step]
+            if start >= end:
+                raise ValidationError({'from': 'Expected a datetime before `to`'})
+
+        foreign_key = '{}__in'.format(self.model._meta.model_name)
+        rows = usage.query(self.rollup.objects.filter(**{foreign_key: entities}), step, start, end)
+        return Response(UsageSerializer(rows, many=True).data)
+
+
+@method_decorator(name='get', decorator=swagger_decorators.vdu_usage)
+class VduUsageView(UsageView):
+    """Report the usage of a VDU by its UUID."""
+    model = Vdu
+    rollup = VduUsage
+
+
+@method_decorator(name='get', decorator=swagger_decorators.vnf_usage)
+class VnfUsageView(UsageView):
+    """Report the usage of the VDUs of a VNF by its UUID."""
+    model = Vnf
+    rollup = VnfUsage
+
+
+@method_decorator(name='get', decorator=swagger_decorators.instance_usage)
+class InstanceUsageView(UsageView):
+    """Report the usage of the VDUs of a NS Instance by its UUID."""
+    model = Instance
+    rollup = InstanceUsage
+
+
+@method_decorator(name='get', decorator=swagger_decorators.tenant_usage)
+class TenantUsageView(UsageView):
+    """Report the usage of the VDUs of a Tenant by its UUID."""
+    model = Tenant
+    rollup = TenantUsage
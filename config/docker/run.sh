@@ -6,6 +6,10 @@ while ! nc -z accounting_postgres 5432; do
   sleep 1
 done
 
+# Clear the metrics of the previous run
+rm -rf "$prometheus_multiproc_dir"
+mkdir -p "$prometheus_multiproc_dir"
+
 # Make migrations
 cd /opt/accounting
 python3 manage.py makemigrations api --settings=accounting.settings
@@ -1,16 +1,60 @@
+import time
+
 import requests
 import urllib3
 
+from accounting import tracing
+from accounting.metrics import UPSTREAM_DURATION
 from .baseclient import AbstractClient
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 class Client(AbstractClient):
-    def __init__(self, verify_ssl_cert=False):
+    def __init__(self, verify_ssl_cert=False, timeout=None, upstream='other'):
+        """HTTP Client Class Constructor.
+
+        Args:
+            verify_ssl_cert (bool): Verify the SSL certificate of the server
+            timeout (float or tuple, optional): The connect and read timeouts of the requests in seconds,
+                either as a single value or as a (connect, read) tuple; requests wait forever if omitted
+            upstream (str, optional): The name of the service that the latency of the requests is recorded under,
+                e.g. `nbi`, `ro` or `billing`
+        """
         self.verify_ssl_cert = verify_ssl_cert
+        self.timeout = timeout
+        self.upstream = upstream
         super(Client, self).__init__()
 
+    def __request(self, method, url, **kwargs):
+        """Send a request, traced as a span, and record its latency per upstream, method and status code.
+
+        Args:
+            method (str): The HTTP method
+            url (str): the endpoint of the web service
+            kwargs (dict): The arguments of the request
+
+        Returns:
+            obj: a requests object
+        """
+        status = 'error'
+        start = time.perf_counter()
+        with tracing.start_span('HTTP {}'.format(method), tracing.CLIENT, attributes={
+                'http.method': method, 'http.url': url, 'peer.service': self.upstream}) as span:
+            header = tracing.traceparent()
+            if header is not None:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **{tracing.TRACEPARENT: header})
+            try:
+                response = requests.request(method, url, verify=self.verify_ssl_cert, timeout=self.timeout,
+                                            **kwargs)
+                status = str(response.status_code)
+                span.set_attribute('http.status_code', response.status_code)
+                if response.status_code >= 400:
+                    span.set_error('HTTP {}'.format(response.status_code))
+                return response
+            finally:
+                UPSTREAM_DURATION.labels(self.upstream, method, status).observe(time.perf_counter() - start)
+
     def list(self, url, headers=None, **kwargs):
         """Fetch a list of entities (a collection).
 
@@ -25,7 +69,7 @@ class Client(AbstractClient):
         if headers is None:
             headers = {}
         query_params = kwargs.get('query_params', None)
-        response = requests.get(url, headers=headers, params=query_params, verify=self.verify_ssl_cert)
+        response = self.__request('GET', url, headers=headers, params=query_params)
         return response
 
     def get(self, url, headers=None, **kwargs):
@@ -42,7 +86,7 @@ class Client(AbstractClient):
         if headers is None:
             headers = {}
         query_params = kwargs.get('query_params', None)
-        response = requests.get(url, headers=headers, params=query_params, verify=self.verify_ssl_cert)
+        response = self.__request('GET', url, headers=headers, params=query_params)
         return response
 
     def post(self, url, headers=None, payload=None, **kwargs):
@@ -60,7 +104,7 @@ class Client(AbstractClient):
         if headers is None:
             headers = {}
         query_params = kwargs.get('query_params', None)
-        response = requests.post(url, data=payload, headers=headers, params=query_params, verify=self.verify_ssl_cert)
+        response = self.__request('POST', url, data=payload, headers=headers, params=query_params)
         return response
 
     def delete(self, url, headers=None, **kwargs):
@@ -77,5 +121,5 @@ class Client(AbstractClient):
         if headers is None:
             headers = {}
         query_params = kwargs.get('query_params', None)
-        response = requests.delete(url=url, headers=headers, params=query_params, verify=self.verify_ssl_cert)
+        response = self.__request('DELETE', url, headers=headers, params=query_params)
         return response
@@ -0,0 +1,12 @@
+import os
+
+# =================================
+# SEND METRICS SETTINGS
+# =================================
+SEND_METRICS = {
+    # Active VDUs aggregated per shard; a run is split into as many shards as needed, up to MAX_SHARDS
+    'VDUS_PER_SHARD': int(os.getenv('ACC_SEND_METRICS_VDUS_PER_SHARD', 500)),
+    'MAX_SHARDS': int(os.getenv('ACC_SEND_METRICS_MAX_SHARDS', 16)),
+    # Seconds after which the lock of a run expires, should its last shard never finish
+    'LOCK_TIMEOUT': int(os.getenv('ACC_SEND_METRICS_LOCK_TIMEOUT', 1800)),
+}
@@ -1,3 +1,5 @@
+import os
+
 from django.conf import settings
 
 # =================================
@@ -17,7 +19,8 @@ METRICS_WHITE_LIST = [
 # =================================
 KAFKA_SERVER = settings.BOOTSTRAP_SERVER
 KAFKA_CLIENT_ID = 'accounting-metric-collector'
-KAFKA_GROUP_ID = 'MON_ACC'
+# Distinct from the group of osm_notifications, so that a rebalance of either consumer does not stop the other
+KAFKA_GROUP_ID = os.getenv('ACC_METRICS_KAFKA_GROUP_ID', 'MON_ACC_METRICS')
 KAFKA_API_VERSION = (0, 10, 1)
 KAFKA_TRANSLATION_TOPIC = 'ns.instances.trans'
 
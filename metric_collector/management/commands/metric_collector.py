@@ -4,15 +4,26 @@ import logging
 from django.core.management import BaseCommand
 from kafka import KafkaConsumer
 
+from accounting import metrics, profiling
+from accounting.database import run_with_reconnect
+from accounting.log import SampledLogger
 from api.models import Vdu, VduMetric
 from .config import KAFKA_SERVER, KAFKA_CLIENT_ID, KAFKA_API_VERSION, METRICS_WHITE_LIST, METRICS_DICT, KAFKA_GROUP_ID, \
     KAFKA_TRANSLATION_TOPIC
 
 logger = logging.getLogger(__name__)
+sampled_logger = SampledLogger(logger)
 
 
-def metric_collector():
-    """Connects on Kafka Bus and collects metrics sent for active VDUs."""
+def metric_collector(metrics_port=None):
+    """Connects on Kafka Bus and collects metrics sent for active VDUs.
+
+    Args:
+        metrics_port (int, optional): The port that the metrics of the collector are served on
+
+    """
+    metrics.start_sidecar(metrics_port)
+    profiling.install_signal_handler()
     consumer = KafkaConsumer(bootstrap_servers=KAFKA_SERVER, client_id=KAFKA_CLIENT_ID, enable_auto_commit=True,
                              value_deserializer=lambda v: json.loads(v.decode('utf-8', 'ignore')),
                              api_version=KAFKA_API_VERSION, group_id=KAFKA_GROUP_ID)
@@ -20,24 +31,43 @@ def metric_collector():
     logger.info('Initialized Kafka Consumer & subscribed to topics')
 
     for msg in consumer:
+        metrics.record_consumed(consumer, 'metric_collector', msg)
+        # The metric is saved again on a new connection if the DB was lost
+        with profiling.profile('metric_collector.save_metric'):
+            run_with_reconnect(save_metric, msg.value)
+
 
-        # Get metric and check if it is in whitelist
-        metric = msg.value['metric']
-        if metric['name'] not in METRICS_WHITE_LIST:
-            continue
+def save_metric(value):
+    """Save a metric sent for an active VDU.
 
-        # Get VDU id and check if it exists
-        vdu_uuid = msg.value['mano']['vdu']['id']
-        vdu = Vdu.objects.select_related('tenant', 'instance', 'vnf').filter(uuid=vdu_uuid, state='active')
-        if not vdu.exists():
-            continue
-        logger.debug('Metric: {}, Vdu: {}'.format(metric, vdu_uuid))
+    Args:
+        value (dict): The decoded Kafka message of the metric
 
-        # If it exists create metric for this vdu
-        VduMetric.objects.create(vdu=vdu[0], metric_name=METRICS_DICT[metric['name']], metric_value=metric['value'])
-        logger.info('Received and saved {} metric for vdu {}'.format(METRICS_DICT[metric['name']], vdu_uuid))
+    """
+    # Get metric and check if it is in whitelist
+    metric = value['metric']
+    if metric['name'] not in METRICS_WHITE_LIST:
+        metrics.COLLECTED_METRICS.labels('filtered').inc()
+        return
+
+    # Get VDU id and check if it exists
+    vdu_uuid = value['mano']['vdu']['id']
+    vdu = Vdu.objects.select_related('tenant', 'instance', 'vnf').filter(uuid=vdu_uuid, state='active')
+    if not vdu.exists():
+        metrics.COLLECTED_METRICS.labels('skipped').inc()
+        return
+    logger.debug('Metric: %s, Vdu: %s', metric, vdu_uuid)
+
+    # If it exists create metric for this vdu
+    VduMetric.objects.create(vdu=vdu[0], metric_name=METRICS_DICT[metric['name']], metric_value=metric['value'])
+    metrics.COLLECTED_METRICS.labels('persisted').inc()
+    sampled_logger.info('Received and saved metric', metric=METRICS_DICT[metric['name']], vdu=vdu_uuid)
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics-port', type=int, default=0,
+                            help='The port that the Prometheus metrics are served on; none by default')
+
     def handle(self, *args, **options):
-        metric_collector()
+        metric_collector(options['metrics_port'])
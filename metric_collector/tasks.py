@@ -1,52 +1,193 @@
 import logging
+import uuid
+from datetime import datetime
+from time import time
 
-from django.db.models import Avg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
 
 from accounting.celery import app
-from accounting_client.accounting_client import accounting_client
+from accounting.log import SampledLogger
+from accounting.metrics import SEND_METRICS_DURATION, SEND_METRICS_RECORDS, SEND_METRICS_SHARD_DURATION, \
+    SEND_METRICS_SKIPPED
+from accounting_client import outbox
+from api import usage
 from api.models import Vdu, VduMetric
+from metric_collector.config import SEND_METRICS
 
 logger = logging.getLogger(__name__)
+sampled_logger = SampledLogger(logger)
+
+# Metric type -> (description, scale of the collected values)
+METRICS = {
+    'CPU_CYCLE': ('Average Cpu Util', 1),
+    'MEMORY_MB': ('Average Memory in MB', 1),
+    'DISK_GB': ('Average Disk in GB', 1024 ** 3),
+}
+
+# Held by a run of send_metrics until its last shard finishes, so that runs never overlap
+LOCK_KEY = 'metric_collector.send_metrics.lock'
+# The shards of a run that are yet to finish
+REMAINING_KEY = 'metric_collector.send_metrics.remaining.{run}'
 
 
 @app.task
 def send_metrics():
-    """Aggregate and send metrics per VDU to consumption logger."""
+    """Aggregate and send metrics per VDU to consumption logger.
+
+    The run is skipped if the previous one has not finished yet. Otherwise the active VDUs are split into
+    shards by id range, aggregated in parallel by `send_metrics_shard` tasks, or inline if a single shard
+    suffices. Only the metrics collected so far are aggregated; those collected meanwhile are left to the next
+    run.
+    """
+    run = uuid.uuid4().hex
+    if not cache.add(LOCK_KEY, run, timeout=SEND_METRICS['LOCK_TIMEOUT']):
+        SEND_METRICS_SKIPPED.inc()
+        logger.warning('Skipping send_metrics as the previous run is still in progress')
+        return
 
     # Logging execution
     logger.info('Preparing to aggregate and send metrics for active vdus')
+    started = time()
+    try:
+        cutoff = VduMetric.objects.aggregate(last=Max('id'))['last']
+        shards = shard_ranges() if cutoff is not None else []
+    except Exception:
+        release(run)
+        raise
+    if len(shards) <= 1:
+        try:
+            if shards:
+                aggregate(0, shards[0][0], shards[0][1], cutoff, started)
+        finally:
+            finish(run, started)
+        return
+
+    cache.set(REMAINING_KEY.format(run=run), len(shards), timeout=SEND_METRICS['LOCK_TIMEOUT'])
+    for shard, (first, last) in enumerate(shards):
+        send_metrics_shard.delay(run, shard, first, last, cutoff, started)
+    logger.info('Dispatched the aggregation of metrics', extra={'shards': len(shards)})
+
+
+@app.task
+def send_metrics_shard(run, shard, first, last, cutoff, started):
+    """Aggregate and send the metrics of a shard of VDUs; the last shard of the run to finish rolls up the usage of
+    the VNFs, NS Instances and Tenants and releases the lock.
+
+    Args:
+        run (str): The id of the run
+        shard (int): The index of the shard in the run
+        first (int): The lowest id of the VDUs of the shard, or None for no lower bound
+        last (int): The id above the VDUs of the shard, or None for no upper bound
+        cutoff (int): The id of the last metric to aggregate
+        started (float): The time the run started at, as a timestamp
+
+    """
+    try:
+        aggregate(shard, first, last, cutoff, started)
+    finally:
+        try:
+            remaining = cache.decr(REMAINING_KEY.format(run=run))
+        except ValueError:
+            # The counter expired along with the lock
+            remaining = 0
+        if remaining is None:
+            # The cache is unreachable, its errors being ignored: the run is ended rather than left locked, and the
+            # windows of the shards yet to finish are rolled up by the next run
+            logger.warning('Could not count down the shards of send_metrics; ending the run', extra={'shard': shard})
+            remaining = 0
+        if remaining <= 0:
+            cache.delete(REMAINING_KEY.format(run=run))
+            finish(run, started)
+
+
+def shard_ranges():
+    """Split the active VDUs into ranges of ids, one per shard.
+
+    The number of shards grows with the active VDUs, one per `VDUS_PER_SHARD` up to `MAX_SHARDS`. The first
+    and last ranges are open-ended, so that together the shards cover the metrics of every VDU.
+
+    Returns:
+        list: The (first, last) ids of each shard, the first included and the last excluded
+    """
+    ids = list(Vdu.objects.filter(state='active').order_by('id').values_list('id', flat=True))
+    count = min(SEND_METRICS['MAX_SHARDS'], max(1, -(-len(ids) // SEND_METRICS['VDUS_PER_SHARD'])))
+    bounds = [None] + [ids[len(ids) * shard // count] for shard in range(1, count)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def aggregate(shard, first, last, cutoff, window_end):
+    """Aggregate the metrics of a range of VDUs, send the consumption records and delete the metrics.
+
+    Args:
+        shard (int): The index of the shard
+        first (int): The lowest id of the VDUs, or None for no lower bound
+        last (int): The id above the VDUs, or None for no upper bound
+        cutoff (int): The id of the last metric to aggregate
+        window_end (float): The end of the aggregated window, as a timestamp
+
+    """
+    start = time()
+    metrics = VduMetric.objects.filter(id__lte=cutoff)
+    if first is not None:
+        metrics = metrics.filter(vdu_id__gte=first)
+    if last is not None:
+        metrics = metrics.filter(vdu_id__lt=last)
+
+    # Queue the consumption records, roll up the usage and delete the aggregated metrics in a single transaction
+    with transaction.atomic():
+        # Count, sum and extremes of the measurements per active vdu and metric, in a single query
+        windows = list(metrics.filter(vdu__state='active', metric_name__in=list(METRICS))
+                       .values('vdu', 'metric_name')
+                       .annotate(samples=Count('id'), total=Sum('metric_value'), minimum=Min('metric_value'),
+                                 maximum=Max('metric_value'))
+                       .order_by('vdu', 'metric_name'))
+        vdus = Vdu.objects.in_bulk(set(window['vdu'] for window in windows))
+
+        rollups = []
+        for window in windows:
+            vdu = vdus[window['vdu']]
+            metric_name = window['metric_name']
+            description, scale = METRICS[metric_name]
+            average = window['total'] / window['samples'] / scale
+            sampled_logger.info('Aggregated metric', vdu=vdu.uuid, metric=metric_name, average=average,
+                                samples=window['samples'])
+            outbox.enqueue(outbox.LOG_VDU_CONSUMPTION, vdu=vdu, metric_type=metric_name, metric_value=average)
+            rollups.append((vdu, metric_name, window['samples'], window['total'] / scale, window['minimum'] / scale,
+                            window['maximum'] / scale))
 
-    # Fetch all active VDUs
-    vdus = Vdu.objects.select_related('tenant', 'instance', 'vnf').filter(state='active')
+        # Add the windows to the usage of the VDUs, and stage them for their VNFs, NS Instances and Tenants
+        usage.record(rollups, datetime.fromtimestamp(window_end, timezone.utc))
 
-    for vdu in vdus:
+        # Delete the aggregated metrics, along with those of the inactive VDUs of the range
+        metrics.delete()
 
-        # Metrics for vdu
-        vdu_metrics = VduMetric.objects.select_related('vdu').filter(vdu__uuid=vdu.uuid)
+    for window in windows:
+        SEND_METRICS_RECORDS.labels(window['metric_name']).inc()
+    duration = time() - start
+    SEND_METRICS_SHARD_DURATION.observe(duration)
+    logger.info('Finished aggregation and deleted previously collected metrics',
+                extra={'shard': shard, 'windows': len(windows), 'duration': round(duration, 3)})
 
-        # Average of cpu cycles measurements
-        cpu_cycle = vdu_metrics.filter(metric_name='CPU_CYCLE')
-        if cpu_cycle.exists():
-            cpu_cycle_avg = cpu_cycle.aggregate(Avg('metric_value'))['metric_value__avg']
-            logger.info('Vdu: {}, Average Cpu Util: {}'.format(vdu.uuid, cpu_cycle_avg))
-            accounting_client.log_vdu_consumption('CPU_CYCLE', cpu_cycle_avg, vdu.vdu_session_id)
 
-        # Average of ram megabytes measurements
-        ram_mb = vdu_metrics.filter(metric_name='MEMORY_MB')
-        if ram_mb.exists():
-            ram_mb_avg = ram_mb.aggregate(Avg('metric_value'))['metric_value__avg']
-            logger.info('Vdu: {}, Average Memory in MB: {}'.format(vdu.uuid, ram_mb_avg))
-            accounting_client.log_vdu_consumption('MEMORY_MB', ram_mb_avg, vdu.vdu_session_id)
+def finish(run, started):
+    """Roll up the usage of the VNFs, NS Instances and Tenants, record the duration of a run and release its lock.
 
-        # Average of disk GB measurements
-        disk_gb = vdu_metrics.filter(metric_name='DISK_GB')
-        if disk_gb.exists():
-            disk_gb_avg = disk_gb.aggregate(Avg('metric_value'))['metric_value__avg']
-            logger.info('Vdu: {}, Average Disk in GB: {}'.format(vdu.uuid, disk_gb_avg / (1024 ** 3)))
-            accounting_client.log_vdu_consumption('DISK_GB', disk_gb_avg / (1024 ** 3), vdu.vdu_session_id)
+    The rollups shared by the VDUs of several shards are updated once, here, rather than by each shard in parallel.
+    """
+    try:
+        windows = usage.roll_up()
+        logger.info('Rolled up the usage of VNFs, NS Instances and Tenants', extra={'windows': windows})
+    except Exception:
+        logger.exception('Could not roll up the usage of VNFs, NS Instances and Tenants; left to the next run')
+    finally:
+        SEND_METRICS_DURATION.observe(time() - started)
+        release(run)
 
-    # Delete all previous metrics
-    VduMetric.objects.select_related('vdu').all().delete()
 
-    logger.info('Finished aggregation and deleted previously collected metrics')
-    return
+def release(run):
+    """Release the lock of a run, unless it expired and was taken by another run."""
+    if cache.get(LOCK_KEY) == run:
+        cache.delete(LOCK_KEY)
@@ -1,9 +1,11 @@
 import logging.config
 
-import requests
 import urllib3
 from django.conf import settings
 
+from accounting.log import Lazy
+from httpclient.client import Client
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logging.config.dictConfig(settings.LOGGING)
 logger = logging.getLogger(__name__)
@@ -32,9 +34,9 @@ def bearer_token(username, password):
     endpoint = '{}/osm/admin/v1/tokens'.format(settings.OSM_COMPONENTS.get('NBI-API'))
     params = {'username': username, 'password': password}
     headers = {'Accept': 'application/json'}
-    response = requests.post(url=endpoint, params=params, headers=headers, verify=False)
-    logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                 .format(response.url, response.status_code, response.headers, response.text))
+    response = Client(verify_ssl_cert=False, upstream='nbi').post(endpoint, headers=headers, query_params=params)
+    logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                 response.url, response.status_code, response.headers, Lazy(lambda: response.text))
     if response.status_code == 200:
         return response.json()['id']
     return None
@@ -2,6 +2,7 @@ import logging.config
 
 from django.conf import settings
 
+from accounting.log import Lazy
 from httpclient.client import Client
 
 logging.config.dictConfig(settings.LOGGING)
@@ -25,7 +26,7 @@ class Nsd(object):
 
     def __init__(self, token):
         """NS Descriptor Class Constructor."""
-        self.__client = Client(verify_ssl_cert=False)
+        self.__client = Client(verify_ssl_cert=False, upstream='nbi')
         self.bearer_token = token
 
     def get_nsd_list(self):
@@ -49,8 +50,8 @@ class Nsd(object):
         endpoint = '{}/osm/nsd/v1/ns_descriptors'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_nsd(self, nsd_uuid):
@@ -77,6 +78,6 @@ class Nsd(object):
         endpoint = '{}/osm/nsd/v1/ns_descriptors/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), nsd_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
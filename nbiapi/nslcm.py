@@ -3,6 +3,7 @@ import logging.config
 from django.conf import settings
 from requests import Response
 
+from accounting.log import Lazy
 from httpclient.client import Client
 
 logging.config.dictConfig(settings.LOGGING)
@@ -26,7 +27,7 @@ class NsLcm(object):
 
     def __init__(self, token):
         """NS LCM Class Constructor."""
-        self.__client = Client(verify_ssl_cert=False)
+        self.__client = Client(verify_ssl_cert=False, upstream='nbi')
         self.bearer_token = token
 
     def get_ns_list(self):
@@ -50,8 +51,8 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/ns_instances'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_ns(self, ns_uuid):
@@ -78,8 +79,8 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/ns_instances/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), ns_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def terminate_ns(self, ns_uuid):
@@ -103,8 +104,8 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/ns_instances/{}/terminate'.format(settings.OSM_COMPONENTS.get('NBI-API'), ns_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.post(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_vnf_list(self):
@@ -128,8 +129,8 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/vnf_instances'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_vnf(self, vnf_uuid):
@@ -155,8 +156,8 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/vnf_instances/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), vnf_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_vnf_list_by_ns(self, ns_uuid):
@@ -180,6 +181,6 @@ class NsLcm(object):
         endpoint = '{}/osm/nslcm/v1/vnf_instances?nsr-id-ref={}'.format(settings.OSM_COMPONENTS.get('NBI-API'), ns_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
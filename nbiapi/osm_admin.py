@@ -2,6 +2,7 @@ import logging.config
 
 from django.conf import settings
 
+from accounting.log import Lazy
 from httpclient.client import Client
 
 logging.config.dictConfig(settings.LOGGING)
@@ -25,7 +26,7 @@ class OsmAdmin(object):
 
     def __init__(self, token):
         """NsInstance Class Constructor."""
-        self.__client = Client(verify_ssl_cert=False)
+        self.__client = Client(verify_ssl_cert=False, upstream='nbi')
         self.bearer_token = token
 
     def get_vim_list(self):
@@ -49,8 +50,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/vim_accounts'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_vim(self, vim_uuid):
@@ -77,8 +78,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/vim_accounts/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), vim_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_user_list(self):
@@ -99,8 +100,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/users'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_user(self, user_name):
@@ -124,8 +125,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/users/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), user_name)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_project_list(self):
@@ -146,8 +147,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/projects'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_project(self, project_name):
@@ -171,8 +172,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/projects/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), project_name)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_token_list(self):
@@ -193,8 +194,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/tokens'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_token(self, token):
@@ -218,8 +219,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/tokens/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), token)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_sdn_list(self):
@@ -243,8 +244,8 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/sdns'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_sdn(self, sdn_uuid):
@@ -271,6 +272,6 @@ class OsmAdmin(object):
         endpoint = '{}/osm/admin/v1/sdns/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), sdn_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
@@ -2,6 +2,7 @@ import logging.config
 
 from django.conf import settings
 
+from accounting.log import Lazy
 from httpclient.client import Client
 
 logging.config.dictConfig(settings.LOGGING)
@@ -24,7 +25,7 @@ class VnfPkgM(object):
 
     def __init__(self, token):
         """VNF Descriptor Class Constructor."""
-        self.__client = Client(verify_ssl_cert=False)
+        self.__client = Client(verify_ssl_cert=False, upstream='nbi')
         self.bearer_token = token
 
     def get_vnfd_list(self):
@@ -48,8 +49,8 @@ class VnfPkgM(object):
         endpoint = '{}/osm/vnfpkgm/v1/vnf_packages'.format(settings.OSM_COMPONENTS.get('NBI-API'))
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_vnfd(self, vnfd_uuid):
@@ -76,6 +77,6 @@ class VnfPkgM(object):
         endpoint = '{}/osm/vnfpkgm/v1/vnf_packages/{}'.format(settings.OSM_COMPONENTS.get('NBI-API'), vnfd_uuid)
         headers = {"Authorization": "Bearer {}".format(self.bearer_token), "Accept": "application/json"}
         response = self.__client.get(endpoint, headers)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     .format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
@@ -1,5 +1,6 @@
 import logging
 
+from accounting.log import Lazy
 from httpclient.client import Client
 from openmanoapi.config import BASE_URL
 
@@ -11,7 +12,7 @@ class Action(object):
     """
 
     def __init__(self):
-        self.__client = Client(verify_ssl_cert=True)
+        self.__client = Client(verify_ssl_cert=True, upstream='ro')
 
     def get_any(self, tenant_id, headers=None, query_params=None):
         """Fetch the list of actions for an instance by given tenant ID
@@ -38,8 +39,8 @@ class Action(object):
         """
         endpoint = '{}/{}/instances/any/action'.format(BASE_URL, tenant_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_list(self, tenant_id, instance_id, headers=None, query_params=None):
@@ -68,6 +69,6 @@ class Action(object):
         """
         endpoint = '{}/{}/instances/{}/action'.format(BASE_URL, tenant_id, instance_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
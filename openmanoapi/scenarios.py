@@ -1,5 +1,6 @@
 import logging
 
+from accounting.log import Lazy
 from httpclient.client import Client
 from openmanoapi.config import BASE_URL
 
@@ -12,7 +13,7 @@ class Scenario(object):
     """
 
     def __init__(self):
-        self.__client = Client(verify_ssl_cert=True)
+        self.__client = Client(verify_ssl_cert=True, upstream='ro')
 
     def get_list(self, openmano_tenant_id, headers=None, query_params=None):
         """Fetch the list of Openmano scenarios by given tenant ID
@@ -39,8 +40,8 @@ class Scenario(object):
         """
         endpoint = '{}/{}/scenarios'.format(BASE_URL, openmano_tenant_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get(self, openmano_tenant_id, scenario_id, headers=None, query_params=None):
@@ -69,6 +70,6 @@ class Scenario(object):
         """
         endpoint = '{}/{}/scenarios/{}'.format(BASE_URL, openmano_tenant_id, scenario_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
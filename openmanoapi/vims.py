@@ -1,5 +1,6 @@
 import logging
 
+from accounting.log import Lazy
 from httpclient.client import Client
 from openmanoapi.config import BASE_URL
 
@@ -12,7 +13,7 @@ class Vim(object):
     """
 
     def __init__(self):
-        self.__client = Client(verify_ssl_cert=True)
+        self.__client = Client(verify_ssl_cert=True, upstream='ro')
 
     def get_networks(self, openmano_tenant_id, datacenter_id, headers=None, query_params=None):
         """Fetch the list of VIM networks by given tenant ID and datacenter ID
@@ -40,8 +41,8 @@ class Vim(object):
         """
         endpoint = '{}/{}/vim/{}/networks'.format(BASE_URL, openmano_tenant_id, datacenter_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_network(self, openmano_tenant_id, datacenter_id, vim_network_id, headers=None, query_params=None):
@@ -71,8 +72,8 @@ class Vim(object):
         """
         endpoint = '{}/{}/vim/{}/networks/{}'.format(BASE_URL, openmano_tenant_id, datacenter_id, vim_network_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
 
     def get_tenants(self, openmano_tenant_id, datacenter_id, headers=None, query_params=None):
@@ -101,6 +102,6 @@ class Vim(object):
         """
         endpoint = '{}/{}/vim/{}/tenants'.format(BASE_URL, openmano_tenant_id, datacenter_id)
         response = self.__client.get(endpoint, headers=headers, query_params=query_params)
-        logger.debug("Request `GET {}` returns HTTP status `{}`, headers `{}` and body `{}`."
-                     "".format(response.url, response.status_code, response.headers, response.text))
+        logger.debug("Request `GET %s` returns HTTP status `%s`, headers `%s` and body `%s`.",
+                     response.url, response.status_code, response.headers, Lazy(lambda: response.text))
         return response
@@ -0,0 +1,136 @@
+import argparse
+import itertools
+import threading
+import time
+import uuid
+
+from stubs.server import StubServer
+
+OPEN_SESSIONS = ('openNsSession', 'openVnfSession', 'openVduSession')
+CLOSE_SESSIONS = ('closeNsSession', 'closeVnfSession', 'closeVduSession')
+
+
+class BillingStub(StubServer):
+    """Billing Stub Class.
+
+    A stub of the Accounting/Billing services of ENG, as invoked by the AccountingClient. It
+    authenticates any user, hands out increasing session ids and accepts consumption records.
+
+    Besides the latency of the StubServer, failures of the real service can be injected: issued
+    tokens expire after `token_ttl` seconds, after which requests are answered with `401` until
+    the client logs in again, and a share `error_rate` of the session and consumption requests
+    fails with `error_status`.
+
+    Args:
+        host (str): The address to listen on
+        port (int): The port to listen on; 0 picks a free port
+        latency (str, optional): The specification of the latency distribution, see `stubs.server.Latency`
+        token_ttl (float, optional): The lifetime of the issued tokens in seconds; tokens never expire if omitted
+        error_rate (float): The probability of a session or consumption request to fail
+        error_status (int): The HTTP status of the failed requests
+        seed (int, optional): The seed of the random generator of the stub
+
+    Examples:
+        >>> from stubs.billing import BillingStub
+        >>> billing = BillingStub(port=8060, latency='lognormal:0.05:0.5', token_ttl=300, error_rate=0.01).start()
+        >>> billing.base_url
+        'http://127.0.0.1:8060/api/accounting'
+        >>> billing.stop()
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, token_ttl=None, error_rate=0.0, error_status=500,
+                 seed=None):
+        """Billing Stub Class Constructor."""
+        super(BillingStub, self).__init__(host, port, latency=latency, seed=seed)
+        self.token_ttl = token_ttl
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.__tokens = {}
+        self.__session_ids = itertools.count(1)
+        self.__consumption_ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.route('POST', r'^/api/authenticate$', 'authenticate', self.authenticate)
+        for name in OPEN_SESSIONS:
+            self.route('POST', r'^/api/accounting/{}$'.format(name), name, self.__guarded(self.open_session))
+        for name in CLOSE_SESSIONS:
+            self.route('POST', r'^/api/accounting/{}$'.format(name), name, self.__guarded(self.close_session))
+        self.route('POST', r'^/api/accounting/logVduConsumption$', 'logVduConsumption',
+                   self.__guarded(self.log_vdu_consumption))
+        self.route('GET', r'^/api/accounting/availableUserResourceList$', 'availableUserResourceList',
+                   self.__guarded(self.available_user_resource_list))
+
+    @property
+    def base_url(self):
+        """str: The base URL of the accounting endpoints."""
+        return '{}/api/accounting'.format(self.url)
+
+    def expire_tokens(self):
+        """Expire all issued tokens, as if their lifetime had elapsed."""
+        with self.__lock:
+            self.__tokens.clear()
+
+    def __guarded(self, handler):
+        """Wrap a handler with the token check and the error injection."""
+
+        def guarded(request):
+            if not self.__authorized(request):
+                return 401, {'title': 'Unauthorized', 'status': 401, 'detail': 'Invalid or expired token'}
+            if self.error_rate and self.random.random() < self.error_rate:
+                return self.error_status, {'title': 'Injected failure', 'status': self.error_status}
+            return handler(request)
+
+        return guarded
+
+    def __authorized(self, request):
+        scheme, _, token = (request.headers.get('Authorization') or '').partition(' ')
+        with self.__lock:
+            expires_at = self.__tokens.get(token)
+            if scheme != 'Bearer' or expires_at is None:
+                return False
+            if expires_at < time.time():
+                del self.__tokens[token]
+                return False
+            return True
+
+    def authenticate(self, request):
+        token = uuid.uuid4().hex
+        with self.__lock:
+            self.__tokens[token] = time.time() + self.token_ttl if self.token_ttl else float('inf')
+        return 200, {'id_token': token}
+
+    def open_session(self, request):
+        with self.__lock:
+            return 200, str(next(self.__session_ids))
+
+    def close_session(self, request):
+        return 200, ''
+
+    def log_vdu_consumption(self, request):
+        with self.__lock:
+            return 200, {'id': next(self.__consumption_ids)}
+
+    def available_user_resource_list(self, request):
+        return 200, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub of the ENG Accounting/Billing services.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8060, help='Port to listen on')
+    parser.add_argument('--latency', help='Latency distribution, e.g. constant:0.05, uniform:0.01:0.1, '
+                                          'normal:0.05:0.01, exponential:0.05 or lognormal:0.05:0.5')
+    parser.add_argument('--token-ttl', type=float, help='Lifetime of the issued tokens in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability of a request to fail')
+    parser.add_argument('--error-status', type=int, default=500, help='HTTP status of the failed requests')
+    parser.add_argument('--seed', type=int, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    billing = BillingStub(args.host, args.port, latency=args.latency, token_ttl=args.token_ttl,
+                          error_rate=args.error_rate, error_status=args.error_status, seed=args.seed)
+    print('Billing stub listening on {}; counters on {}/_stats'.format(billing.base_url, billing.url))
+    billing.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+import argparse
+import copy
+import json
+import os
+import threading
+import uuid
+
+from stubs.server import StubServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'osm')
+FIXTURES = ('ns_instance', 'vnf_instance', 'vnf_package', 'vim_account', 'ro_tenant', 'ro_instance')
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Load the recorded OSM responses used as templates by the OSM stub.
+
+    Args:
+        directory (str): The directory holding one `<name>.json` file per fixture
+
+    Returns:
+        fixtures (dict): The decoded responses per fixture name
+
+    """
+    fixtures = {}
+    for name in FIXTURES:
+        with open(os.path.join(directory, '{}.json'.format(name))) as f:
+            fixtures[name] = json.load(f)
+    return fixtures
+
+
+class OsmStub(StubServer):
+    """OSM Stub Class.
+
+    A stub of the OSM Northbound Interface (NBI) and of the Resource Orchestrator (RO)
+    Northbound API, serving the endpoints that `nbiapi`, `openmanoapi` and the lifecycle
+    handlers of `api.utils` invoke. Both APIs are served on the same port, so its URL can be
+    used for both `NBI-API` and `RO-API` in the `OSM_COMPONENTS` setting.
+
+    The responses are rendered from recorded OSM responses (see `load_fixtures`). The NS
+    instances known to OSM are registered through `add_ns` and altered through `scale_out`,
+    `scale_in` and `remove_ns`, mirroring what OSM does before it emits the relevant
+    notification. NBI and RO latencies can be tuned separately.
+
+    Args:
+        host (str): The address to listen on
+        port (int): The port to listen on; 0 picks a free port
+        tenants (int): The number of RO tenants to serve
+        vims (int): The number of VIM accounts to serve
+        latency (str, optional): The latency distribution of all endpoints, see `stubs.server.Latency`
+        nbi_latency (str, optional): The latency distribution of the NBI endpoints
+        ro_latency (str, optional): The latency distribution of the RO endpoints
+        fixtures (str, optional): The directory of the recorded responses, instead of the bundled ones
+        seed (int, optional): The seed of the random generator of the stub
+
+    Examples:
+        >>> from stubs.osm import OsmStub
+        >>> osm = OsmStub(port=9999, tenants=3, nbi_latency='uniform:0.01:0.05').start()
+        >>> osm.add_ns('2c80ff71-1781-42c2-a438-9f6c2826be26', vnfs=2)
+        >>> osm.stats()['requests']
+        {}
+        >>> osm.stop()
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, tenants=1, vims=1, latency=None, nbi_latency=None,
+                 ro_latency=None, fixtures=None, seed=None):
+        """OSM Stub Class Constructor."""
+        super(OsmStub, self).__init__(host, port, latency=latency, seed=seed)
+        self.fixtures = load_fixtures(fixtures or FIXTURES_DIR)
+        self.tenants = [self.__render('ro_tenant', uuid=str(uuid.uuid4()), name='tenant{}'.format(i))
+                        for i in range(tenants)]
+        self.vim_accounts = [self.__render('vim_account', _id=str(uuid.uuid4()), name='vim{}'.format(i))
+                             for i in range(vims)]
+        self.__ns_instances = {}
+        self.__vnf_instances = {}
+        self.__vnf_packages = {}
+        self.__ro_instances = {}
+        self.__lock = threading.Lock()
+
+        # NBI
+        self.route('POST', r'^/osm/admin/v1/tokens$', 'nbi.tokens', self.new_token, nbi_latency)
+        self.route('GET', r'^/osm/admin/v1/tokens$', 'nbi.tokens.list', self.token_list, nbi_latency)
+        self.route('GET', r'^/osm/admin/v1/vim_accounts$', 'nbi.vim_accounts.list', self.vim_account_list,
+                   nbi_latency)
+        self.route('GET', r'^/osm/admin/v1/vim_accounts/(?P<uuid>[^/]+)$', 'nbi.vim_accounts', self.vim_account,
+                   nbi_latency)
+        self.route('GET', r'^/osm/nslcm/v1/ns_instances$', 'nbi.ns_instances.list', self.ns_instance_list,
+                   nbi_latency)
+        self.route('GET', r'^/osm/nslcm/v1/ns_instances/(?P<uuid>[^/]+)$', 'nbi.ns_instances', self.ns_instance,
+                   nbi_latency)
+        self.route('GET', r'^/osm/nslcm/v1/vnf_instances$', 'nbi.vnf_instances.list', self.vnf_instance_list,
+                   nbi_latency)
+        self.route('GET', r'^/osm/nslcm/v1/vnf_instances/(?P<uuid>[^/]+)$', 'nbi.vnf_instances',
+                   self.vnf_instance, nbi_latency)
+        self.route('GET', r'^/osm/vnfpkgm/v1/vnf_packages(_content)?$', 'nbi.vnf_packages.list',
+                   self.vnf_package_list, nbi_latency)
+        self.route('GET', r'^/osm/vnfpkgm/v1/vnf_packages(_content)?/(?P<uuid>[^/]+)$', 'nbi.vnf_packages',
+                   self.vnf_package, nbi_latency)
+
+        # RO
+        self.route('GET', r'^/openmano/tenants$', 'ro.tenants.list', self.ro_tenant_list, ro_latency)
+        self.route('GET', r'^/openmano/tenants/(?P<tenant>[^/]+)$', 'ro.tenants', self.ro_tenant, ro_latency)
+        self.route('GET', r'^/openmano/(?P<tenant>[^/]+)/instances$', 'ro.instances.list', self.ro_instance_list,
+                   ro_latency)
+        self.route('GET', r'^/openmano/(?P<tenant>[^/]+)/instances/(?P<uuid>[^/]+)$', 'ro.instances',
+                   self.ro_instance, ro_latency)
+
+    def __render(self, fixture, **fields):
+        record = copy.deepcopy(self.fixtures[fixture])
+        record.update(fields)
+        return record
+
+    # ==================================
+    #          NS Registry
+    # ==================================
+    def add_ns(self, ns_uuid, tenant_uuid=None, vnfs=1, vdus=1, vim_uuid=None):
+        """Register a NS instance as deployed by OSM.
+
+        Args:
+            ns_uuid (str): The UUID of the NS instance
+            tenant_uuid (str, optional): The RO tenant of the NS; the first tenant by default
+            vnfs (int): The number of VNFs of the NS
+            vdus (int): The number of VDUs per VNF
+            vim_uuid (str, optional): The VIM account of the NS; the first VIM account by default
+        """
+        tenant_uuid = tenant_uuid or self.tenants[0]['uuid']
+        vim_uuid = vim_uuid or self.vim_accounts[0]['_id']
+        nsr_id = str(uuid.uuid4())
+
+        vnf_instances = []
+        for i in range(vnfs):
+            vnfd = self.__render('vnf_package', _id=str(uuid.uuid4()), id='vnfd{}'.format(i), name='vnfd{}'.format(i))
+            vnfr = self.__render('vnf_instance', **{
+                '_id': str(uuid.uuid4()), 'nsr-id-ref': ns_uuid, 'member-vnf-index-ref': str(i + 1),
+                'vnfd-id': vnfd['_id'], 'vnfd-ref': vnfd['id'], 'vim-account-id': vim_uuid, 'vdur': []})
+            vnfr['id'] = vnfr['_id']
+            for _ in range(vdus):
+                vnfr['vdur'].append(self.__vdur(vnfr))
+            vnf_instances.append((vnfr, vnfd))
+
+        ns = self.__render('ns_instance', _id=ns_uuid, id=ns_uuid, datacenter=vim_uuid,
+                           **{'constituent-vnfr-ref': [vnfr['id'] for vnfr, _ in vnf_instances]})
+        ns['_admin']['deployed']['RO']['nsr_id'] = nsr_id
+        ns['instantiate_params']['vimAccountId'] = vim_uuid
+        ro_instance = self.__render('ro_instance', uuid=nsr_id, name=ns['name'], tenant_id=tenant_uuid)
+
+        with self.__lock:
+            self.__ns_instances[ns_uuid] = ns
+            self.__ro_instances[nsr_id] = ro_instance
+            for vnfr, vnfd in vnf_instances:
+                self.__vnf_instances[vnfr['id']] = vnfr
+                self.__vnf_packages[vnfd['_id']] = vnfd
+
+    def remove_ns(self, ns_uuid):
+        """Forget a NS instance, as OSM does once it is terminated."""
+        with self.__lock:
+            ns = self.__ns_instances.pop(ns_uuid, None)
+            if ns is None:
+                return
+            self.__ro_instances.pop(ns['_admin']['deployed']['RO']['nsr_id'], None)
+            for vnfr_id in ns['constituent-vnfr-ref']:
+                vnfr = self.__vnf_instances.pop(vnfr_id, None)
+                if vnfr is not None:
+                    self.__vnf_packages.pop(vnfr['vnfd-id'], None)
+
+    def scale_out(self, ns_uuid, member_vnf_index='1'):
+        """Add a VDU to a VNF of a NS instance."""
+        with self.__lock:
+            vnfr = self.__member_vnf(ns_uuid, member_vnf_index)
+            vnfr['vdur'].append(self.__vdur(vnfr))
+
+    def scale_in(self, ns_uuid, member_vnf_index='1'):
+        """Remove the most recent VDU of a VNF of a NS instance."""
+        with self.__lock:
+            self.__member_vnf(ns_uuid, member_vnf_index)['vdur'].pop()
+
+    def __vdur(self, vnfr):
+        vdur = copy.deepcopy(self.fixtures['vnf_instance']['vdur'][0])
+        vdur.update({'_id': str(uuid.uuid4()), 'vim-id': str(uuid.uuid4()), 'count-index': len(vnfr['vdur'])})
+        return vdur
+
+    def __member_vnf(self, ns_uuid, member_vnf_index):
+        vnfrs = [self.__vnf_instances[vnfr_id] for vnfr_id in self.__ns_instances[ns_uuid]['constituent-vnfr-ref']]
+        for vnfr in vnfrs:
+            if vnfr['member-vnf-index-ref'] == member_vnf_index:
+                return vnfr
+        return vnfrs[-1]
+
+    # ==================================
+    #          NBI Endpoints
+    # ==================================
+    def new_token(self, request):
+        return 200, {'_id': uuid.uuid4().hex, 'id': uuid.uuid4().hex, 'project_id': 'admin', 'username': 'admin',
+                     'admin': True}
+
+    def token_list(self, request):
+        return 200, []
+
+    def vim_account_list(self, request):
+        return 200, self.vim_accounts
+
+    def vim_account(self, request):
+        for vim_account in self.vim_accounts:
+            if vim_account['_id'] == request.args['uuid']:
+                return 200, vim_account
+        return 404, {'code': 'NOT_FOUND', 'status': 404, 'detail': 'vim_account not found'}
+
+    def ns_instance_list(self, request):
+        with self.__lock:
+            return 200, list(self.__ns_instances.values())
+
+    def ns_instance(self, request):
+        with self.__lock:
+            ns = self.__ns_instances.get(request.args['uuid'])
+            if ns is None:
+                return 404, {'code': 'NOT_FOUND', 'status': 404, 'detail': 'nsr not found'}
+            return 200, copy.deepcopy(ns)
+
+    def vnf_instance_list(self, request):
+        nsr_id = request.params.get('nsr-id-ref')
+        with self.__lock:
+            return 200, [copy.deepcopy(vnfr) for vnfr in self.__vnf_instances.values()
+                         if nsr_id is None or vnfr['nsr-id-ref'] == nsr_id]
+
+    def vnf_instance(self, request):
+        with self.__lock:
+            vnfr = self.__vnf_instances.get(request.args['uuid'])
+            if vnfr is None:
+                return 404, {'code': 'NOT_FOUND', 'status': 404, 'detail': 'vnfr not found'}
+            return 200, copy.deepcopy(vnfr)
+
+    def vnf_package_list(self, request):
+        with self.__lock:
+            return 200, list(self.__vnf_packages.values())
+
+    def vnf_package(self, request):
+        with self.__lock:
+            vnfd = self.__vnf_packages.get(request.args['uuid'])
+        if vnfd is None:
+            return 404, {'code': 'NOT_FOUND', 'status': 404, 'detail': 'vnfd not found'}
+        return 200, vnfd
+
+    # ==================================
+    #          RO Endpoints
+    # ==================================
+    def ro_tenant_list(self, request):
+        return 200, {'tenants': self.tenants}
+
+    def ro_tenant(self, request):
+        for tenant in self.tenants:
+            if tenant['uuid'] == request.args['tenant']:
+                return 200, {'tenant': tenant}
+        return 404, {'error': {'http_code': 404, 'description': 'tenant not found'}}
+
+    def ro_instance_list(self, request):
+        with self.__lock:
+            return 200, {'instances': [instance for instance in self.__ro_instances.values()
+                                       if instance['tenant_id'] == request.args['tenant']]}
+
+    def ro_instance(self, request):
+        with self.__lock:
+            instance = self.__ro_instances.get(request.args['uuid'])
+        if instance is None or instance['tenant_id'] != request.args['tenant']:
+            return 404, {'error': {'http_code': 404, 'description': 'instance not found'}}
+        return 200, instance
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub of the OSM NBI & RO Northbound APIs.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=9999, help='Port to listen on')
+    parser.add_argument('--tenants', type=int, default=1, help='Number of RO tenants')
+    parser.add_argument('--vims', type=int, default=1, help='Number of VIM accounts')
+    parser.add_argument('--ns', type=int, default=0, help='Number of NS instances deployed at start-up')
+    parser.add_argument('--vnfs', type=int, default=1, help='Number of VNFs per NS instance')
+    parser.add_argument('--vdus', type=int, default=1, help='Number of VDUs per VNF')
+    parser.add_argument('--latency', help='Latency distribution of all endpoints, e.g. uniform:0.01:0.1')
+    parser.add_argument('--nbi-latency', help='Latency distribution of the NBI endpoints')
+    parser.add_argument('--ro-latency', help='Latency distribution of the RO endpoints')
+    parser.add_argument('--fixtures', help='Directory of recorded responses to use instead of the bundled ones')
+    parser.add_argument('--seed', type=int, help='Seed of the random generator')
+    args = parser.parse_args()
+
+    osm = OsmStub(args.host, args.port, tenants=args.tenants, vims=args.vims, latency=args.latency,
+                  nbi_latency=args.nbi_latency, ro_latency=args.ro_latency, fixtures=args.fixtures, seed=args.seed)
+    for i in range(args.ns):
+        osm.add_ns(str(uuid.uuid4()), osm.tenants[i % len(osm.tenants)]['uuid'], vnfs=args.vnfs, vdus=args.vdus)
+    print('OSM stub listening on {} (NBI & RO); counters on {}/_stats'.format(osm.url, osm.url))
+    osm.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubRequest(object):
+    """A request received by a stub server.
+
+    Attributes:
+        method (str): The HTTP method
+        path (str): The path of the request, without the query string
+        params (dict): The query parameters, a single value per parameter
+        args (dict): The named groups matched by the route pattern
+        headers (obj): The HTTP headers of the request
+        body (bytes): The raw body of the request
+
+    """
+
+    def __init__(self, method, path, params, args, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.args = args
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Decode the body of the request as JSON.
+
+        Returns:
+            obj: The decoded body or None if the body is empty
+        """
+        if not self.body:
+            return None
+        return json.loads(self.body.decode('utf-8'))
+
+
+class Latency(object):
+    """Latency Class.
+
+    A distribution of response delays, parsed from a specification of the form
+    `<distribution>:<param>[:<param>]`, in seconds:
+
+      * `constant:<delay>`
+      * `uniform:<min>:<max>`
+      * `normal:<mean>:<stddev>`
+      * `exponential:<mean>`
+      * `lognormal:<median>:<sigma>`
+
+    Args:
+        spec (str): The specification of the distribution
+        rng (Random, optional): The random generator to sample from
+
+    Examples:
+        >>> from stubs.server import Latency
+        >>> delay = Latency('uniform:0.01:0.05').sample()
+
+    """
+
+    DISTRIBUTIONS = {
+        'constant': lambda rng, delay: delay,
+        'uniform': lambda rng, low, high: rng.uniform(low, high),
+        'normal': lambda rng, mean, stddev: rng.normalvariate(mean, stddev),
+        'exponential': lambda rng, mean: rng.expovariate(1.0 / mean) if mean else 0.0,
+        'lognormal': lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma) if median else 0.0,
+    }
+
+    def __init__(self, spec, rng=None):
+        """Latency Class Constructor."""
+        name, _, params = spec.partition(':')
+        if name not in self.DISTRIBUTIONS:
+            raise ValueError('Unknown latency distribution `{}`. Expected one of {}.'.format(
+                name, ', '.join(sorted(self.DISTRIBUTIONS))))
+        self.spec = spec
+        self.params = [float(param) for param in params.split(':')] if params else []
+        self.rng = rng or random.Random()
+        self.sample()
+
+    def sample(self):
+        """Draw a delay from the distribution.
+
+        Returns:
+            delay (float): A non-negative delay in seconds
+        """
+        name = self.spec.partition(':')[0]
+        try:
+            return max(0.0, self.DISTRIBUTIONS[name](self.rng, *self.params))
+        except TypeError:
+            raise ValueError('Wrong number of parameters in latency `{}`'.format(self.spec))
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _request_handler(stub):
+    """Build a request handler class that dispatches every request to the given stub."""
+
+    class StubRequestHandler(BaseHTTPRequestHandler):
+
+        def _serve(self, method):
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else b''
+            status, payload = stub.dispatch(method, url.path, params, self.headers, body)
+            if isinstance(payload, bytes):
+                content, content_type = payload, 'application/octet-stream'
+            elif isinstance(payload, str):
+                content, content_type = payload.encode('utf-8'), 'text/plain'
+            else:
+                content, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_GET(self):
+            self._serve('GET')
+
+        def do_POST(self):
+            self._serve('POST')
+
+        def do_PUT(self):
+            self._serve('PUT')
+
+        def do_DELETE(self):
+            self._serve('DELETE')
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubRequestHandler
+
+
+class StubServer(object):
+    """Stub Server Class.
+
+    A threaded HTTP server that answers a set of routes with canned responses, so that the
+    HTTP clients of the accounting services can be exercised without the real OSM or billing
+    services. Every request is counted per route, which lets a caller measure how many upstream
+    calls an operation costs, and may be delayed according to a latency distribution.
+
+    The counters are also served as JSON on `GET /_stats` and cleared on `POST /_reset`, for
+    stubs that run in a separate process.
+
+    Attributes:
+        counters (Counter): The number of requests received per route name
+        responses (Counter): The number of responses sent per route name and HTTP status
+        durations (Counter): The time spent serving the requests per route name, in seconds
+        latency (Latency): The delay applied to every request, if any
+
+    Args:
+        host (str): The address to listen on
+        port (int): The port to listen on; 0 picks a free port
+        latency (str, optional): The specification of the latency distribution, see `Latency`
+        seed (int, optional): The seed of the random generator of the stub
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=None, seed=None):
+        """Stub Server Class Constructor."""
+        self.counters = Counter()
+        self.responses = Counter()
+        self.durations = Counter()
+        self.random = random.Random(seed)
+        self.latency = Latency(latency, self.random) if latency else None
+        self.__routes = []
+        self.__lock = threading.Lock()
+        self.__httpd = _ThreadingHTTPServer((host, port), _request_handler(self))
+        self.__thread = None
+
+    @property
+    def url(self):
+        """str: The base URL of the server."""
+        host, port = self.__httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def total_requests(self):
+        """int: The number of requests received on all routes."""
+        with self.__lock:
+            return sum(self.counters.values())
+
+    def route(self, method, pattern, name, handler, latency=None):
+        """Register a route.
+
+        Args:
+            method (str): The HTTP method of the route
+            pattern (str): A regular expression matched against the path of the request
+            name (str): The name under which the requests of the route are counted
+            handler (callable): Receives a StubRequest and returns a (status, payload) tuple
+            latency (str, optional): The latency distribution of the route, instead of the one of the server
+        """
+        latency = Latency(latency, self.random) if latency else self.latency
+        self.__routes.append((method, re.compile(pattern), name, handler, latency))
+
+    def dispatch(self, method, path, params, headers, body):
+        """Find the route of a request and invoke its handler.
+
+        Returns:
+            tuple: The HTTP status and the payload of the response
+        """
+        if path == '/_stats' and method == 'GET':
+            return 200, self.stats()
+        if path == '/_reset' and method == 'POST':
+            self.reset()
+            return 200, self.stats()
+        for route_method, pattern, name, handler, latency in self.__routes:
+            match = pattern.match(path)
+            if route_method != method or match is None:
+                continue
+            start = time.perf_counter()
+            if latency is not None:
+                time.sleep(latency.sample())
+            status, payload = handler(StubRequest(method, path, params, match.groupdict(), headers, body))
+            with self.__lock:
+                self.counters[name] += 1
+                self.responses[(name, status)] += 1
+                self.durations[name] += time.perf_counter() - start
+            return status, payload
+        with self.__lock:
+            self.counters['not_found'] += 1
+        return 404, {'detail': 'Not found'}
+
+    def snapshot(self):
+        """Return a copy of the request counters.
+
+        Returns:
+            dict: The number of requests per route name
+        """
+        with self.__lock:
+            return dict(self.counters)
+
+    def stats(self):
+        """Return the request and response counters.
+
+        Returns:
+            dict: The number of requests per route name, of responses per route name and HTTP status and the
+                mean time spent serving the requests of each route in milliseconds
+        """
+        with self.__lock:
+            responses = {}
+            for (name, status), count in self.responses.items():
+                responses.setdefault(name, {})[str(status)] = count
+            mean_ms = {name: 1000 * self.durations[name] / count for name, count in self.counters.items()
+                       if name in self.durations}
+            return {'requests': dict(self.counters), 'responses': responses, 'mean_ms': mean_ms}
+
+    def reset(self):
+        """Reset the request and response counters."""
+        with self.__lock:
+            self.counters.clear()
+            self.responses.clear()
+            self.durations.clear()
+
+    def start(self):
+        """Start serving requests on a background thread."""
+        self.__thread = threading.Thread(target=self.__httpd.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and release the socket."""
+        self.__httpd.shutdown()
+        self.__httpd.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def serve_forever(self):
+        """Serve requests on the current thread until interrupted."""
+        try:
+            self.__httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.__httpd.server_close()